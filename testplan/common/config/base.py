@@ -4,6 +4,7 @@ Module containing configuration objects and utilities.
 
 import copy
 import inspect
+import weakref
 
 from schema import Schema, Optional, And, Or, Use
 
@@ -110,14 +111,38 @@ class Config(object):
     Configurations can have a parent-child relationship so that
     options not defined in the child, can be retrieved from parent.
     Supports composition of multiple config options via multiple inheritance.
+
+    The validation schema is built once per class, unless ``cache_schema``
+    is disabled for classes whose option defaults are computed when their
+    schema is built. Option values are resolved once and stored as instance
+    attributes, until the config or one of its ancestors gets a new parent
+    or local value. Options assigned directly are set as local values.
     """
 
     ignore_extra_keys = False
+    cache_schema = True
+    _schemas = {}
 
     def __init__(self, **options):
         self._parent = None
+        self._children = weakref.WeakSet()
+        self._resolved = set()
         self._cfg_input = options
-        self._options = self.build_schema().validate(options)
+        self._options = self._copy_defaults(
+            self.schema().validate(options))
+
+    @staticmethod
+    def _copy_defaults(options):
+        """
+        Copy mutable default values, shared by the configs of a class
+        through its cached schema.
+        """
+        for key, value in options.items():
+            if isinstance(value, DefaultValueWrapper) and \
+                    isinstance(value.value, (list, dict, set)):
+                options[key] = DefaultValueWrapper(
+                    copy.copy(value.value), value.block_propagation)
+        return options
 
     def __getattr__(self, name):
         options = self.__getattribute__('_options')
@@ -126,23 +151,71 @@ class Config(object):
 
         if local_val is not ABSENT and not isinstance(local_val,
                                                       DefaultValueWrapper):
-            return local_val
+            return self._resolve(name, local_val)
         elif local_val is ABSENT or not getattr(local_val,
                                                 'block_propagation', True):
             parent_val = getattr(self.parent, name,
                                  ABSENT) if self.parent else ABSENT
 
-        if local_val is ABSENT and parent_val is ABSENT: 
-            raise AttributeError('Name: {}'.format(name)) 
+        if local_val is ABSENT and parent_val is ABSENT:
+            raise AttributeError('Name: {}'.format(name))
 
         if parent_val is not ABSENT:
-            return parent_val
+            return self._resolve(name, parent_val)
         elif isinstance(local_val, DefaultValueWrapper):
-            return local_val.value
+            return self._resolve(name, local_val.value)
 
         raise RuntimeError('Error fetching attribute ({}) from {}'.format(
             name, self))
 
+    def _resolve(self, name, value):
+        """Store the resolved value of an option for later lookups."""
+        self.__dict__[name] = value
+        self._resolved.add(name)
+        return value
+
+    def _invalidate(self):
+        """Drop the resolved values of this config and its descendants."""
+        for name in list(self._resolved):
+            self.__dict__.pop(name, None)
+        self._resolved.clear()
+        for child in list(self._children):
+            child._invalidate()
+
+    def set_local(self, name, value):
+        """
+        Set the local value of an option.
+
+        :param name: Option name.
+        :type name: ``str``
+        :param value: Option value, not validated.
+        :type value: ``object``
+        """
+        self._options[name] = value
+        self._invalidate()
+
+    def __setattr__(self, name, value):
+        """Options assigned directly are set as local values."""
+        if name.startswith('_') or hasattr(type(self), name):
+            super(Config, self).__setattr__(name, value)
+        else:
+            self.set_local(name, value)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._resolved:
+            state.pop(name, None)
+        state['_resolved'] = set()
+        state['_children'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._children = weakref.WeakSet()
+        # Parents are loaded first, as they do not refer to their children.
+        if isinstance(self._parent, Config):
+            self._parent._children.add(self)
+
     def __repr__(self):
         return '{}{}'.format(self.__class__.__name__,
                              self._cfg_input or self._options)
@@ -159,6 +232,9 @@ class Config(object):
             raise AttributeError('Cannot overwrite parent: {}'.format(
                 self._parent))
         self._parent = value
+        if isinstance(value, Config):
+            value._children.add(self)
+        self._invalidate()
 
     def denormalize(self):
         """
@@ -181,6 +257,19 @@ class Config(object):
         """Override this classmethod to provide extra config arguments."""
         raise NotImplementedError
 
+    @classmethod
+    def schema(cls):
+        """
+        Validation schema of the class, built once if ``cache_schema`` is
+        enabled.
+        """
+        if not cls.cache_schema:
+            return cls.build_schema()
+        try:
+            return Config._schemas[cls]
+        except KeyError:
+            return Config._schemas.setdefault(cls, cls.build_schema())
+
     @classmethod
     def build_schema(cls):
         """
@@ -19,8 +19,8 @@ from schema import Or, And, Use
 from testplan.common.config import Config
 from testplan.common.config import ConfigOption
 from testplan.common.utils.exceptions import format_trace
-from testplan.common.utils.thread import execute_as_thread
-from testplan.common.utils.timing import wait
+from testplan.common.utils.thread import execute_as_thread, interruptible_join
+from testplan.common.utils.timing import wait, utcnow, Interval, Timer
 from testplan.common.utils.path import makeemptydirs, makedirs, default_runpath
 from testplan.common.utils import logger
 
@@ -29,15 +29,31 @@ class Environment(object):
     """
     A collection of resources that can be started/stopped.
 
+    Resources are started one after the other in the order they were added,
+    or if ``parallel`` is set, concurrently in waves of resources whose
+    :py:meth:`dependencies <Resource.dependencies>` were started by earlier
+    waves, and stopped in the reverse order of waves. Start and stop
+    durations of each resource are recorded in ``timer``.
+
+    Resources of shared environments attached to it are available through
+    it as well, the shared environments are acquired before its resources
+    start and released once they stopped.
+
     :param parent: Reference to parent object.
     :type parent: :py:class:`Entity <testplan.common.entity.base.Entity>`
+    :param parallel: Start and stop resources concurrently.
+    :type parallel: ``bool``
     """
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, parallel=False):
         self._resources = OrderedDict()
         self.parent = parent
+        self.parallel = parallel
         self.start_exceptions = OrderedDict()
         self.stop_exceptions = OrderedDict()
+        self.timer = Timer()
+        self._shared = []
+        self._acquired = []
         self._logger = None
 
     @property
@@ -86,6 +102,16 @@ class Environment(object):
         """
         del self._resources[uid]
 
+    def attach(self, shared):
+        """
+        Attach a shared environment, acquired when the environment starts
+        and released when it stops.
+
+        :param shared: Shared environment.
+        :type shared: :py:class:`~testplan.environment.SharedEnvironment`
+        """
+        self._shared.append(shared)
+
     def first(self):
         return next(uid for uid in self._resources.keys())
 
@@ -95,6 +121,10 @@ class Environment(object):
         if item in context:
             return context[item]
 
+        for shared in self.__getattribute__('_shared'):
+            if item in shared:
+                return shared[item]
+
         if self.parent and self.parent.cfg.initial_context:
             if item in self.parent.cfg.initial_context:
                 return self.parent.cfg.initial_context[item]
@@ -105,7 +135,8 @@ class Environment(object):
         return getattr(self, item)
 
     def __contains__(self, item):
-        return item in self._resources
+        return item in self._resources or any(
+            item in shared for shared in self._shared)
 
     def __iter__(self):
         return iter(self._resources.values())
@@ -128,16 +159,134 @@ class Environment(object):
         return all(self._resources[resource].status.tag == target
                    for resource in self._resources)
 
+    def dependency_waves(self):
+        """
+        Group the resources in waves, each resource only depending on
+        resources of earlier waves. Dependencies that are not part of the
+        environment are ignored.
+
+        :return: Resources of each wave, in the order they were added.
+        :rtype: ``list`` of ``list`` of
+          :py:class:`Resource <testplan.common.entity.base.Resource>`
+        """
+        remaining = OrderedDict(
+            (uid, set(dep for dep in resource.dependencies()
+                      if dep in self._resources and dep != uid))
+            for uid, resource in self._resources.items())
+        waves = []
+        while remaining:
+            wave = [uid for uid, deps in remaining.items() if not deps]
+            if not wave:
+                raise RuntimeError(
+                    'Circular dependencies between resources {}.'.format(
+                        list(remaining)))
+            for uid in wave:
+                del remaining[uid]
+            for deps in remaining.values():
+                deps.difference_update(wave)
+            waves.append([self._resources[uid] for uid in wave])
+        return waves
+
+    def _record(self, action, resource, start_time):
+        self.timer['{}:{}'.format(action, resource.uid())] = Interval(
+            start_time, utcnow())
+
+    def _in_parallel(self, func, resources):
+        """Call a function with each resource in a thread of its own."""
+        threads = [threading.Thread(target=func, args=(resource,))
+                   for resource in resources]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            interruptible_join(thread)
+
+    def _start_resource(self, resource):
+        """Start a resource and wait for it, recording any exception."""
+        start_time = utcnow()
+        try:
+            resource.start()
+            resource.wait(resource.STATUS.STARTED)
+        except Exception as exc:
+            msg = 'While starting resource [{}]{}{}'.format(
+                resource.cfg.name, os.linesep,
+                format_trace(inspect.trace(), exc))
+            self.logger.error(msg)
+            self.start_exceptions[resource] = msg
+        else:
+            self._record('start', resource, start_time)
+
+    def _stop_resource(self, resource):
+        """Stop a resource and wait for it, recording any exception."""
+        if (resource.status.tag is None) or (
+                resource.status.tag == resource.STATUS.STOPPED):
+            # Skip resources not even triggered to start.
+            return
+        start_time = utcnow()
+        try:
+            resource.stop()
+            resource.wait(resource.STATUS.STOPPED)
+        except Exception as exc:
+            msg = 'While stopping resource [{}]{}{}'.format(
+                resource.cfg.name, os.linesep,
+                format_trace(inspect.trace(), exc))
+            self.stop_exceptions[resource] = msg
+        else:
+            self._record('stop', resource, start_time)
+
+    def _acquire_shared(self):
+        """
+        Acquire the attached shared environments, starting them if needed.
+
+        :return: Whether all of them were acquired.
+        :rtype: ``bool``
+        """
+        for shared in self._shared:
+            self._acquired.append(shared)
+            try:
+                shared.acquire()
+            except Exception as exc:
+                msg = 'While acquiring shared environment [{}]{}{}'.format(
+                    shared.cfg.name, os.linesep,
+                    format_trace(inspect.trace(), exc))
+                self.logger.error(msg)
+                self.start_exceptions[shared] = msg
+                return False
+        return True
+
+    def _release_shared(self):
+        """Release the shared environments acquired."""
+        while self._acquired:
+            shared = self._acquired.pop()
+            try:
+                shared.release()
+            except Exception as exc:
+                msg = 'While releasing shared environment [{}]{}{}'.format(
+                    shared.cfg.name, os.linesep,
+                    format_trace(inspect.trace(), exc))
+                self.stop_exceptions[shared] = msg
+
     def start(self):
         """
-        Start all resources sequentially and log errors.
+        Start all resources and log errors.
         """
+        if not self._acquire_shared():
+            return
+        if self.parallel:
+            self._start_parallel()
+        else:
+            self._start_sequential()
+
+    def _start_sequential(self):
         # Trigger start all resources
+        start_times = {}
         for resource in self._resources.values():
             try:
+                start_times[resource] = utcnow()
                 resource.start()
                 if resource.cfg.async_start is False:
                     resource.wait(resource.STATUS.STARTED)
+                    self._record('start', resource, start_times[resource])
             except Exception as exc:
                 msg = 'While starting resource [{}]{}{}'.format(
                     resource.cfg.name, os.linesep,
@@ -155,22 +304,46 @@ class Environment(object):
                 continue
             else:
                 resource.wait(resource.STATUS.STARTED)
+                self._record('start', resource, start_times[resource])
+
+    def _start_parallel(self):
+        try:
+            waves = self.dependency_waves()
+        except RuntimeError as exc:
+            self.logger.error(str(exc))
+            self.start_exceptions[self._resources[self.first()]] = str(exc)
+            return
+
+        for wave in waves:
+            self._in_parallel(self._start_resource, wave)
+            if self.start_exceptions:
+                # Environment start failure. Won't start the rest.
+                break
 
     def stop(self, reversed=False):
         """
         Stop all resources in reverse order and log exceptions.
         """
+        if self.parallel:
+            self._stop_parallel()
+        else:
+            self._stop_sequential(reversed=reversed)
+        self._release_shared()
+
+    def _stop_sequential(self, reversed=False):
         resources = list(self._resources.values())
         if reversed is True:
             resources = resources[::-1]
 
         # Stop all resources
+        start_times = {}
         for resource in resources:
             if (resource.status.tag is None) or (
                     resource.status.tag == resource.STATUS.STOPPED):
                 # Skip resources not even triggered to start.
                 continue
             try:
+                start_times[resource] = utcnow()
                 resource.stop()
             except Exception as exc:
                 msg = 'While stopping resource [{}]{}{}'.format(
@@ -187,6 +360,19 @@ class Environment(object):
                 continue
             else:
                 resource.wait(resource.STATUS.STOPPED)
+                if resource in start_times:
+                    self._record('stop', resource, start_times[resource])
+
+    def _stop_parallel(self):
+        """Stop resources before the ones they depend on."""
+        try:
+            waves = self.dependency_waves()
+        except RuntimeError:
+            # Could not have been started in waves, stop them all at once.
+            waves = [list(self._resources.values())]
+
+        for wave in waves[::-1]:
+            self._in_parallel(self._stop_resource, wave)
 
     def __enter__(self):
         self.start()
@@ -219,6 +405,8 @@ class EntityStatus(object):
         self._current = self.NONE
         self._metadata = OrderedDict()
         self._transitions = self.transitions()
+        # Notified on every status change, and on abort by the entity.
+        self._changed = threading.Condition()
 
     @property
     def tag(self):
@@ -235,7 +423,9 @@ class EntityStatus(object):
         current = self._current
         try:
             if current == new or new in self._transitions[current]:
-                self._current = new
+                with self._changed:
+                    self._current = new
+                    self._changed.notify_all()
             else:
                 msg = 'On status change from {} to {}'.format(current, new)
                 raise StatusTransitionException(msg)
@@ -244,6 +434,27 @@ class EntityStatus(object):
                 current, new, exc)
             raise StatusTransitionException(msg)
 
+    def notify(self):
+        """Wake up the threads waiting for a condition on the status."""
+        with self._changed:
+            self._changed.notify_all()
+
+    def wait_for(self, predicate, interval=1):
+        """
+        Block until a predicate is true, evaluating it on every status change
+        or notification instead of polling.
+
+        :param predicate: Condition on the status, or on the entity state
+          notified by :py:meth:`notify`.
+        :type predicate: ``callable``
+        :param interval: Upper bound of the time between two evaluations, in
+          case the state changed without a notification.
+        :type interval: ``int`` or ``float``
+        """
+        with self._changed:
+            while not predicate():
+                self._changed.wait(interval)
+
     def update_metadata(self, **metadata):
         """TODO."""
         self._metadata.update(metadata)
@@ -384,6 +595,7 @@ class Entity(logger.Loggable):
         Default abort policy. First abort all dependencies and then itself.
         """
         self._should_abort = True
+        self.status.notify()
         for dep in self.abort_dependencies():
             self._abort_entity(dep)
         self.aborting()
@@ -791,32 +1003,42 @@ class Runnable(Entity):
         """Callable to be invoked before each step."""
         pass
 
+    def _wait_running(self):
+        """
+        Block while execution is paused, until it is resumed or aborted.
+
+        :return: Whether execution can continue, ``False`` once aborted.
+        :rtype: ``bool``
+        """
+        self.status.wait_for(
+            lambda: not self.active or
+            self.status.tag == RunnableStatus.RUNNING)
+        return self.active
+
     def _run(self):
         self.logger.debug('Running %s', self)
         self.status.change(RunnableStatus.RUNNING)
-        while self.active:
-            if self.status.tag == RunnableStatus.RUNNING:
-                try:
-                    func, args, kwargs = self._steps.popleft()
-                    self.pre_step_call(func)
-                    if self.skip_step(func) is False:
-                        self.logger.debug(
-                            'Executing step of %s - %s', self, func.__name__)
-                        start_time = time.time()
-                        self._execute_step(func, *args, **kwargs)
-                        self.logger.debug(
-                            'Finished step of %s - %s. Took %ds',
-                            self,
-                            func.__name__,
-                            round(time.time() - start_time, 5))
-                    else:
-                        self.logger.debug(
-                            'Skipping step of %s - %s', self, func.__name__)
-                    self.post_step_call(func)
-                except IndexError:
-                    self.status.change(RunnableStatus.FINISHED)
-                    break
-            time.sleep(self.cfg.active_loop_sleep)
+        while self._wait_running():
+            try:
+                func, args, kwargs = self._steps.popleft()
+            except IndexError:
+                self.status.change(RunnableStatus.FINISHED)
+                break
+            self.pre_step_call(func)
+            if self.skip_step(func) is False:
+                self.logger.debug(
+                    'Executing step of %s - %s', self, func.__name__)
+                start_time = time.time()
+                self._execute_step(func, *args, **kwargs)
+                self.logger.debug(
+                    'Finished step of %s - %s. Took %ds',
+                    self,
+                    func.__name__,
+                    round(time.time() - start_time, 5))
+            else:
+                self.logger.debug(
+                    'Skipping step of %s - %s', self, func.__name__)
+            self.post_step_call(func)
 
     def _run_batch_steps(self):
         start_threads, start_procs = self._get_start_info()
@@ -1065,6 +1287,16 @@ class Resource(Entity):
         """Set the Resource context."""
         self._context = context
 
+    def dependencies(self):
+        """
+        Uids of the resources of the same environment that must be started
+        before this one, and stopped after it, when the environment starts
+        its resources in parallel.
+
+        :rtype: ``list`` of ``str``
+        """
+        return []
+
     def start(self):
         """
         Triggers the start logic of a Resource by executing
@@ -61,3 +61,26 @@ def is_context(value):
     :rtype: ``bool``
     """
     return isinstance(value, ContextValue)
+
+
+def context_drivers(value):
+    """
+    Names of the drivers referenced by the context values in a value,
+    looking into lists, tuples, sets and dictionaries.
+
+    :param value: Value which may contain context values.
+    :type value: ``object``
+
+    :return: Driver names.
+    :rtype: ``set`` of ``str``
+    """
+    if is_context(value):
+        return {value.driver}
+    if isinstance(value, dict):
+        value = list(value.keys()) + list(value.values())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        drivers = set()
+        for item in value:
+            drivers.update(context_drivers(item))
+        return drivers
+    return set()
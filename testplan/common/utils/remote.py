@@ -4,39 +4,67 @@ import os
 import getpass
 import subprocess
 
+import six
 
-def ssh_cmd(host, command):
+_BINARIES = {}
+
+
+def _binary(name, env_var):
+    """
+    Path of a binary from an environment variable, or else from the PATH,
+    looked up once.
+    """
+    if os.environ.get(env_var):
+        return os.environ[env_var]
+    if name not in _BINARIES:
+        if os.name == 'nt':
+            raise Exception('{} binary not provided.'.format(name.upper()))
+        _BINARIES[name] = bytes(subprocess.check_output(
+            'which {}'.format(name), shell=True).strip()).decode('UTF-8')
+    return _BINARIES[name]
+
+
+def ssh_control_options(control_dir, persist=600):
+    """
+    Returns ssh options to share one connection per host between commands.
+    The first command starts a master connection, later ones reuse it
+    through a socket in ``control_dir`` until ``persist`` seconds after the
+    last one ended.
+    """
+    return ['-o', 'ControlMaster=auto',
+            '-o', 'ControlPath={}'.format(
+                os.path.join(control_dir, '%r@%h:%p')),
+            '-o', 'ControlPersist={}'.format(persist)]
+
+
+def ssh_cmd(host, command, ssh_options=None):
     """Returns ssh command."""
-    try:
-        binary = os.environ['SSH_BINARY']
-    except KeyError:
-        if os.name != 'nt':
-            binary = bytes(subprocess.check_output(
-                'which ssh', shell=True).strip()).decode('UTF-8')
-        else:
-            raise Exception('SSH binary not provided.')
-    return [binary, '{}@{}'.format(getpass.getuser(), host), command]
-
-
-def copy_cmd(source, target, exclude=None):
+    return [_binary('ssh', 'SSH_BINARY')] + list(ssh_options or []) + [
+        '{}@{}'.format(getpass.getuser(), host), command]
+
+
+def ssh_control_exit_cmd(host, ssh_options):
+    """Returns command that stops the master connection to a host."""
+    return [_binary('ssh', 'SSH_BINARY')] + list(ssh_options) + [
+        '-O', 'exit', '{}@{}'.format(getpass.getuser(), host)]
+
+
+def copy_cmd(source, target, exclude=None, ssh_options=None):
     """Returns remote copy command."""
     if os.environ.get('RSYNC_BINARY'):
         cmd = [os.environ['RSYNC_BINARY'], '-r', '--links']
+        if ssh_options:
+            cmd.extend(['-e', ' '.join(
+                six.moves.shlex_quote(arg) for arg in
+                [_binary('ssh', 'SSH_BINARY')] + list(ssh_options))])
         if exclude is not None:
             for item in exclude:
                 cmd.extend(['--exclude', item])
         cmd.extend([source, target])
         return cmd
     # Proceed with SCP.
-    try:
-        binary = os.environ['SCP_BINARY']
-    except:
-        if os.name != 'nt':
-            binary = bytes(subprocess.check_output(
-                'which scp', shell=True).strip()).decode('UTF-8')
-        else:
-            raise Exception('SCP binary not provided.')
-    return [binary, '-r', source, target]
+    return [_binary('scp', 'SCP_BINARY'), '-r'] + list(ssh_options or []) + [
+        source, target]
 
 
 def link_cmd(path, link):
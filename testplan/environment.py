@@ -1,6 +1,9 @@
 """Module containing environments related classes."""
 
-from testplan.common.entity import Resource, Environment
+import threading
+
+from testplan.common.config import ConfigOption
+from testplan.common.entity import Resource, ResourceConfig, Environment
 
 
 class EnvironmentCreator(object):
@@ -106,3 +109,154 @@ class Environments(Resource):
     def aborting(self):
         """Abort logic."""
         pass
+
+
+class SharedEnvironmentConfig(ResourceConfig):
+    """
+    Configuration object for
+    :py:class:`~testplan.environment.SharedEnvironment` resource entity.
+    """
+
+    @classmethod
+    def get_options(cls):
+        """
+        Schema for options validation and assignment of default values.
+        """
+        return {
+            'name': str,
+            ConfigOption('environment', default=[]): [Resource],
+            ConfigOption('parallel_environment', default=False): bool,
+            ConfigOption('keep_running', default=False): bool
+        }
+
+
+class SharedEnvironment(Resource):
+    """
+    Environment of drivers shared by the tests it is passed to with their
+    ``shared_environments`` option, its drivers are available in the test
+    environments like their own drivers.
+
+    It is started by the first of these tests that starts and stopped after
+    the last one of them added to the plan has stopped, so tests run in the
+    same process (i.e the local runner or a thread pool) pay for the start
+    of its drivers once. Tests scheduled as tasks are only created when
+    executed, each of them counts as a test of all the shared environments
+    added as resources of the plan. Adding it as a resource of the plan
+    also makes sure it is stopped when the plan ends.
+
+    :param name: Name of the shared environment.
+    :type name: ``str``
+    :param environment: Drivers shared by the tests.
+    :type environment: ``list`` of
+      :py:class:`~testplan.testing.multitest.driver.base.Driver`
+    :param parallel_environment: Start and stop the drivers concurrently,
+      see :py:class:`~testplan.common.entity.base.Environment`.
+    :type parallel_environment: ``bool``
+    :param keep_running: Do not stop the drivers once the last test that
+      uses them has stopped but only when the shared environment stops.
+    :type keep_running: ``bool``
+
+    Also inherits all
+    :py:class:`~testplan.common.entity.base.Resource` options.
+    """
+
+    CONFIG = SharedEnvironmentConfig
+
+    def __init__(self, **options):
+        super(SharedEnvironment, self).__init__(**options)
+        self._environment = Environment(
+            parent=self, parallel=self.cfg.parallel_environment)
+        for driver in self.cfg.environment:
+            driver.parent = self
+            driver.cfg.parent = self.cfg
+            self._environment.add(driver)
+        self._lock = threading.Lock()
+        self._dependents = 0
+        self._started = False
+        self._start_error = None
+
+    def uid(self):
+        """Shared environment name."""
+        return self.cfg.name
+
+    @property
+    def environment(self):
+        """Environment of the shared drivers."""
+        return self._environment
+
+    def register(self):
+        """
+        Register a test that will use the shared environment, called when
+        the test is added to the plan.
+        """
+        with self._lock:
+            self._dependents += 1
+
+    def acquire(self):
+        """
+        Start the shared drivers if not started yet, called by each test
+        before it starts its own drivers.
+
+        :raises RuntimeError: if the drivers could not start.
+        """
+        with self._lock:
+            if self._start_error:
+                raise RuntimeError(self._start_error)
+            if self._started:
+                return
+            if self.runpath is None:
+                self.make_runpath_dirs()
+            self._started = True
+            self._environment.start()
+            if self._environment.start_exceptions:
+                self._start_error = \
+                    'Shared environment [{}] failed to start.'.format(
+                        self.cfg.name)
+                self._stop_environment()
+                raise RuntimeError(self._start_error)
+
+    def release(self):
+        """
+        Release the shared drivers, called by each test after it stopped its
+        own drivers. The drivers are stopped once released by the last test,
+        unless ``keep_running`` option is set.
+        """
+        with self._lock:
+            self._dependents = max(self._dependents - 1, 0)
+            if self._dependents == 0 and not self.cfg.keep_running:
+                self._stop_environment()
+
+    def _stop_environment(self):
+        """Stop the shared drivers if started. Must hold the lock."""
+        if not self._started:
+            return
+        self._started = False
+        self._environment.stop(reversed=True)
+        for msg in self._environment.stop_exceptions.values():
+            self.logger.error(msg)
+        self._environment.stop_exceptions.clear()
+
+    def __contains__(self, item):
+        return item in self._environment
+
+    def __getitem__(self, item):
+        return self._environment[item]
+
+    def starting(self):
+        """Drivers are started by the first test that uses them."""
+        if self.runpath is None:
+            self.make_runpath_dirs()
+
+    def stopping(self):
+        """Stop the shared drivers if still running."""
+        with self._lock:
+            self._stop_environment()
+
+    def abort_dependencies(self):
+        """Abort the shared drivers."""
+        for driver in self._environment:
+            yield driver
+
+    def aborting(self):
+        """Abort logic."""
+        pass
@@ -2,6 +2,7 @@
 
 import os
 import random
+import sqlite3
 import time
 import uuid
 import webbrowser
@@ -17,6 +18,7 @@ from testplan.common.entity import (Entity, RunnableConfig, RunnableStatus,
 from testplan.common.exporters import BaseExporter, ExporterResult
 from testplan.common.report import MergeError
 from testplan.common.utils.path import default_runpath
+from testplan.environment import SharedEnvironment
 from testplan.exporters import testing as test_exporters
 from testplan.report.testing import TestReport, TestGroupReport, Status
 from testplan.report.testing.styles import Style
@@ -24,6 +26,7 @@ from testplan.runnable.interactive import TestRunnerIHandler
 from testplan.runners.base import Executor
 from testplan.runners.pools.tasks import Task, TaskResult
 from testplan.testing import listing, filtering, ordering, tagging
+from testplan.testing.history import DurationHistory, default_history_path
 from testplan.testing.base import TestResult
 
 
@@ -73,7 +76,12 @@ def result_for_failed_task(original_result):
     Create a new result entry for invalid result retrieved from a resource.
     """
     result = TestResult()
-    result.report = TestGroupReport(name=original_result.task.name)
+    # Keep the entries that were streamed before the task failed.
+    partial = getattr(original_result.result, 'report', None)
+    if partial is not None:
+        result.report = partial
+    else:
+        result.report = TestGroupReport(name=original_result.task.name)
     attrs = [attr for attr in original_result.task.all_attrs]
     result_lines = ['{}: {}'.format(attr, getattr(original_result.task, attr))\
                         if getattr(original_result.task, attr, None) else ''\
@@ -91,6 +99,8 @@ class TestRunnerConfig(RunnableConfig):
     :py:class:`~testplan.runnable.TestRunner` runnable object.
     """
     ignore_extra_keys = True
+    # Default shuffle seed is drawn when the schema is built.
+    cache_schema = False
 
     @classmethod
     def get_options(cls):
@@ -155,7 +165,8 @@ class TestRunnerConfig(RunnableConfig):
                 None, And(Or(int, float), lambda t: t >= 0)),
             ConfigOption('interactive_handler', default=TestRunnerIHandler):
                 object,
-            ConfigOption('extra_deps', default=[]): list
+            ConfigOption('extra_deps', default=[]): list,
+            ConfigOption('cost_history', default=False): Or(bool, str)
         }
 
 
@@ -252,6 +263,12 @@ class TestRunner(Runnable):
       :py:class:`TestRunnerIHandler <testplan.runnable.interactive.TestRunnerIHandler>`
     :param extra_deps: Extra module dependencies for interactive reload.
     :type extra_deps: ``list`` of ``module``s
+    :param cost_history: Record durations of tests and scheduled tasks
+      in a :py:class:`~testplan.testing.history.DurationHistory`, the median
+      duration of a task is used as its expected cost in the next runs. Path
+      of the history database, ``True`` for a database of the plan next to
+      its runpath or ``False`` to disable. Default: ``False``
+    :type cost_history: ``bool`` or ``str``
 
     Also inherits all
     :py:class:`~testplan.common.entity.base.Runnable` options.
@@ -269,12 +286,21 @@ class TestRunner(Runnable):
             name=self.cfg.name, uid=self.cfg.name)
         self._configure_stdout_logger()
         self._web_server_thread = None
+        self._cost_history = None
 
     @property
     def report(self):
         """Tests report."""
         return self._result.test_report
 
+    @property
+    def cost_history(self):
+        """
+        Durations of tests in previous runs, ``None`` if disabled or not
+        loaded yet.
+        """
+        return self._cost_history
+
     def add_environment(self, env, resource=None):
         """
         Adds an environment to the target resource holder.
@@ -379,9 +405,22 @@ class TestRunner(Runnable):
             self.resources[resource].add(runnable, runnable.uid() or uid)
         else:
             self.resources[resource].add(runnable, uid)
+        for shared in self._shared_environments(runnable):
+            shared.register()
         self._tests[uid] = resource
         return uid
 
+    def _shared_environments(self, runnable):
+        """
+        Shared environments a test added to the plan may use: the ones of
+        its config, or all the ones added as resources of the plan for tests
+        created when their task is executed.
+        """
+        if isinstance(runnable, Entity):
+            return getattr(runnable.cfg, 'shared_environments', [])
+        return [resource for resource in self.resources
+                if isinstance(resource, SharedEnvironment)]
+
     def should_be_added(self, runnable):
         """Determines if a test runnable should be added for execution."""
         if isinstance(runnable, Task):
@@ -426,6 +465,7 @@ class TestRunner(Runnable):
         self._add_step(self._record_start)
         self._add_step(self.make_runpath_dirs)
         self._add_step(self._configure_file_logger)
+        self._add_step(self._load_cost_history)
 
     def main_batch_steps(self):
         """Steps to be executed while resources are running."""
@@ -433,6 +473,7 @@ class TestRunner(Runnable):
 
     def post_resource_steps(self):
         """Steps to be executed after resources stopped."""
+        self._add_step(self._save_cost_history)
         self._add_step(self._create_result)
         self._add_step(self._log_test_status)
         self._add_step(self._record_end)  # needs to happen before export
@@ -479,6 +520,109 @@ class TestRunner(Runnable):
                 break
             time.sleep(self.cfg.active_loop_sleep)
 
+    def _scheduled_tasks(self):
+        """Yields uid and executor of the tasks added to executors."""
+        for uid, resource in self._tests.items():
+            executor = self.resources[resource]
+            if isinstance(executor, Executor) and \
+                    isinstance(executor.added_items.get(uid), Task):
+                yield uid, executor
+
+    def _load_cost_history(self):
+        """
+        Load durations of tests in previous runs, set the expected cost of
+        the scheduled tasks that have no cost hint to their median duration
+        and the durations used to split MultiTest parts.
+        """
+        if self.cfg.cost_history is False:
+            return
+        elif self.cfg.cost_history is True:
+            path = default_history_path(self.runpath, self.uid())
+        else:
+            path = self.cfg.cost_history
+
+        history = DurationHistory(path)
+        try:
+            history.load()
+        except (IOError, OSError, sqlite3.Error) as exc:
+            self.logger.warning('Could not load duration history {} - {}'
+                                .format(path, exc))
+            return
+        self._cost_history = history
+
+        for uid, executor in self._scheduled_tasks():
+            task = executor.added_item(uid)
+            if task.cost is None:
+                task.cost = history.median(task.signature)
+        self._set_part_durations(history)
+
+    def _set_part_durations(self, history):
+        """
+        Pass a snapshot of the testcase durations of a test to the parts of
+        it added, and to the targets of the tasks that ran a part of it in
+        previous runs once materialized, so that the parts of a MultiTest
+        split its testcases the same way wherever they run.
+        """
+        snapshots = {}
+        for uid, resource in self._tests.items():
+            executor = self.resources[resource]
+            if not isinstance(executor, Executor):
+                continue
+            item = executor.added_item(uid)
+            if isinstance(item, Task):
+                test_uid = history.part_of(item.signature)
+            elif hasattr(item, 'set_part_durations'):
+                test_uid = item.uid()
+            else:
+                continue
+            if test_uid is None:
+                continue
+            if test_uid not in snapshots:
+                snapshots[test_uid] = history.medians(test_uid)
+            if isinstance(item, Task):
+                item.part_durations = snapshots[test_uid] or None
+            else:
+                item.set_part_durations(snapshots[test_uid])
+
+    def _save_cost_history(self):
+        """
+        Record the durations of the tests and of the tasks that were run
+        successfully. Needs to happen before report uids are reset.
+        """
+        history = self._cost_history
+        if history is None:
+            return
+
+        for uid, resource in self._tests.items():
+            executor = self.resources[resource]
+            if not isinstance(executor, Executor):
+                continue
+            result = executor.results.get(uid)
+            if isinstance(result, TaskResult):
+                if not result.status:
+                    continue
+                task, result = result.task, result.result
+            else:
+                task = None
+            report = getattr(result, 'report', None)
+            if not isinstance(report, TestGroupReport):
+                continue
+
+            history.record_report(report)
+            if task is not None and getattr(report, 'part', None):
+                history.record_part(task.signature, report.uid)
+            # Tasks of MultiTest objects are already recorded by report uid.
+            interval = report.timer.get('run')
+            if task is not None and task.signature != report.uid and \
+                    interval and interval.elapsed is not None:
+                history.record(task.signature, interval.elapsed)
+
+        try:
+            history.save()
+        except (IOError, OSError, sqlite3.Error) as exc:
+            self.logger.warning('Could not save duration history {} - {}'
+                                .format(history.path, exc))
+
     def _create_result(self):
         step_result = True
         test_results = self._result.test_results
@@ -519,8 +663,7 @@ class TestRunner(Runnable):
                         # a full structured report by dry_run(), thus the order
                         # of testcases can be retained in test report.
                         target = resource_result.task.materialize()
-                        # TODO: Any idea to avoid accessing private members?
-                        target.cfg._options['part'] = None
+                        target.cfg.set_local('part', None)
                         target._test_context = None
                         report = target.dry_run(status=Status.SKIPPED).report
                     else:
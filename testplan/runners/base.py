@@ -8,6 +8,59 @@ from testplan.common.entity import Resource, ResourceConfig
 from testplan.common.utils.thread import interruptible_join
 
 
+class OrderedSet(object):
+    """
+    Insertion ordered set of hashable items with O(1) append, removal and
+    retrieval of the first item, used for the uids of executor items.
+    """
+
+    def __init__(self, items=()):
+        self._items = OrderedDict((item, None) for item in items)
+
+    def append(self, item):
+        """Add an item at the end, if not already in the set."""
+        self._items[item] = None
+
+    def remove(self, item):
+        """Remove an item, raises ``KeyError`` if not in the set."""
+        del self._items[item]
+
+    def discard(self, item):
+        """Remove an item if it is in the set."""
+        self._items.pop(item, None)
+
+    def first(self):
+        """Return the first item, raises ``IndexError`` if empty."""
+        for item in self._items:
+            return item
+        raise IndexError('{} is empty'.format(self.__class__.__name__))
+
+    def popleft(self):
+        """Remove and return the first item, raises ``IndexError`` if empty."""
+        try:
+            return self._items.popitem(last=False)[0]
+        except KeyError:
+            raise IndexError('{} is empty'.format(self.__class__.__name__))
+
+    def clear(self):
+        """Remove all items."""
+        self._items.clear()
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __iter__(self):
+        # Iterate over a snapshot, items may be removed by the executor loop
+        # while other threads iterate.
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, list(self._items))
+
+
 class ExecutorConfig(ResourceConfig):
     """
     Configuration object for
@@ -34,7 +87,7 @@ class Executor(Resource):
         self._loop_handler = None
         self._input = OrderedDict()
         self._results = OrderedDict()
-        self.ongoing = []
+        self.ongoing = OrderedSet()
 
     @property
     def results(self):
@@ -74,7 +127,7 @@ class Executor(Resource):
         raise NotImplementedError()
 
     def _prepopulate_runnables(self):
-        self.ongoing = list(self._input.keys())
+        self.ongoing = OrderedSet(self._input.keys())
 
     def starting(self):
         """Starts the execution loop."""
@@ -46,7 +46,7 @@ class LocalRunner(Executor):
                 self.status.change(self.status.STARTED)
             elif self.status.tag == self.status.STARTED:
                 try:
-                    next_uid = self.ongoing[0]
+                    next_uid = self.ongoing.first()
                 except IndexError:
                     pass
                 else:
@@ -61,7 +61,9 @@ class LocalRunner(Executor):
                                 next_uid, self, exc))
                         self._results[next_uid] = result
                     finally:
-                        self.ongoing.pop(0)
+                        self.ongoing.discard(next_uid)
+                    # Run the next item straight away.
+                    continue
 
             elif self.status.tag == self.status.STOPPING:
                 self.status.change(self.status.STOPPED)
@@ -74,9 +76,7 @@ class LocalRunner(Executor):
         # Will announce that all the ongoing tasks fail, but there is a buffer
         # period and some tasks might be finished, so, copy the uids of ongoing
         # tasks and set test result, although the report could be overwritten.
-        ongoing = self.ongoing[:]
-        while ongoing:
-            uid = ongoing.pop(0)
+        for uid in list(self.ongoing):
             result = TestResult()
             result.report = TestGroupReport(name=uid)
             result.report.status_override = Status.ERROR
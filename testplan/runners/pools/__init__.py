@@ -2,5 +2,6 @@
 
 from .base import Pool as ThreadPool
 from .base import Worker as ThreadWorker
+from .direct import DirectPool
 from .process import ProcessPool
 from .remote import RemotePool
\ No newline at end of file
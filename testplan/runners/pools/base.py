@@ -1,7 +1,10 @@
 """Worker pool executor base classes."""
 
 import abc
+import collections
+import heapq
 import inspect
+import itertools
 import logging
 import numbers
 import os
@@ -21,8 +24,9 @@ from testplan.common.utils.strings import Color
 from testplan.common.utils.timing import wait_until_predicate
 from testplan.common.utils import logger
 
-from .communication import Message
+from .communication import Message, CODECS, negotiate_codec
 from testplan.runners.base import Executor, ExecutorConfig
+from testplan.testing.base import TestResult
 from .tasks import Task, TaskResult
 
 
@@ -38,9 +42,18 @@ class Transport(logger.Loggable):
     def __init__(self, recv_sleep=0.05):
         super(Transport, self).__init__()
         self._recv_sleep = recv_sleep
+        self._responses_cond = threading.Condition()
         self.requests = []
         self.responses = []
         self.active = True
+        # Messages are not serialized by in-process transports, the codec
+        # is negotiated for transports that do.
+        self.codec = None
+        # Callable set by the connection manager, invoked on every request
+        # sent so that the pool can block until there is work to do.
+        self.notify = None
+        # Time of the last response, every exchange proves the pool alive.
+        self.last_received = None
 
     def send(self, message):
         """
@@ -50,6 +63,8 @@ class Transport(logger.Loggable):
         :type message: :py:class:`~testplan.runners.pools.communication.Message`
         """
         self.requests.append(message)
+        if self.notify is not None:
+            self.notify()
 
     def receive(self):
         """
@@ -58,11 +73,14 @@ class Transport(logger.Loggable):
         :return: Response to the message sent.
         :type: :py:class:`~testplan.runners.pools.communication.Message`
         """
-        while self.active:
-            try:
-                return self.responses.pop()
-            except IndexError:
-                time.sleep(self._recv_sleep)
+        with self._responses_cond:
+            while self.active:
+                try:
+                    return self.responses.pop()
+                except IndexError:
+                    # Woken up as soon as a response is available, the
+                    # timeout only bounds the delay to notice deactivation.
+                    self._responses_cond.wait(self._recv_sleep)
 
     def accept(self):
         """
@@ -81,7 +99,9 @@ class Transport(logger.Loggable):
         :param message: Respond message.
         :type message: :py:class:`~testplan.runners.pools.communication.Message`
         """
-        self.responses.append(message)
+        with self._responses_cond:
+            self.responses.append(message)
+            self._responses_cond.notify()
 
     def send_and_receive(self, message, expect=None):
         """
@@ -110,6 +130,8 @@ class Transport(logger.Loggable):
             self.logger.exception('Hit exception on transport receive.')
             raise RuntimeError('On transport receive - {}.'.format(exc))
 
+        if received is not None:
+            self.last_received = time.time()
         if self.active and expect is not None:
             if received is None:
                 raise RuntimeError('Received None when {} was expected.'.format(
@@ -164,6 +186,12 @@ class ConnectionManager(entity.Resource):
                                .format(worker))
         self._workers.append(worker)
 
+    def own(self):
+        """
+        Make the calling thread the one receiving the messages of workers,
+        called by the pool loop when it starts. No-op in the base class.
+        """
+
     @abc.abstractmethod
     def accept(self):
         """
@@ -176,6 +204,24 @@ class ConnectionManager(entity.Resource):
         """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def poll(self, timeout):
+        """
+        Block until a message may be available to :py:meth:`accept`, the
+        timeout expires or :py:meth:`wakeup` is called.
+
+        :param timeout: Maximum time to block in seconds.
+        :type timeout: ``float``
+        :return: True if a message may be available.
+        :rtype: ``bool``
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def wakeup(self):
+        """Interrupt a :py:meth:`poll` call blocking in another thread."""
+        raise NotImplementedError
+
     def _unregister_workers(self):
         """Remove workers from this connection manager."""
         self._workers = []
@@ -187,27 +233,57 @@ class RoundRobinConnManager(ConnectionManager):
     def __init__(self):
         super(RoundRobinConnManager, self).__init__()
         self._current = 1
+        self._requests_event = threading.Event()
+
+    def register(self, worker):
+        """Register a new worker and get notified of its requests."""
+        super(RoundRobinConnManager, self).register(worker)
+        worker.transport.notify = self._requests_event.set
 
     def accept(self):
         """
-        Accepts a new message from the next worker, increments the current
-        worker index. Doesn't block if no message is queued for receiving.
+        Accepts a new message from the next worker that has one queued,
+        starting from the current worker index. Doesn't block if no message
+        is queued for receiving.
 
         :return: Message received from worker transport, or None.
         :rtype: ``NoneType`` or
             :py:class:`~testplan.runners.pools.communication.Message`
         """
-        if not self._workers:
-            return None
-        msg = None
-        try:
-            idx = (self._current % len(self._workers)) - 1
-            msg = self._workers[idx].transport.accept()
-        except IndexError:
-            pass
-        finally:
+        num_workers = len(self._workers)
+        for _ in range(num_workers):
+            idx = (self._current % num_workers) - 1
             self._current += 1
-            return msg
+            try:
+                return self._workers[idx].transport.accept()
+            except IndexError:
+                continue
+        return None
+
+    def poll(self, timeout):
+        """
+        Wait for any registered worker transport to send a request.
+
+        :param timeout: Maximum time to block in seconds.
+        :type timeout: ``float``
+        :return: True if a message may be available.
+        :rtype: ``bool``
+        """
+        ready = self._requests_event.wait(timeout)
+        # Clear before the caller drains the transports, so a request sent
+        # in between is either drained now or wakes up the next poll.
+        self._requests_event.clear()
+        return ready
+
+    def wakeup(self):
+        """Interrupt a blocking :py:meth:`poll`."""
+        self._requests_event.set()
+
+    def _unregister_workers(self):
+        """Stop receiving notifications from worker transports."""
+        for worker in self._workers:
+            worker.transport.notify = None
+        super(RoundRobinConnManager, self)._unregister_workers()
 
 
 class WorkerConfig(entity.ResourceConfig):
@@ -248,9 +324,11 @@ class Worker(entity.Resource):
         self._metadata = None
         self._transport = self.cfg.transport()
         self._loop_handler = None
+        self._prefetched = collections.deque()
         self.last_heartbeat = None
         self.assigned = set()
         self.requesting = 0
+        self.reclaim = 0
 
     @property
     def transport(self):
@@ -303,29 +381,67 @@ class Worker(entity.Resource):
         message = Message(**self.metadata)
 
         while self.active:
-            received = transport.send_and_receive(message.make(
-                message.TaskPullRequest, data=1))
-            if received is None or received.cmd == Message.Stop:
-                break
-            elif received.cmd == Message.TaskSending:
-                results = []
-                for item in received.data:
-                    results.append(self.execute(item))
-                transport.send_and_receive(message.make(
-                    message.TaskResults, data=results), expect=message.Ack)
-            elif received.cmd == Message.Ack:
-                pass
-            time.sleep(self.cfg.active_loop_sleep)
+            # Keep up to ``prefetch`` tasks queued besides the one to run.
+            demand = 1 + self.cfg.prefetch - len(self._prefetched)
+            if demand > 0:
+                received = transport.send_and_receive(message.make(
+                    message.TaskPullRequest, data=demand))
+                if received is None or received.cmd == Message.Stop:
+                    break
+                elif received.cmd == Message.TaskSending:
+                    self._prefetched.extend(received.data)
+                elif received.cmd == Message.TaskReclaim:
+                    # Give back the tasks that would be run last.
+                    returned = [self._prefetched.pop() for _ in range(
+                        min(received.data, len(self._prefetched)))]
+                    transport.send_and_receive(message.make(
+                        message.TaskReturn,
+                        data=[task.uid() for task in returned]),
+                        expect=message.Ack)
+                if not self._prefetched:
+                    # No task available, back off before pulling again.
+                    time.sleep(self.cfg.active_loop_sleep)
+                    continue
+
+            task = self._prefetched.popleft()
+            transport.send_and_receive(message.make(
+                message.TaskResults, data=[self.execute(task)]),
+                expect=message.Ack)
+
+    def _report_fragment_handler(self, task, streamed):
+        """
+        Create a callable that sends report fragments of a running task to the
+        pool, recording the uids of the entries that the pool acknowledged.
+        """
+        message = Message(**self.metadata)
+
+        def _send_fragment(fragment):
+            try:
+                received = self._transport.send_and_receive(message.make(
+                    Message.ReportFragment, data=[(task.uid(), fragment)]))
+            except Exception as exc:
+                self.logger.error('Could not stream report of {} - {}'.format(
+                    task, exc))
+                return
+            if received is not None and received.cmd == Message.Ack:
+                streamed.update(entry.uid for entry in fragment)
+
+        return _send_fragment
 
     def execute(self, task):
         """
         Executes a task and return the associated task result.
 
+        If ``stream_results`` is enabled, report fragments are sent to the pool
+        while the task runs and the entries streamed are left out of the report
+        of the task result. The pool merges them back on receipt.
+
         :param task: Task that worker pulled for execution.
         :type task: :py:class:`~testplan.runners.pools.tasks.base.Task`
         :return: Task result.
         :rtype: :py:class:`~testplan.runners.pools.tasks.base.TaskResult`
         """
+        streamed = set()
         try:
             target = task.materialize()
             if isinstance(target, entity.Runnable):
@@ -333,7 +449,16 @@ class Worker(entity.Resource):
                   target.parent = self
                 if not target.cfg.parent:
                   target.cfg.parent = self.cfg
+                if self.cfg.stream_results and \
+                        hasattr(target, 'report_fragment_handler'):
+                    target.report_fragment_handler = \
+                        self._report_fragment_handler(task, streamed)
                 result = target.run()
+                if streamed:
+                    result.report.entries = [
+                        entry for entry in result.report
+                        if entry.uid not in streamed]
+                    result.report.build_index()
             elif callable(target):
                 result = target()
             else:
@@ -366,15 +491,102 @@ def default_check_reschedule(pool, task_result):
     return False
 
 
-class PoolConfig(ExecutorConfig):
+class TaskQueue(object):
+    """
+    Queue of task uids waiting to be assigned, dequeued in ascending order of
+    the sort key of each uid and in insertion order for equal keys.
+
+    :param key: Callable returning the sort key of a task uid.
+    :type key: ``callable``
+    :param uids: Initial task uids.
+    :type uids: ``iterable``
+    """
+
+    def __init__(self, key, uids=()):
+        self._key = key
+        self._heap = []
+        self._counter = itertools.count()
+        for uid in uids:
+            self.append(uid)
+
+    def append(self, uid):
+        """Add a task uid to the queue."""
+        heapq.heappush(self._heap, (self._key(uid), next(self._counter), uid))
+
+    def popleft(self):
+        """Remove and return the next task uid, ``IndexError`` if empty."""
+        try:
+            return heapq.heappop(self._heap)[-1]
+        except IndexError:
+            raise IndexError('pop from an empty {}'.format(
+                self.__class__.__name__))
+
+    def pop(self):
+        """
+        Remove and return the last task uid to be dequeued, ``IndexError``
+        if empty. Unlike :py:meth:`popleft` it takes linear time.
+        """
+        if not self._heap:
+            raise IndexError('pop from an empty {}'.format(
+                self.__class__.__name__))
+        entry = max(self._heap)
+        self._heap.remove(entry)
+        heapq.heapify(self._heap)
+        return entry[-1]
+
+    def clear(self):
+        """Remove all task uids."""
+        del self._heap[:]
+
+    def __iter__(self):
+        return iter([entry[-1] for entry in sorted(self._heap)])
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class TaskPoolConfig(ExecutorConfig):
     """
     Configuration object for
-    :py:class:`~testplan.runners.pools.base.Pool` executor resource entity.
+    :py:class:`~testplan.runners.pools.base.TaskPool` executor resource
+    entity.
 
     :param name: Pool name.
     :type name: ``str``
-    :param size: Pool workers size. Default: 4
+    :param size: Number of workers executing tasks. Default: 4
     :type size: ``int``
+    :param task_retries_limit: Maximum times a task can be re-assigned to pool.
+    :type task_retries_limit: ``int``
+    :param max_active_loop_sleep: Maximum value for delay logic in active sleep.
+    :type max_active_loop_sleep: ``int`` or ``float``
+    :param task_ordering: Order in which tasks of the same priority are
+      executed, ``longest_first`` by expected cost of the tasks (unknown
+      costs first) or ``fifo``.
+    :type task_ordering: ``str``
+
+    Also inherits all :py:class:`~testplan.runners.base.ExecutorConfig`
+    options.
+    """
+
+    @classmethod
+    def get_options(cls):
+        """
+        Schema for options validation and assignment of default values.
+        """
+        return {
+            'name': str,
+            ConfigOption('size', default=4): And(int, lambda x: x > 0),
+            ConfigOption('task_retries_limit', default=3): int,
+            ConfigOption('max_active_loop_sleep', default=5): numbers.Number,
+            ConfigOption('task_ordering', default='longest_first'):
+                Or('longest_first', 'fifo')}
+
+
+class PoolConfig(TaskPoolConfig):
+    """
+    Configuration object for
+    :py:class:`~testplan.runners.pools.base.Pool` executor resource entity.
+
     :param worker_type: Type of worker to be initialized.
     :type worker_type: :py:class:`~testplan.runners.pools.base.Worker`
     :param worker_heartbeat: Worker heartbeat period.
@@ -384,12 +596,30 @@ class PoolConfig(ExecutorConfig):
     :type heartbeat_init_window: ``int``
     :param heartbeats_miss_limit: Worker heartbeat period.
     :type heartbeats_miss_limit: ``int``
-    :param task_retries_limit: Maximum times a task can be re-assigned to pool.
-    :type task_retries_limit: ``int``
-    :param max_active_loop_sleep: Maximum value for delay logic in active sleep.
-    :type max_active_loop_sleep: ``int`` or ``float``
-
-    Also inherits all :py:class:`~testplan.runners.base.ExecutorConfig`
+    :param prefetch: Number of tasks each worker keeps queued locally on top
+      of the ones being executed, to avoid a round trip to the pool between
+      short tasks. Prefetched tasks are rescheduled if the worker is lost.
+    :type prefetch: ``int``
+    :param codec: Codec to serialize messages exchanged with workers in
+      other processes, negotiated with each worker on its config request.
+      Falls back to ``pickle`` if not supported by the worker.
+    :type codec: ``str``
+    :param stream_results: Workers send report fragments of the tests as
+      they complete, merged into ``partial_reports`` of the pool until the
+      task result is received. Entries streamed by a worker that is lost are
+      kept in the report of the task if it is discarded.
+    :type stream_results: ``bool``
+    :param work_stealing: Once there are no unassigned tasks left, tasks
+      queued but not started by a worker are reclaimed for workers that
+      request more, so that the end of the run is not held up by the worker
+      that prefetched the most tasks.
+    :type work_stealing: ``bool``
+    :param worker_scan_interval: Minimum interval in seconds between scans of
+      the child processes of a worker that has sent no result within
+      ``worker_inactivity_threshold``, to find out whether it is defunct.
+    :type worker_scan_interval: ``int`` or ``float``
+
+    Also inherits all :py:class:`~testplan.runners.pools.base.TaskPoolConfig`
     options.
     """
 
@@ -399,50 +629,59 @@ class PoolConfig(ExecutorConfig):
         Schema for options validation and assignment of default values.
         """
         return {
-            'name': str,
-            ConfigOption('size', default=4): And(int, lambda x: x > 0),
             ConfigOption('worker_type', default=Worker): object,
             ConfigOption('worker_heartbeat', default=None):
                 Or(int, float, None),
             ConfigOption('heartbeat_init_window', default=1800): int,
             ConfigOption('worker_inactivity_threshold', default=300): int,
             ConfigOption('heartbeats_miss_limit', default=3): int,
-            ConfigOption('task_retries_limit', default=3): int,
-            ConfigOption('max_active_loop_sleep', default=5): numbers.Number}
+            ConfigOption('prefetch', default=0): And(int, lambda x: x >= 0),
+            ConfigOption('codec', default='compact'): Or(*CODECS),
+            ConfigOption('stream_results', default=False): bool,
+            ConfigOption('work_stealing', default=True): bool,
+            ConfigOption('worker_scan_interval', default=30):
+                numbers.Number}
 
 
-class Pool(Executor):
+class MonitorMetrics(object):
     """
-    Pool task executor object that initializes workers and dispatches tasks.
+    Overhead of the worker monitor of a pool: time spent in its iterations,
+    holding the pool lock and scanning worker processes, and heartbeats
+    received against all worker messages that count as heartbeats.
     """
 
-    CONFIG = PoolConfig
-    CONN_MANAGER = RoundRobinConnManager
+    def __init__(self):
+        self.iterations = 0
+        self.duration = 0.0
+        self.lock_duration = 0.0
+        self.scans = 0
+        self.scan_duration = 0.0
+        self.heartbeats = 0
+        self.messages = 0
+
+    def to_dict(self):
+        """Metrics by name."""
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return '{}({})'.format(self.__class__.__name__, ', '.join(
+            '{}={}'.format(name, value)
+            for name, value in sorted(self.to_dict().items())))
+
+
+class TaskPool(Executor):
+    """
+    Base of the pools that execute tasks by their ``priority`` and ``cost``
+    hints and reschedule them on a custom condition.
+    """
+
+    CONFIG = TaskPoolConfig
 
     def __init__(self, **options):
-        super(Pool, self).__init__(**options)
-        self.unassigned = []  # unassigned tasks
+        super(TaskPool, self).__init__(**options)
+        self.unassigned = TaskQueue(self._task_key)  # unassigned tasks
         self.task_assign_cnt = {}  # uid: times_assigned
         self.should_reschedule = default_check_reschedule
-        self._workers = entity.Environment(parent=self)
-        self._workers_last_result = {}
-        self._conn = self.CONN_MANAGER()
-        self._conn.parent = self
-        self._pool_lock = threading.Lock()
-        self._metadata = {}
-        self.make_runpath_dirs()
-        self._metadata['runpath'] = self.runpath
-        self._add_workers()
-
-        # Methods for handling different Message types. These are expected to
-        # take the worker, request and response objects as the only required
-        # positional args.
-        self._request_handlers = {
-            Message.ConfigRequest: self._handle_cfg_request,
-            Message.TaskPullRequest: self._handle_taskpull_request,
-            Message.TaskResults: self._handle_taskresults,
-            Message.Heartbeat: self._handle_heartbeat,
-            Message.SetupFailed: self._handle_setupfailed}
 
     def uid(self):
         """Pool name."""
@@ -450,9 +689,10 @@ class Pool(Executor):
 
     def add(self, task, uid):
         """
-        Add a task for execution.
+        Add a task for execution. Tasks are executed by their ``priority``
+        and ``cost`` hints, see ``task_ordering`` option.
 
-        :param task: Task to be scheduled to workers.
+        :param task: Task to be executed.
         :type task: :py:class:`~testplan.runners.pools.tasks.base.Task`
         :param uid: Task uid.
         :type uid: ``str``
@@ -460,8 +700,26 @@ class Pool(Executor):
         if not isinstance(task, Task):
             raise ValueError('Task was expected, got {} instead.'.format(
                 type(task)))
-        super(Pool, self).add(task, uid)
-        self.unassigned.append(uid)
+        super(TaskPool, self).add(task, uid)
+        if uid in self._input:
+            self.unassigned.append(uid)
+
+    def _task_key(self, uid):
+        """
+        Sort key of a task in the unassigned queue, higher priority first
+        then, for ``longest_first`` ordering, unknown and higher costs first.
+        """
+        task = self._input[uid]
+        if self.cfg.task_ordering == 'fifo':
+            return (-task.priority,)
+        if task.cost is None:
+            return (-task.priority, 0, 0)
+        return (-task.priority, 1, -task.cost)
+
+    def _prepopulate_runnables(self):
+        super(TaskPool, self)._prepopulate_runnables()
+        # Task costs may have been set after the tasks were added.
+        self.unassigned = TaskQueue(self._task_key, self.unassigned)
 
     def set_reschedule_check(self, check_reschedule):
         """
@@ -479,11 +737,112 @@ class Pool(Executor):
         validate_func('pool', 'task_result')(check_reschedule)
         self.should_reschedule = check_reschedule
 
+    def _partial_result(self, uid):
+        """Result of a task that did not finish, ``None`` by default."""
+        return None
+
+    def _discard_pending_tasks(self):
+        self.logger.critical('Discard pending tasks of {}.'.format(self))
+        while self.ongoing:
+            uid = self.ongoing.first()
+            self._results[uid] = TaskResult(
+                task=self._input[uid], status=False,
+                result=self._partial_result(uid),
+                reason='Task [{}] discarding due to {} abort.'.format(
+                    self._input[uid]._target, self))
+            self.ongoing.remove(uid)
+
+    def _print_test_result(self, task_result):
+        if (not isinstance(task_result.result, entity.RunnableResult)) or (
+           not hasattr(task_result.result, 'report')):
+            return
+
+        # Currently prints report top level result and not details.
+        name = task_result.result.report.name
+        if task_result.result.report.passed is True:
+            self.logger.test_info('{} -> {}'.format(name, Color.green('Pass')))
+        else:
+            self.logger.test_info('{} -> {}'.format(name, Color.red('Fail')))
+
+
+class Pool(TaskPool):
+    """
+    Pool task executor object that initializes workers and dispatches tasks.
+    """
+
+    CONFIG = PoolConfig
+    CONN_MANAGER = RoundRobinConnManager
+
+    def __init__(self, **options):
+        super(Pool, self).__init__(**options)
+        # Tasks given back by workers they were reclaimed from, assigned
+        # before the unassigned ones. Entries are the uid and the worker.
+        self.reclaimed = collections.deque()
+        self.partial_reports = {}  # uid: report merged from fragments
+        # Nested pools set this to a deque to forward the fragments received
+        # to their own pool instead of merging them. Entries are the worker,
+        # its response and the fragments, the worker is answered once they
+        # were forwarded.
+        self.report_fragments = None
+        # Responses of other threads to be sent by the pool loop, entries
+        # are the worker and the message.
+        self._deferred_responses = collections.deque()
+        self._workers = entity.Environment(parent=self)
+        self._workers_last_result = {}
+        self._workers_last_killed = {}
+        self._workers_last_scan = {}
+        # Workers being restarted in the background, by worker.
+        self._workers_restarting = {}
+        self.monitor_metrics = MonitorMetrics()
+        self._conn = self.CONN_MANAGER()
+        self._conn.parent = self
+        self._pool_lock = threading.Lock()
+        self._metadata = {}
+        self.make_runpath_dirs()
+        self._metadata['runpath'] = self.runpath
+        self._add_workers()
+
+        # Methods for handling different Message types. These are expected to
+        # take the worker, request and response objects as the only required
+        # positional args.
+        self._request_handlers = {
+            Message.ConfigRequest: self._handle_cfg_request,
+            Message.TaskPullRequest: self._handle_taskpull_request,
+            Message.TaskResults: self._handle_taskresults,
+            Message.TaskReturn: self._handle_task_return,
+            Message.ReportFragment: self._handle_report_fragment,
+            Message.Heartbeat: self._handle_heartbeat,
+            Message.SetupFailed: self._handle_setupfailed}
+
+    def withdraw(self, count):
+        """
+        Remove tasks that were not assigned to workers yet, the ones that
+        would be assigned last first. Used by a worker to give back tasks
+        reclaimed by the pool it pulled them from.
+
+        :param count: Maximum number of tasks to remove.
+        :type count: ``int``
+        :return: Tasks removed.
+        :rtype: ``list`` of :py:class:`~testplan.runners.pools.tasks.base.Task`
+        """
+        tasks = []
+        with self._pool_lock:
+            for _ in range(count):
+                try:
+                    uid = self.unassigned.pop()
+                except IndexError:
+                    break
+                self.ongoing.remove(uid)
+                self.task_assign_cnt.pop(uid, None)
+                tasks.append(self._input.pop(uid))
+        return tasks
+
     def _loop(self):
         """
         Main executor work loop - runs in a seperate thread when the Pool is
         started.
         """
+        self._conn.own()
         # No heartbeat means no fault tolerance for worker.
         if self.cfg.worker_heartbeat:
             self.logger.debug('Starting worker monitor thread.')
@@ -497,13 +856,15 @@ class Pool(Executor):
 
             if not should_continue:
                 break
-            else:
-                time.sleep(self.cfg.active_loop_sleep)
+            elif self.status.tag == self.status.STARTED:
+                # Sleep until a worker sends a request or the pool is woken
+                # up on stop/abort, the timeout is only a safety net.
+                self._conn.poll(timeout=self.cfg.max_active_loop_sleep)
 
     def _loop_process_work(self, curr_status):
         """
-        Poll for work based on the current pool state and process the next item
-        if there is one.
+        Process work based on the current pool state, handling every request
+        that is ready to be received from workers.
 
         :return: Whether to continue the main work loop.
         :rtype: ``bool``
@@ -517,8 +878,13 @@ class Pool(Executor):
             raise RuntimeError('Pool in unexpected state {}'
                                .format(curr_status))
         else:
-            msg = self._conn.accept()
-            if msg:
+            while self._deferred_responses:
+                worker, message = self._deferred_responses.popleft()
+                worker.respond(message)
+            while self.active:
+                msg = self._conn.accept()
+                if not msg:
+                    break
                 try:
                     self.logger.debug('Received message from worker: %s.',
                                       msg)
@@ -529,6 +895,18 @@ class Pool(Executor):
         # The main work loop can continue.
         return True
 
+    def defer_response(self, worker, message):
+        """
+        Have the pool loop send a response to a worker, for threads other
+        than the pool loop as connections are only used by it.
+
+        :param worker: Worker to respond to.
+        :type worker: :py:class:`~testplan.runners.pools.base.Worker`
+        :param message: Response message.
+        :type message: :py:class:`~testplan.runners.pools.communication.Message`
+        """
+        self._deferred_responses.append((worker, message))
+        self._conn.wakeup()
 
     def handle_request(self, request):
         """
@@ -547,7 +925,9 @@ class Pool(Executor):
             worker.respond(Message(**self._metadata).make(Message.Ack))
             return
         else:
+            # Any message from a worker counts as a heartbeat.
             worker.last_heartbeat = time.time()
+            self.monitor_metrics.messages += 1
 
         self.logger.debug('Pool {} request received by {} - {}, {}'.format(
             self.cfg.name, worker, request.cmd, request.data))
@@ -563,8 +943,12 @@ class Pool(Executor):
                 request, dir(request), request.cmd, request.data))
             worker.respond(response.make(Message.Ack))
 
-    def _handle_cfg_request(self, worker, _, response):
-        """Handle a ConfigRequest from a worker."""
+    def _handle_cfg_request(self, worker, request, response):
+        """
+        Handle a ConfigRequest from a worker. The request data contains the
+        codecs supported by the worker, the configured codec is used for
+        messages after the response if supported.
+        """
         options = []
         cfg = self.cfg
 
@@ -578,6 +962,8 @@ class Pool(Executor):
 
         worker.respond(response.make(Message.ConfigSending,
                                      data=options))
+        worker.transport.codec = negotiate_codec(
+            self.cfg.codec, request.data)
 
     def _handle_taskpull_request(self, worker, request, response):
         """Handle a TaskPullRequest from a worker."""
@@ -586,7 +972,7 @@ class Pool(Executor):
         if self.status.tag == self.status.STARTED:
             for _ in range(request.data):
                 try:
-                    uid = self.unassigned.pop(0)
+                    uid = self._pop_unassigned(worker)
                 except IndexError:
                     break
                 if uid not in self.task_assign_cnt:
@@ -598,6 +984,8 @@ class Pool(Executor):
                     continue
                 else:
                     self.task_assign_cnt[uid] += 1
+                    # Fragments of a previous attempt are superseded.
+                    self.partial_reports.pop(uid, None)
                     task = self._input[uid]
                     self.logger.test_info(
                         'Scheduling {} to {}'.format(task, worker))
@@ -607,9 +995,64 @@ class Pool(Executor):
                 worker.respond(response.make(
                     Message.TaskSending, data=tasks))
                 worker.requesting = request.data - len(tasks)
+                # Tasks were available to idle workers as well.
+                worker.reclaim = 0
                 return
 
         worker.requesting = request.data
+        if worker.reclaim:
+            worker.respond(response.make(
+                Message.TaskReclaim, data=worker.reclaim))
+            worker.reclaim = 0
+            return
+        if self.cfg.work_stealing and request.data and \
+                self.status.tag == self.status.STARTED:
+            self._reclaim_tasks(worker, request.data)
+        worker.respond(response.make(Message.Ack))
+
+    def _pop_unassigned(self, worker):
+        """
+        Next task uid to assign to a worker, tasks reclaimed from other
+        workers first. Tasks are only assigned back to the worker they were
+        reclaimed from if no other worker is active.
+        """
+        for idx, (uid, owner) in enumerate(self.reclaimed):
+            if owner is not worker or not any(
+                    other.active for other in self._workers
+                    if other is not worker):
+                del self.reclaimed[idx]
+                return uid
+        return self.unassigned.popleft()
+
+    def _reclaim_tasks(self, worker, count):
+        """
+        Mark tasks to be reclaimed for an idle worker from the worker with
+        the most tasks assigned, up to half of them. They are reclaimed in
+        the response to the next task pull request of that worker, which
+        gives back the ones it has not started.
+        """
+        others = [other for other in self._workers
+                  if other is not worker and other.active]
+        if not others:
+            return
+        busiest = max(others, key=lambda other: len(other.assigned))
+        if len(busiest.assigned) < 2:
+            return
+        busiest.reclaim = max(
+            busiest.reclaim, min(count, len(busiest.assigned) // 2))
+
+    def _handle_task_return(self, worker, request, response):
+        """
+        Handle a TaskReturn message from a worker, with the uids of tasks it
+        gave back after they were reclaimed. Being reclaimed does not count
+        as an attempt of a task.
+        """
+        for uid in request.data:
+            worker.assigned.remove(uid)
+            self.task_assign_cnt[uid] -= 1
+            self.logger.test_info('Reclaimed {} from {}'.format(
+                self._input[uid], worker))
+            self.reclaimed.append((uid, worker))
         worker.respond(response.make(Message.Ack))
 
     def _handle_taskresults(self, worker, request, response):
@@ -617,6 +1060,8 @@ class Pool(Executor):
         for task_result in request.data:
             uid = task_result.task.uid()
             worker.assigned.remove(uid)
+            if uid in self.partial_reports:
+                task_result = self._merge_partial_report(task_result)
             if worker not in self._workers_last_result:
                 self._workers_last_result[worker] = time.time()
             self.logger.test_info('De-assign {} from {}'.format(
@@ -643,9 +1088,65 @@ class Pool(Executor):
 
         worker.respond(response.make(Message.Ack))
 
+    def _handle_report_fragment(self, worker, request, response):
+        """
+        Handle a ReportFragment message from a worker, merging the fragments
+        into the partial reports of the tasks they belong to.
+        """
+        fragments = []
+        for uid, fragment in request.data:
+            if uid not in worker.assigned:
+                self.logger.debug(
+                    'Ignoring report fragment of {} not assigned to {}'.format(
+                        uid, worker))
+            else:
+                fragments.append((uid, fragment))
+
+        if self.report_fragments is not None:
+            self.report_fragments.append((worker, response, fragments))
+            return
+
+        for uid, fragment in fragments:
+            if uid in self.partial_reports:
+                self.partial_reports[uid].merge(fragment, strict=False)
+            else:
+                self.partial_reports[uid] = fragment
+        worker.respond(response.make(Message.Ack))
+
+    def _merge_partial_report(self, task_result):
+        """
+        Put the entries streamed back into the report of the task result,
+        they come before the ones that were not streamed.
+        """
+        uid = task_result.task.uid()
+        report = getattr(task_result.result, 'report', None)
+        if report is None:
+            return TaskResult(
+                task=task_result.task, result=self._partial_result(uid),
+                status=False, reason=task_result.reason)
+        partial = self.partial_reports.pop(uid)
+        streamed = set(entry.uid for entry in partial)
+        report.entries = partial.entries + [
+            entry for entry in report if entry.uid not in streamed]
+        report.build_index()
+        return task_result
+
+    def _partial_result(self, uid):
+        """
+        Result holding the report merged from the fragments streamed for a
+        task that did not finish, ``None`` if nothing was streamed.
+        """
+        partial = self.partial_reports.pop(uid, None)
+        if partial is None:
+            return None
+        result = TestResult()
+        result.report = partial
+        return result
+
     def _handle_heartbeat(self, worker, request, response):
         """Handle a Heartbeat message received from a worker."""
         worker.last_heartbeat = time.time()
+        self.monitor_metrics.heartbeats += 1
         self.logger.debug(
             'Received heartbeat from {} at {} after {}s.'.format(
                 worker, request.data, time.time() - request.data))
@@ -673,42 +1174,53 @@ class Pool(Executor):
             self.unassigned.append(uid)
         worker.abort()
 
-    def _workers_handler_monitoring(self, worker, workers_last_killed={}):
-        inactivity_threshold = self.cfg.worker_inactivity_threshold
-
-        if worker not in workers_last_killed:
-            workers_last_killed[worker] = time.time()
-
-        worker_last_killed = workers_last_killed[worker]
-        if not worker.assigned or\
-            time.time() - worker_last_killed < inactivity_threshold:
-            return
-
+    def _worker_defunct(self, worker):
+        """
+        Whether the process of a worker with tasks assigned looks defunct:
+        all of its children are zombies and it sent no result within the
+        inactivity threshold. Called without holding the pool lock, cheap
+        checks come first and the process tree of a worker is scanned at most
+        once per ``worker_scan_interval``.
+        """
+        now = time.time()
+        threshold = self.cfg.worker_inactivity_threshold
+        last_killed = self._workers_last_killed.setdefault(worker, now)
+        if not worker.assigned or now - last_killed < threshold or \
+                now - self._workers_last_result.get(worker, 0) <= threshold \
+                or now - self._workers_last_scan.get(worker, 0) < \
+                self.cfg.worker_scan_interval:
+            return False
+
+        self._workers_last_scan[worker] = now
         try:
             proc = psutil.Process(worker.handler.pid)
-            children = list(proc.children(recursive=True))
-            worker_last_result = self._workers_last_result.get(worker, 0)
-            if all(item.status() == 'zombie' for item in children) and\
-                    time.time() - worker_last_result > inactivity_threshold:
-                workers_last_killed[worker] = time.time()
-                try:
-                    while worker.assigned:
-                        uid = worker.assigned.pop()
-                        self.logger.test_info(
-                            'Re-assigning {} from {} to {}.'.format(
-                                self._input[uid], worker, self))
-                        self.unassigned.append(uid)
-                    self.logger.test_info(
-                        'Restarting worker: {}'.format(worker))
-                    worker.stop()
-                    worker.start()
-                except Exception as exc:
-                    self.logger.critical(
-                        'Worker {} failed to restart: {}'.format(worker, exc))
-                    self._deco_worker(
-                        worker, 'Aborting {}, due to defunct child process.')
+            return all(child.status() == psutil.STATUS_ZOMBIE
+                       for child in proc.children(recursive=True))
         except psutil.NoSuchProcess:
-            pass
+            return False
+        finally:
+            self.monitor_metrics.scans += 1
+            self.monitor_metrics.scan_duration += time.time() - now
+
+    def _restart_defunct_worker(self, worker):
+        """Re-assign the tasks of a defunct worker and restart it."""
+        self._workers_last_killed[worker] = time.time()
+        try:
+            while worker.assigned:
+                uid = worker.assigned.pop()
+                self.logger.test_info(
+                    'Re-assigning {} from {} to {}.'.format(
+                        self._input[uid], worker, self))
+                self.unassigned.append(uid)
+            self.logger.test_info(
+                'Restarting worker: {}'.format(worker))
+            worker.stop()
+            worker.start()
+        except Exception as exc:
+            self.logger.critical(
+                'Worker {} failed to restart: {}'.format(worker, exc))
+            self._deco_worker(
+                worker, 'Aborting {}, due to defunct child process.')
 
     def _workers_monitoring(self):
         """
@@ -722,19 +1234,31 @@ class Pool(Executor):
         loop_sleep = self.cfg.worker_heartbeat * self.cfg.heartbeats_miss_limit
 
         while self._loop_handler.is_alive():
+            iteration_start = time.time()
             w_total = set()
             w_uninitialized = set()
             w_active = set()
             w_inactive = set()
 
+            # Worker processes are scanned without holding the pool lock.
+            defunct = [worker for worker in self._workers
+                       if getattr(worker, 'handler', None) and
+                       self._worker_defunct(worker)]
+
             monitor_alive = time.time() - monitor_started
             init_window = monitor_alive <= self.cfg.heartbeat_init_window
             with self._pool_lock:
+                lock_acquired = time.time()
+                for worker in defunct:
+                    # Results may have been received since the scan.
+                    if worker.assigned:
+                        self._restart_defunct_worker(worker)
                 for worker in self._workers:
-                    if getattr(worker, 'handler', None):
-                        self._workers_handler_monitoring(worker)
                     w_total.add(worker)
-                    if not worker.active:
+                    if worker in self._workers_restarting:
+                        # Heartbeats resume once it is connected again.
+                        w_active.add(worker)
+                    elif not worker.active:
                         w_inactive.add(worker)
                     elif worker.last_heartbeat is None:
                         w_uninitialized.add(worker)
@@ -748,12 +1272,18 @@ class Pool(Executor):
                     else:
                         w_active.add(worker)
 
-                if w_total:
-                    if len(w_inactive) == len(w_total):
-                        self.logger.critical(
-                            'All workers of {} are inactive.'.format(self))
-                        self.abort()
-                        break
+                all_inactive = w_total and len(w_inactive) == len(w_total)
+                if all_inactive:
+                    self.logger.critical(
+                        'All workers of {} are inactive.'.format(self))
+                    self.abort()
+
+            metrics = self.monitor_metrics
+            metrics.iterations += 1
+            metrics.lock_duration += time.time() - lock_acquired
+            metrics.duration += time.time() - iteration_start
+            if all_inactive:
+                break
 
             try:
                 # For early finish of worker monitoring thread.
@@ -767,31 +1297,10 @@ class Pool(Executor):
             self._input[uid], self, reason))
         self._results[uid] = TaskResult(
             task=self._input[uid], status=False,
+            result=self._partial_result(uid),
             reason='Task discarded by {} - {}.'.format(self, reason))
         self.ongoing.remove(uid)
 
-    def _discard_pending_tasks(self):
-        self.logger.critical('Discard pending tasks of {}.'.format(self))
-        while self.ongoing:
-            uid = self.ongoing[0]
-            self._results[uid] = TaskResult(
-                task=self._input[uid], status=False,
-                reason='Task [{}] discarding due to {} abort.'.format(
-                    self._input[uid]._target, self))
-            self.ongoing.pop(0)
-
-    def _print_test_result(self, task_result):
-        if (not isinstance(task_result.result, entity.RunnableResult)) or (
-           not hasattr(task_result.result, 'report')):
-            return
-
-        # Currently prints report top level result and not details.
-        name = task_result.result.report.name
-        if task_result.result.report.passed is True:
-            self.logger.test_info('{} -> {}'.format(name, Color.green('Pass')))
-        else:
-            self.logger.test_info('{} -> {}'.format(name, Color.red('Fail')))
-
     def _add_workers(self):
         """Initialise worker instances."""
         for idx in (str(i) for i in range(self.cfg.size)):
@@ -826,10 +1335,15 @@ class Pool(Executor):
 
     def stopping(self):
         """Stop connections and workers."""
+        # Wake up the main loop so it can notice the status change.
+        self._conn.wakeup()
         # Stop workers before stopping the connection manager.
         with self._pool_lock:
             self._workers.stop()
             self._conn.stop()
+        if self.cfg.worker_heartbeat:
+            self.logger.debug('Worker monitor of %s: %s',
+                              self, self.monitor_metrics)
         super(Pool, self).stopping()
         self.logger.debug('Stopped %s', self.__class__.__name__)
 
@@ -841,6 +1355,7 @@ class Pool(Executor):
     def aborting(self):
         """Aborting logic."""
         self.logger.debug('Aborting pool {}'.format(self))
+        self._conn.wakeup()
         for worker in self._workers:
             worker.abort()
         self._conn.abort()
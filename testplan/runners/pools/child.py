@@ -2,8 +2,10 @@
 
 import os
 import sys
+import json
 import time
-import pickle
+import select
+import collections
 import signal
 import socket
 import shutil
@@ -11,7 +13,9 @@ import inspect
 import logging
 import argparse
 import platform
+import importlib
 import threading
+import traceback
 import subprocess
 
 
@@ -28,6 +32,7 @@ def parse_cmdline():
     parser.add_argument('--log-level', action="store", default=0, type=int)
     parser.add_argument('--remote-pool-type', action="store", default='thread')
     parser.add_argument('--remote-pool-size', action="store", default=1)
+    parser.add_argument('--preload', action="append", default=[])
 
     return parser.parse_args()
 
@@ -45,13 +50,20 @@ class ZMQTransport(object):
 
     def __init__(self, address, recv_sleep=0.05, recv_timeout=5):
         import zmq
+        from testplan.runners.pools import communication
         self._zmq = zmq
+        self._communication = communication
+        # Pickle until another codec is negotiated with the pool.
+        self.codec = communication.PickleCodec()
         self._recv_sleep = recv_sleep
         self._recv_timeout = recv_timeout
         self._context = zmq.Context()
-        self._sock = self._context.socket(zmq.REQ)
+        # DEALER socket talking to the ROUTER socket of the pool, messages
+        # carry an empty delimiter frame as REQ sockets would send.
+        self._sock = self._context.socket(zmq.DEALER)
         self._sock.connect("tcp://{}".format(address))
         self.active = True
+        self.last_received = None
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def send(self, message):
@@ -61,7 +73,7 @@ class ZMQTransport(object):
         :param message: Message to be sent.
         :type message: :py:class:`~testplan.runners.pools.communication.Message`
         """
-        self._sock.send(pickle.dumps(message))
+        self._sock.send_multipart([b'', self.codec.encode(message)])
 
     def receive(self):
         """
@@ -72,21 +84,21 @@ class ZMQTransport(object):
         """
         start_time = time.time()
         while self.active:
-            try:
-                received = self._sock.recv(flags=self._zmq.NOBLOCK)
+            # Block until the response arrives, waking up every recv_sleep
+            # to check whether the transport is still active.
+            if self._sock.poll(timeout=int(self._recv_sleep * 1000)):
+                received = self._sock.recv_multipart()[-1]
                 try:
-                    loaded = pickle.loads(received)
+                    loaded = self._communication.decode(received)
                 except Exception as exc:
                     print('Deserialization error. - {}'.format(exc))
                     raise
                 else:
                     return loaded
-            except self._zmq.Again:
-                if time.time() - start_time > self._recv_timeout:
-                    print('Transport receive timeout {}s reached!'.format(
-                        self._recv_timeout))
-                    return None
-                time.sleep(self._recv_sleep)
+            elif time.time() - start_time > self._recv_timeout:
+                print('Transport receive timeout {}s reached!'.format(
+                    self._recv_timeout))
+                return None
         return None
 
 
@@ -104,7 +116,6 @@ class ChildLoop(object):
         self._pool_size = int(pool_size)
         self._pool_cfg = None
         self._worker_type = worker_type
-        self._to_heartbeat = float(0)
         self.runpath = runpath
         self.logger = logger
 
@@ -113,21 +124,16 @@ class ChildLoop(object):
         """Metadata information."""
         return self._metadata
 
-    def heartbeat_thread(self):
-        """Manage a variable that indicates the sending of next heartbeat."""
-        while self._pool.status.tag == self._pool.STATUS.STARTED:
-            if self._to_heartbeat > 0:
-                sleep_interval = max(float(self._to_heartbeat)/2, 0.1)
-                self._to_heartbeat -= sleep_interval
-                time.sleep(sleep_interval)
-            else:
-                time.sleep(0.1)
-
-    def heartbeat_setup(self):
-        """Start the heartbeat manager thread."""
-        heartbeat = threading.Thread(target=self.heartbeat_thread,)
-        heartbeat.daemon = True
-        heartbeat.start()
+    def _heartbeat_due(self):
+        """
+        Whether to send a heartbeat, only when no other message was answered
+        by the pool for a heartbeat period as any message counts as one.
+        """
+        if not self._pool_cfg.worker_heartbeat:
+            return False
+        last_received = self._transport.last_received
+        return last_received is None or time.time() - last_received >= \
+            self._pool_cfg.worker_heartbeat
 
     def _child_pool(self):
         # Local thread pool will not cleanup the previous layer runpath.
@@ -135,9 +141,13 @@ class ChildLoop(object):
             name='Pool_{}'.format(self._metadata['pid']),
             worker_type=self._worker_type,
             size=self._pool_size,
-            runpath=self.runpath)
+            runpath=self.runpath,
+            stream_results=self._pool_cfg.stream_results)
         self._pool.parent = self
         self._pool.cfg.parent = self._pool_cfg
+        if self._pool_cfg.stream_results:
+            # Report fragments are forwarded to the main pool.
+            self._pool.report_fragments = collections.deque()
         return self._pool
 
     def _handle_abort(self, signum, frame):
@@ -170,17 +180,19 @@ class ChildLoop(object):
         fhandler.setLevel(self.logger.level)
         self.logger.addHandler = fhandler
 
-    def _send_and_expect(self, message, send, expect):
+    def _send_and_expect(self, message, send, expect, data=None):
         try:
             return self._transport.send_and_receive(message.make(
-                send), expect=expect)
+                send, data=data), expect=expect)
         except AttributeError:
             self.logger.critical('Pool seems dead, child exits.')
             raise
 
     def _pre_loop_setup(self, message):
+        from testplan.runners.pools import communication
         response = self._send_and_expect(
-            message, message.ConfigRequest, message.ConfigSending)
+            message, message.ConfigRequest, message.ConfigSending,
+            data=communication.supported_codecs())
 
         # Response.data: [cfg, cfg.parent, cfg.parent.parent, ...]
         pool_cfg = response.data[0]
@@ -191,12 +203,20 @@ class ChildLoop(object):
             except IndexError:
                 break
         self._pool_cfg = pool_cfg
+        pool_metadata = response.sender_metadata
+        # Same selection as the pool does with the codecs we requested.
+        self._transport.codec = communication.negotiate_codec(
+            pool_cfg.codec, communication.supported_codecs())
+        if getattr(pool_cfg, 'shared_results', False):
+            self._transport.codec = communication.SharedFileCodec(
+                self._transport.codec,
+                os.path.join(str(pool_metadata['runpath']),
+                             communication.SHARED_RESULTS_DIR),
+                threshold=pool_cfg.shared_results_threshold)
 
         for sig in self._pool_cfg.abort_signals:
             signal.signal(sig,  self._handle_abort)
 
-        pool_metadata = response.sender_metadata
-
         self.runpath = self.runpath or str(pool_metadata['runpath'])
         self._setup_logfiles()
 
@@ -218,13 +238,13 @@ class ChildLoop(object):
             return
 
         with self._child_pool():
-            if self._pool_cfg.worker_heartbeat:
-                self.heartbeat_setup()
             message = Message(**self.metadata)
             next_possible_request = time.time()
             request_delay = self._pool_cfg.active_loop_sleep
+            next_reclaim_poll = time.time()
+            reclaim_delay = self._pool_cfg.active_loop_sleep
             while True:
-                if self._pool_cfg.worker_heartbeat and self._to_heartbeat <= 0:
+                if self._heartbeat_due():
                     hb_resp = self._transport.send_and_receive(message.make(
                         message.Heartbeat, data=time.time()))
                     if hb_resp is None:
@@ -237,12 +257,30 @@ class ChildLoop(object):
                             ' {} at {} before {}s.'.format(
                                 hb_resp.cmd, hb_resp.data,
                                 time.time() - hb_resp.data))
-                    self._to_heartbeat = self._pool_cfg.worker_heartbeat
 
-                # Send back results
-                if self._pool.results:
+                # Send back results, after the report fragments of the same
+                # tasks that were received by the local pool before them.
+                result_uids = list(self._pool.results.keys())
+                if self._pool.report_fragments:
+                    forwarded = []
+                    while self._pool.report_fragments:
+                        forwarded.append(
+                            self._pool.report_fragments.popleft())
+                    self._transport.send_and_receive(message.make(
+                        message.ReportFragment,
+                        data=[fragment for _, _, fragments in forwarded
+                              for fragment in fragments]),
+                        expect=message.Ack)
+                    # Local workers wait until their fragments reached the
+                    # main pool, so that they are not lost if the process
+                    # is killed afterwards.
+                    for worker, response, _ in forwarded:
+                        self._pool.defer_response(
+                            worker, response.make(message.Ack))
+
+                if result_uids:
                     task_results = []
-                    for uid in list(self._pool.results.keys()):
+                    for uid in result_uids:
                         task_results.append(self._pool.results[uid])
                         self.logger.debug('Sending back result for {}'.format(
                             self._pool.results[uid].task))
@@ -251,11 +289,23 @@ class ChildLoop(object):
                         message.TaskResults,
                         data=task_results), expect=message.Ack)
 
-                # Request new tasks
-                demand = self._pool.workers_requests() -\
+                # Request new tasks, keeping prefetched ones queued locally
+                # so that local workers do not wait for a round trip.
+                demand = self._pool.workers_requests() +\
+                         self._pool_cfg.prefetch -\
                          len(self._pool.unassigned)
 
-                if demand > 0 and time.time() > next_possible_request:
+                if demand > 0:
+                    pull = time.time() > next_possible_request
+                else:
+                    # Keep polling the pool while tasks are queued locally,
+                    # so that it can reclaim them for idle workers.
+                    demand = 0
+                    pull = self._pool_cfg.work_stealing and \
+                        len(self._pool.unassigned) > 0 and \
+                        time.time() > next_reclaim_poll
+
+                if pull:
                     received = self._transport.send_and_receive(message.make(
                         message.TaskPullRequest, data=demand))
 
@@ -273,6 +323,26 @@ class ChildLoop(object):
                         # Reset workers request counters
                         for worker in self._pool._workers:
                             worker.requesting = 0
+                    elif received.cmd == Message.TaskReclaim:
+                        # Give back tasks not handed to local workers yet,
+                        # no more tasks are available for this child.
+                        returned = self._pool.withdraw(received.data)
+                        for task in returned:
+                            self.logger.debug(
+                                'Returned {} from local pool'.format(task))
+                        self._transport.send_and_receive(message.make(
+                            message.TaskReturn,
+                            data=[task.uid() for task in returned]),
+                            expect=message.Ack)
+                        request_delay = min(
+                            (request_delay + 0.2) * 1.5,
+                            self._pool_cfg.max_active_loop_sleep)
+                        next_possible_request = time.time() + request_delay
+                    elif received.cmd == Message.Ack and not demand:
+                        reclaim_delay = min(
+                            (reclaim_delay + 0.2) * 1.5,
+                            self._pool_cfg.max_active_loop_sleep)
+                        next_reclaim_poll = time.time() + reclaim_delay
                     elif received.cmd == Message.Ack:
                         request_delay = min(
                             (request_delay + 0.2) * 1.5,
@@ -332,12 +402,87 @@ class RemoteChildLoop(ChildLoop):
         super(RemoteChildLoop, self).exit_loop()
 
 
+def _reap_children():
+    """Collect the exit status of child processes that exited."""
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except OSError:
+            return
+        if pid == 0:
+            return
+
+
+def _zygote_child(args, request):
+    """Logic of a process worker forked by the zygote."""
+    # Output goes to the startup file of the worker instead of the pipes
+    # shared with the pool.
+    outfile = os.open(request['outfile'],
+                      os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(outfile, 1)
+    os.dup2(outfile, 2)
+    os.close(devnull)
+    os.close(outfile)
+
+    worker_args = argparse.Namespace(**vars(args))
+    worker_args.type = 'process_worker'
+    worker_args.index = request['index']
+    worker_args.address = request['address']
+    worker_args.log_level = request['log_level']
+    child_logic(worker_args)
+
+
+def zygote_loop(args):
+    """
+    Import the modules used by process workers once, then fork a process
+    worker for each request read from stdin, one JSON line with the index,
+    address, startup file and log level of the worker. The pid of each
+    worker is written back as a JSON line. Requests are expected one at a
+    time, each after the response to the previous one.
+    """
+    # Imported once here for all the workers forked afterwards.
+    import psutil
+    import zmq
+    from testplan.runners.pools import base, communication, process
+    for module in args.preload:
+        importlib.import_module(module)
+
+    while True:
+        ready, _, _ = select.select([sys.stdin], [], [], 1)
+        _reap_children()
+        if not ready:
+            continue
+        line = sys.stdin.readline()
+        if not line:
+            break
+        request = json.loads(line)
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _zygote_child(args, request)
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+        sys.stdout.write(json.dumps({'pid': pid}) + os.linesep)
+        sys.stdout.flush()
+
+
 def child_logic(args):
     """Able to be imported child logic."""
     if args.log_level:
         from testplan.common.utils.logger import TESTPLAN_LOGGER
         TESTPLAN_LOGGER.setLevel(args.log_level)
 
+    if args.type == 'zygote':
+        zygote_loop(args)
+        return
+
     import psutil
     print('Starting child process worker on {}, {} with parent {}'.format(
         socket.gethostname(), os.getpid(), psutil.Process(os.getpid()).ppid()))
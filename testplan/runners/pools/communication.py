@@ -1,5 +1,21 @@
 """Communication protocol for execution pools."""
 
+import os
+import struct
+import tempfile
+import zlib
+from collections import OrderedDict
+
+from six.moves import cPickle
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Directory of the pool runpath for messages passed through files.
+SHARED_RESULTS_DIR = 'shared_results'
+
 
 class Message(object):
     """Object to be used for pool-worker communication."""
@@ -7,7 +23,10 @@ class Message(object):
     Ack = 'Ack'
     TaskSending = 'TaskSending'
     TaskResults = 'TaskResults'
+    ReportFragment = 'ReportFragment'
     TaskPullRequest = 'TaskPullRequest'
+    TaskReclaim = 'TaskReclaim'
+    TaskReturn = 'TaskReturn'
     MetadataPull = 'MetadataPull'
     Metadata = 'Metadata'
     Stop = 'Stop'
@@ -42,3 +61,273 @@ class Message(object):
         self.cmd = cmd
         self.data = data
         return self
+
+
+class PickleCodec(object):
+    """
+    Serializes messages as plain pickle data. It is the fallback codec that
+    every pool and worker supports.
+    """
+
+    name = 'pickle'
+
+    def encode(self, obj):
+        """
+        Serialize an object.
+
+        :param obj: Object to be serialized, usually a message.
+        :type obj: ``object``
+        :return: Serialized data.
+        :rtype: ``bytes``
+        """
+        return cPickle.dumps(obj)
+
+    def decode(self, data):
+        """
+        De-serialize data created by :py:meth:`encode`.
+
+        :param data: Serialized data.
+        :type data: ``bytes``
+        :return: De-serialized object.
+        :rtype: ``object``
+        """
+        return cPickle.loads(data)
+
+
+class CompactCodec(PickleCodec):
+    """
+    Serializes messages in a framed format: a fixed size binary header,
+    followed by the pickled payload that is compressed when it is larger
+    than ``threshold`` bytes.
+
+    Header layout (network byte order): 4 bytes magic, 1 byte version,
+    1 byte compression id, 4 bytes uncompressed payload size.
+
+    :param compression: Compression algorithm, ``zlib`` or ``lz4``.
+    :type compression: ``str``
+    :param threshold: Minimum payload size to compress, in bytes.
+    :type threshold: ``int``
+    :param level: Compression level.
+    :type level: ``int``
+    """
+
+    name = 'compact'
+
+    MAGIC = b'TPMC'
+    VERSION = 1
+    HEADER = struct.Struct('!4sBBI')
+
+    NO_COMPRESSION = 0
+    ZLIB = 1
+    LZ4 = 2
+
+    def __init__(self, compression='zlib', threshold=4096, level=1):
+        self._compression = {'zlib': self.ZLIB, 'lz4': self.LZ4}[compression]
+        if self._compression == self.LZ4 and lz4_frame is None:
+            raise RuntimeError('lz4 package is required for lz4 compression.')
+        self._threshold = threshold
+        self._level = level
+
+    def encode(self, obj):
+        """
+        Serialize an object into a framed, optionally compressed, payload.
+
+        :param obj: Object to be serialized, usually a message.
+        :type obj: ``object``
+        :return: Serialized data.
+        :rtype: ``bytes``
+        """
+        payload = super(CompactCodec, self).encode(obj)
+        size = len(payload)
+        compression = self.NO_COMPRESSION
+
+        if size >= self._threshold:
+            if self._compression == self.ZLIB:
+                compressed = zlib.compress(payload, self._level)
+            else:
+                compressed = lz4_frame.compress(payload)
+            # Incompressible data is sent as is.
+            if len(compressed) < size:
+                payload = compressed
+                compression = self._compression
+
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, compression, size)
+        return header + payload
+
+    def decode(self, data):
+        """
+        De-serialize data created by :py:meth:`encode`, whichever compression
+        algorithm was used.
+
+        :param data: Serialized data.
+        :type data: ``bytes``
+        :return: De-serialized object.
+        :rtype: ``object``
+        """
+        magic, version, compression, size = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError('Invalid compact message header.')
+        payload = data[self.HEADER.size:]
+
+        if compression == self.ZLIB:
+            payload = zlib.decompress(payload)
+        elif compression == self.LZ4:
+            if lz4_frame is None:
+                raise RuntimeError(
+                    'lz4 package is required to decode lz4 payload.')
+            payload = lz4_frame.decompress(payload)
+        elif compression != self.NO_COMPRESSION:
+            raise ValueError('Unknown compression: {}'.format(compression))
+
+        if len(payload) != size:
+            raise ValueError('Corrupted message, expected {} bytes got {}.'
+                             .format(size, len(payload)))
+        return super(CompactCodec, self).decode(payload)
+
+
+class CompactLZ4Codec(CompactCodec):
+    """Compact codec using lz4 compression."""
+
+    name = 'compact-lz4'
+
+    def __init__(self, threshold=4096):
+        super(CompactLZ4Codec, self).__init__(
+            compression='lz4', threshold=threshold)
+
+
+class SharedFileCodec(object):
+    """
+    Wraps the codec of a worker on the same host as its pool to pass large
+    messages through files: the encoded message is written to a file of a
+    directory shared with the pool and only a handle, the magic bytes
+    followed by the file path, is sent. The file is removed when the handle
+    is decoded by :py:func:`decode`, which only accepts handles of files of
+    the directory of the pool.
+
+    :param codec: Codec encoding the messages.
+    :type codec: :py:class:`~testplan.runners.pools.communication.PickleCodec`
+    :param directory: Directory of the files.
+    :type directory: ``str``
+    :param threshold: Minimum encoded size of the messages passed through
+      files, in bytes.
+    :type threshold: ``int``
+    """
+
+    MAGIC = b'TPMF'
+
+    def __init__(self, codec, directory, threshold=65536):
+        self.codec = codec
+        self.name = codec.name
+        self._directory = directory
+        self._threshold = threshold
+
+    def encode(self, obj):
+        """
+        Serialize an object with the wrapped codec, into a file if large.
+
+        :param obj: Object to be serialized, usually a message.
+        :type obj: ``object``
+        :return: Serialized data or handle of the file.
+        :rtype: ``bytes``
+        """
+        data = self.codec.encode(obj)
+        if len(data) < self._threshold:
+            return data
+        fd, path = tempfile.mkstemp(dir=self._directory, suffix='.msg')
+        with os.fdopen(fd, 'wb') as fobj:
+            fobj.write(data)
+        return self.MAGIC + path.encode('utf-8')
+
+    def decode(self, data):
+        """
+        De-serialize data created by :py:meth:`encode`.
+
+        :param data: Serialized data or handle of a file.
+        :type data: ``bytes``
+        :return: De-serialized object.
+        :rtype: ``object``
+        """
+        return decode(data, shared_dir=self._directory)
+
+    @classmethod
+    def load(cls, handle, directory):
+        """
+        Read and remove the file of a handle created by :py:meth:`encode`.
+
+        :param handle: Handle of a file.
+        :type handle: ``bytes``
+        :param directory: Directory of the files.
+        :type directory: ``str``
+        :return: Serialized data written to the file.
+        :rtype: ``bytes``
+        :raises ValueError: if the file is not in the directory.
+        """
+        path = os.path.realpath(handle[len(cls.MAGIC):].decode('utf-8'))
+        if os.path.dirname(path) != os.path.realpath(directory):
+            raise ValueError('Message file {} is not in {}.'.format(
+                path, directory))
+        try:
+            with open(path, 'rb') as fobj:
+                return fobj.read()
+        finally:
+            os.remove(path)
+
+
+CODECS = OrderedDict(
+    (codec.name, codec)
+    for codec in (CompactCodec, CompactLZ4Codec, PickleCodec))
+
+
+def supported_codecs():
+    """
+    Codecs that can be used in the current environment, in order of
+    preference.
+
+    :return: Codec names.
+    :rtype: ``list`` of ``str``
+    """
+    return [name for name in CODECS
+            if name != CompactLZ4Codec.name or lz4_frame is not None]
+
+
+def negotiate_codec(requested, supported):
+    """
+    Select the codec to be used between a pool and a worker. The codec
+    requested by pool configuration is used if the worker supports it,
+    otherwise both sides fall back to pickle.
+
+    :param requested: Codec name requested by pool configuration.
+    :type requested: ``str``
+    :param supported: Codec names supported by the worker.
+    :type supported: ``list`` of ``str`` or ``NoneType``
+    :return: Codec instance.
+    :rtype: :py:class:`~testplan.runners.pools.communication.PickleCodec`
+    """
+    if supported and requested in supported and \
+            requested in supported_codecs():
+        return CODECS[requested]()
+    return PickleCodec()
+
+
+def decode(data, shared_dir=None):
+    """
+    De-serialize data encoded by any of the available codecs. The codec is
+    detected from the data so that messages can be received before the codec
+    negotiation completes.
+
+    :param data: Serialized data.
+    :type data: ``bytes``
+    :param shared_dir: Directory of the messages passed through files by
+      :py:class:`SharedFileCodec`, only accepted if set.
+    :type shared_dir: ``str`` or ``NoneType``
+    :return: De-serialized object.
+    :rtype: ``object``
+    :raises ValueError: on messages passed through files not accepted.
+    """
+    if data[:len(SharedFileCodec.MAGIC)] == SharedFileCodec.MAGIC:
+        if shared_dir is None:
+            raise ValueError('Messages passed through files not accepted.')
+        return decode(SharedFileCodec.load(data, shared_dir))
+    if data[:len(CompactCodec.MAGIC)] == CompactCodec.MAGIC:
+        return CompactCodec().decode(data)
+    return PickleCodec().decode(data)
@@ -1,16 +1,35 @@
 """Connections module."""
 
-import pickle
+import collections
+import functools
+import threading
+import time
 import warnings
 
 import zmq
 
 from .base import ConnectionManager
+from .communication import decode
 
 
 class TCPConnectionManager(ConnectionManager):
     """
     Manages pool-worker TCP communication.
+
+    The pool binds a ZMQ ROUTER socket and workers connect with DEALER
+    sockets, so requests of different workers are not forced into a single
+    lock-step send/receive sequence. Every request received records the
+    identity of the sending worker socket, which is then used to route the
+    response back to it.
+
+    The first request of a worker also tells that it started, workers wait
+    for it with the ``wait_connected`` callable set on their transport. It is
+    received by the thread that owns the socket, see :py:meth:`own`: the
+    thread that started the manager until the pool loop takes it over.
+
+    ZMQ sockets are not thread-safe, so messages are only received and sent
+    by the owner thread, other threads raise a ``RuntimeError``. The socket
+    is closed under the same lock once the workers are stopped.
     """
 
     def __init__(self):
@@ -22,6 +41,21 @@ class TCPConnectionManager(ConnectionManager):
         self._context = None
         self._sock = None
         self._address = None
+        self._workers_by_index = {}
+        # Messages received while waiting for workers to connect.
+        self._pending = collections.deque()
+        # Directory of the messages passed through files, set by pools
+        # whose workers were configured to do so.
+        self.shared_results_dir = None
+        # Inproc socket pair used to interrupt a blocking poll, together with
+        # locks as ZMQ sockets must not be used concurrently by threads.
+        self._poller = None
+        self._wake_sock = None
+        self._wake_recv_sock = None
+        self._wake_lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        # Thread receiving the messages of the workers.
+        self._owner = None
 
     def __del__(self):
         """
@@ -41,7 +75,7 @@ class TCPConnectionManager(ConnectionManager):
             raise RuntimeError('Parent pool was not set - cannot start.')
 
         self._context = zmq.Context()
-        self._sock = self._context.socket(zmq.REP)
+        self._sock = self._context.socket(zmq.ROUTER)
         if self.parent.cfg.port == 0:
             port_selected = self._sock.bind_to_random_port(
                 "tcp://{}".format(self.parent.cfg.host))
@@ -50,6 +84,17 @@ class TCPConnectionManager(ConnectionManager):
                                                  self.parent.cfg.port))
             port_selected = self.parent.cfg.port
         self._address = '{}:{}'.format(self.parent.cfg.host, port_selected)
+
+        wake_address = 'inproc://pool-wakeup-{}'.format(id(self))
+        self._wake_recv_sock = self._context.socket(zmq.PAIR)
+        self._wake_recv_sock.bind(wake_address)
+        self._wake_sock = self._context.socket(zmq.PAIR)
+        self._wake_sock.connect(wake_address)
+
+        self._poller = zmq.Poller()
+        self._poller.register(self._sock, zmq.POLLIN)
+        self._poller.register(self._wake_recv_sock, zmq.POLLIN)
+        self.own()
         super(TCPConnectionManager, self).starting()
 
     def stopping(self):
@@ -70,8 +115,44 @@ class TCPConnectionManager(ConnectionManager):
     def register(self, worker):
         """Register a new worker."""
         super(TCPConnectionManager, self).register(worker)
-        worker.transport.connection = self._sock
+        self._workers_by_index[str(worker.uid())] = worker
+        worker.transport.connection = self
         worker.transport.address = self._address
+        worker.transport.wait_connected = functools.partial(
+            self.wait_connected, worker)
+
+    def own(self):
+        """
+        Make the calling thread the one receiving the messages of the
+        workers, other threads waiting for a worker to connect are notified
+        by it.
+        """
+        self._owner = threading.current_thread()
+
+    def _check_owner(self):
+        """Raise if the calling thread does not own the socket."""
+        if self._owner is not threading.current_thread():
+            raise RuntimeError(
+                'Socket of {} used by {}, it is owned by {}.'.format(
+                    self.parent, threading.current_thread().name,
+                    getattr(self._owner, 'name', None)))
+
+    def send(self, identity, data):
+        """
+        Send a message to a worker, from the thread owning the socket.
+
+        :param identity: Identity of the worker socket.
+        :type identity: ``bytes``
+        :param data: Serialized message.
+        :type data: ``bytes``
+        """
+        self._check_owner()
+        with self._poll_lock:
+            if self._sock is None:
+                raise RuntimeError(
+                    'Cannot send, connections of {} are closed.'.format(
+                        self.parent))
+            self._sock.send_multipart([identity, b'', data])
 
     def accept(self):
         """
@@ -83,9 +164,110 @@ class TCPConnectionManager(ConnectionManager):
             :py:class:`~testplan.runners.pools.communication.Message`
         """
         try:
-            return pickle.loads(self._sock.recv(flags=zmq.NOBLOCK))
-        except zmq.Again:
+            return self._pending.popleft()
+        except IndexError:
+            return self._receive()
+
+    def wait_connected(self, worker, timeout):
+        """
+        Block until a first message of a worker is received or the timeout
+        expires. On the thread owning the socket, messages received meanwhile
+        are kept for :py:meth:`accept`; other threads, i.e restarting a
+        worker while the pool loop runs, wait for the owner to receive it.
+
+        :param worker: Worker registered to this connection manager.
+        :type worker: :py:class:`~testplan.runners.pools.base.Worker`
+        :param timeout: Maximum time to block in seconds.
+        :type timeout: ``float``
+        :return: True if the worker is connected.
+        :rtype: ``bool``
+        """
+        if self._owner is not threading.current_thread():
+            return worker.transport.connected.wait(timeout)
+
+        end_time = time.time() + timeout
+        while not worker.transport.connected.is_set():
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                return False
+            with self._poll_lock:
+                if self._sock is None:
+                    return False
+                # Short polls not to hold the lock for long.
+                if not self._sock.poll(
+                        timeout=int(min(remaining, 0.1) * 1000)):
+                    continue
+            message = self._receive()
+            if message is not None:
+                self._pending.append(message)
+                self.wakeup()
+        return True
+
+    def _receive(self):
+        """Receive a message from the socket without blocking."""
+        self._check_owner()
+        with self._poll_lock:
+            if self._sock is None:
+                return None
+            try:
+                frames = self._sock.recv_multipart(flags=zmq.NOBLOCK)
+            except zmq.Again:
+                return None
+
+        # Frames are [worker identity, empty delimiter, payload].
+        identity, payload = frames[0], frames[-1]
+        try:
+            message = decode(payload, shared_dir=self.shared_results_dir)
+        except ValueError as exc:
+            self.logger.error('Dropped message that could not be decoded: %s',
+                              exc)
             return None
+        worker = self._workers_by_index.get(
+            str(message.sender_metadata.get('index')))
+        if worker is not None:
+            # Socket identity changes if the worker process is restarted.
+            worker.transport.identity = identity
+            worker.transport.connected.set()
+        else:
+            self.logger.error('Received message from unknown worker: %s',
+                              message.sender_metadata)
+        return message
+
+    def poll(self, timeout):
+        """
+        Block until a worker message is ready to be received, the timeout
+        expires or :py:meth:`wakeup` is called.
+
+        :param timeout: Maximum time to block in seconds.
+        :type timeout: ``float``
+        :return: True if a message is ready.
+        :rtype: ``bool``
+        """
+        self._check_owner()
+        if self._pending:
+            return True
+        with self._poll_lock:
+            if self._poller is None:
+                return False
+            events = dict(self._poller.poll(timeout=int(timeout * 1000)))
+            if self._wake_recv_sock in events:
+                # Drain all pending wake-up signals.
+                while True:
+                    try:
+                        self._wake_recv_sock.recv(flags=zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+            return self._sock in events
+
+    def wakeup(self):
+        """Interrupt a blocking :py:meth:`poll`."""
+        with self._wake_lock:
+            if self._wake_sock is not None:
+                try:
+                    self._wake_sock.send(b'', flags=zmq.NOBLOCK)
+                except zmq.Again:
+                    # Enough wake-up signals are already queued.
+                    pass
 
     def _unregister_workers(self):
         """Remove references to TCP connections from workers."""
@@ -95,14 +277,24 @@ class TCPConnectionManager(ConnectionManager):
                                    .format(worker.status.tag))
             worker.transport.connection = None
             worker.transport.address = None
+            worker.transport.identity = None
+            worker.transport.wait_connected = None
+        self._workers_by_index = {}
+        self._pending.clear()
         super(TCPConnectionManager, self)._unregister_workers()
 
     def _close(self):
         """Closes TCP connections managed by this object.."""
         self.logger.debug('Closing TCP connections for %s', self.parent)
-        self._sock.close()
-        self._sock = None
-        self._context.destroy()
-        self._context = None
-        self._address = None
+        self.wakeup()
+        with self._poll_lock, self._wake_lock:
+            self._poller = None
+            for sock in (self._sock, self._wake_sock, self._wake_recv_sock):
+                if sock is not None:
+                    sock.close()
+            self._sock = self._wake_sock = self._wake_recv_sock = None
+            if self._context is not None:
+                self._context.destroy()
+            self._context = None
+            self._address = None
 
@@ -0,0 +1,213 @@
+"""In-process pool that hands tasks to its threads directly."""
+
+import inspect
+import threading
+
+from testplan.common import entity
+from testplan.common.utils.exceptions import format_trace
+from testplan.common.utils.thread import interruptible_join
+
+from .base import TaskPool, TaskPoolConfig
+from .tasks import TaskResult
+
+
+class DirectPoolConfig(TaskPoolConfig):
+    """
+    Configuration object for
+    :py:class:`~testplan.runners.pools.direct.DirectPool` executor resource
+    entity. The ``size`` option is the number of threads executing tasks and
+    ``max_active_loop_sleep`` the maximum time an idle thread waits before
+    checking the pool status again, it is woken up as soon as a task is
+    added or the pool stops.
+
+    Inherits all :py:class:`~testplan.runners.pools.base.TaskPoolConfig`
+    options.
+    """
+
+
+class DirectPool(TaskPool):
+    """
+    Pool task executor whose threads take tasks from a shared queue and
+    execute them, with no transport and worker messages in between.
+
+    It accepts tasks and reschedules them like
+    :py:class:`~testplan.runners.pools.base.Pool` but, with no worker
+    resources to monitor, it is meant for in-process tasks that are short
+    or many, where the round trip of each message to a pool worker thread
+    is a large part of the run time.
+    """
+
+    CONFIG = DirectPoolConfig
+
+    def __init__(self, **options):
+        super(DirectPool, self).__init__(**options)
+        # Guards the task queues and results, notified when a task is added
+        # or the pool stops.
+        self._cond = threading.Condition()
+        self._running = {}  # uid: target being executed
+        self._threads = []
+
+    def add(self, task, uid):
+        """
+        Add a task for execution, waking up an idle thread.
+
+        :param task: Task to be executed.
+        :type task: :py:class:`~testplan.runners.pools.tasks.base.Task`
+        :param uid: Task uid.
+        :type uid: ``str``
+        """
+        with self._cond:
+            super(DirectPool, self).add(task, uid)
+            self._cond.notify()
+
+    def _loop(self):
+        """
+        Main executor loop - starts the threads executing tasks and waits
+        for them to finish once the pool stops.
+        """
+        if self.status.tag == self.status.STARTING:
+            self.status.change(self.status.STARTED)
+
+        self._threads = [
+            threading.Thread(target=self._work,
+                             name='{}[{}]'.format(self.cfg.name, idx))
+            for idx in range(self.cfg.size)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+        for thread in self._threads:
+            interruptible_join(thread)
+
+        if self.status.tag == self.status.STOPPING:
+            self.status.change(self.status.STOPPED)
+
+    def _accepts_tasks(self):
+        return self.active and self.status.tag == self.status.STARTED
+
+    def _next_task(self):
+        """
+        Wait for the next task to execute, ``None`` once the pool stops.
+        Must be called with the condition held.
+        """
+        while self._accepts_tasks():
+            try:
+                uid = self.unassigned.popleft()
+            except IndexError:
+                # Woken up as soon as there is a task, the timeout only
+                # bounds the delay to notice a status change.
+                self._cond.wait(self.cfg.max_active_loop_sleep)
+            else:
+                self.task_assign_cnt[uid] = \
+                    self.task_assign_cnt.get(uid, 0) + 1
+                return uid
+        return None
+
+    def _work(self):
+        """Execute tasks until the pool stops."""
+        while True:
+            with self._cond:
+                uid = self._next_task()
+                if uid is None:
+                    return
+            task_result = self._execute(uid)
+            with self._cond:
+                self._running.pop(uid, None)
+                self._handle_task_result(uid, task_result)
+
+    def _execute(self, uid):
+        """
+        Executes a task and return the associated task result.
+
+        :param uid: Task uid.
+        :type uid: ``str``
+        :return: Task result.
+        :rtype: :py:class:`~testplan.runners.pools.tasks.base.TaskResult`
+        """
+        task = self._input[uid]
+        try:
+            target = task.materialize()
+            if isinstance(target, entity.Runnable):
+                if not target.parent:
+                    target.parent = self
+                if not target.cfg.parent:
+                    target.cfg.parent = self.cfg
+                with self._cond:
+                    self._running[uid] = target
+                result = target.run()
+            elif callable(target):
+                result = target()
+            else:
+                result = target.run()
+        except BaseException as exc:
+            task_result = TaskResult(
+                task=task, result=None, status=False,
+                reason=format_trace(inspect.trace(), exc))
+        else:
+            task_result = TaskResult(task=task, result=result, status=True)
+        return task_result
+
+    def _handle_task_result(self, uid, task_result):
+        """
+        Record the result of a task or reschedule it. Must be called with the
+        condition held.
+        """
+        if uid not in self.ongoing:
+            # Discarded on abort while it was running.
+            return
+        if self.should_reschedule(self, task_result):
+            if self.task_assign_cnt[uid] >= self.cfg.task_retries_limit:
+                self.logger.test_info(
+                    'Will not reschedule %(input)s again as it '
+                    'reached max retries %(retries)d',
+                    {'input': self._input[uid],
+                     'retries': self.cfg.task_retries_limit})
+            else:
+                self.logger.test_info(
+                    'Rescheduling {} due to '
+                    'should_reschedule() cfg option of {}'.format(
+                        task_result.task, self))
+                self.unassigned.append(uid)
+                self._cond.notify()
+                return
+
+        self._print_test_result(task_result)
+        self._results[uid] = task_result
+        self.ongoing.remove(uid)
+
+    def _discard_pending_tasks(self):
+        super(DirectPool, self)._discard_pending_tasks()
+        self.unassigned.clear()
+
+    def _wakeup(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def starting(self):
+        """Starting the pool threads."""
+        self.make_runpath_dirs()
+        super(DirectPool, self).starting()
+        self.logger.debug('%s started.', self.__class__.__name__)
+
+    def stopping(self):
+        """
+        Stop the pool threads, once they finished the tasks they are
+        executing.
+        """
+        self._wakeup()
+        super(DirectPool, self).stopping()
+        self.logger.debug('Stopped %s', self.__class__.__name__)
+
+    def abort_dependencies(self):
+        """Abort the tasks being executed before aborting self."""
+        with self._cond:
+            running = list(self._running.values())
+        for target in running:
+            yield target
+
+    def aborting(self):
+        """Aborting logic, will not wait running tasks."""
+        self.logger.debug('Aborting pool {}'.format(self))
+        with self._cond:
+            self._discard_pending_tasks()
+            self._cond.notify_all()
+        self.logger.debug('Aborted pool {}'.format(self))
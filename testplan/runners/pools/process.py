@@ -3,19 +3,26 @@
 import os
 import re
 import sys
+import json
 import time
-import pickle
+import select
+import shutil
 import signal
+import threading
 import subprocess
+import psutil
 from schema import Or, And, Use
 
 import testplan
 from testplan.common.utils.logger import TESTPLAN_LOGGER
 from testplan.common.config import ConfigOption
+from testplan.common.utils.path import makedirs
 from testplan.common.utils.process import kill_process
+from testplan.common.utils.thread import interruptible_join
 from testplan.common.utils.match import match_regexps_in_file
 
 from .base import Pool, PoolConfig, Worker, WorkerConfig
+from .communication import Message, PickleCodec, SHARED_RESULTS_DIR
 from .connection import TCPConnectionManager
 
 
@@ -31,6 +38,14 @@ class ProcessTransport(object):
     def __init__(self, recv_sleep=0.05):
         self.connection = None
         self.address = None
+        # Identity of the worker socket, the response is routed to it.
+        self.identity = None
+        # Set once a message of the worker process was received, and
+        # callable set by the connection manager to wait for it.
+        self.connected = threading.Event()
+        self.wait_connected = None
+        # Pickle until another codec is negotiated with the worker.
+        self.codec = PickleCodec()
 
     def respond(self, message):
         """
@@ -40,7 +55,143 @@ class ProcessTransport(object):
         :param message: Respond message.
         :type message: :py:class:`~testplan.runners.pools.communication.Message`
         """
-        self.connection.send(pickle.dumps(message))
+        if self.identity is None:
+            raise RuntimeError('Cannot respond, worker identity is unknown.')
+        self.connection.send(self.identity, self.codec.encode(message))
+
+
+class ForkedProcess(object):
+    """
+    Handle of a process forked by a :py:class:`Zygote`, with the part of the
+    ``subprocess.Popen`` interface used for process workers. The process is
+    not a child of the pool process so its exit code is unknown, ``-1`` is
+    reported once it exited.
+
+    :param pid: Process id.
+    :type pid: ``int``
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+        self._proc = psutil.Process(pid)
+
+    def poll(self):
+        """Exit code of the process, ``None`` if it is running."""
+        if self.returncode is None:
+            try:
+                running = self._proc.status() != psutil.STATUS_ZOMBIE
+            except psutil.NoSuchProcess:
+                running = False
+            if not running:
+                self.returncode = -1
+        return self.returncode
+
+    def wait(self, timeout=None):
+        """Wait for the process to exit and return its exit code."""
+        try:
+            self._proc.wait(timeout=timeout)
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.TimeoutExpired:
+            # A zombie waiting for the zygote to collect it has exited.
+            if self.poll() is None:
+                raise
+        self.returncode = -1
+        return self.returncode
+
+    def send_signal(self, sig):
+        """Send a signal to the process if it is running."""
+        if self.poll() is None:
+            try:
+                self._proc.send_signal(sig)
+            except psutil.NoSuchProcess:
+                pass
+
+    def terminate(self):
+        """Terminate the process with SIGTERM."""
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        """Kill the process with SIGKILL."""
+        self.send_signal(signal.SIGKILL)
+
+
+class Zygote(object):
+    """
+    Process that imports testplan and the modules used by process workers
+    once, then forks the workers of a pool so that each of them does not
+    start a new interpreter and import them again.
+
+    :param cmd: Command starting the zygote.
+    :type cmd: ``list`` of ``str``
+    :param outfile: File receiving the output of the zygote.
+    :type outfile: ``str``
+    """
+
+    def __init__(self, cmd, outfile):
+        self.cmd = cmd
+        self.outfile = outfile
+        self._handler = None
+        self._lock = threading.Lock()
+
+    @property
+    def handler(self):
+        """Zygote process handler."""
+        return self._handler
+
+    def start(self):
+        """Start the zygote process, it imports modules in background."""
+        with open(self.outfile, 'wb') as out:
+            self._handler = subprocess.Popen(
+                [str(arg) for arg in self.cmd],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=out)
+
+    def fork(self, index, address, outfile, log_level, timeout=120):
+        """
+        Fork a process worker.
+
+        :param index: Worker index.
+        :type index: ``str``
+        :param address: Pool address for the worker to connect to.
+        :type address: ``str``
+        :param outfile: File receiving the output of the worker.
+        :type outfile: ``str``
+        :param log_level: Log level of the worker.
+        :type log_level: ``int``
+        :param timeout: Timeout for the zygote to fork the worker, it
+          includes the time to import modules for the first worker.
+        :type timeout: ``int``
+        :return: Handle of the forked process.
+        :rtype: :py:class:`ForkedProcess`
+        """
+        request = {'index': index, 'address': address,
+                   'outfile': outfile, 'log_level': log_level}
+        # The zygote serves one request at a time.
+        with self._lock:
+            self._handler.stdin.write(
+                (json.dumps(request) + os.linesep).encode('utf-8'))
+            self._handler.stdin.flush()
+            ready, _, _ = select.select(
+                [self._handler.stdout], [], [], timeout)
+            line = self._handler.stdout.readline() if ready else None
+        if not line:
+            raise RuntimeError(
+                'Zygote did not fork {} (returncode = {}, logfile = {})'
+                .format(index, self._handler.poll(), self.outfile))
+        return ForkedProcess(json.loads(line.decode('utf-8'))['pid'])
+
+    def stop(self):
+        """
+        Stop the zygote, along with the workers forked from it that are still
+        running. Called once the workers of the pool are stopped.
+        """
+        if self._handler:
+            self._handler.stdin.close()
+            kill_process(self._handler)
+            self._handler.wait()
+            self._handler.stdout.close()
+        self._handler = None
 
 
 class ProcessWorkerConfig(WorkerConfig):
@@ -79,6 +230,10 @@ class ProcessWorker(Worker):
     def __init__(self, **options):
         super(ProcessWorker, self).__init__(**options)
         self._handler = None
+        # Tasks completed by the current child process, and the reason for
+        # the pool to restart it once its tasks are drained.
+        self.tasks_done = 0
+        self.recycling = None
 
     @property
     def handler(self):
@@ -106,6 +261,21 @@ class ProcessWorker(Worker):
 
     def starting(self):
         """Start a child process worker."""
+        self._transport.connected.clear()
+        self.tasks_done = 0
+        self.recycling = None
+        self.reclaim = 0
+        zygote = getattr(self.parent, 'zygote', None)
+        if zygote is not None:
+            self._handler = zygote.fork(
+                index=self.cfg.index, address=self.transport.address,
+                outfile=self.outfile,
+                log_level=TESTPLAN_LOGGER.getEffectiveLevel(),
+                timeout=self.cfg.start_timeout)
+            self.logger.debug('Forked child process %s - output at %s',
+                              self._handler.pid, self.outfile)
+            return
+
         # NOTE: Worker resource has no runpath.
         cmd = self._proc_cmd()
         self.logger.debug('{} executes cmd: {}'.format(self, cmd))
@@ -119,7 +289,36 @@ class ProcessWorker(Worker):
         self._handler.stdin.write(bytes('y\n'.encode('utf-8')))
 
     def _wait_started(self, timeout=None):
-        """TODO."""
+        """
+        Wait for the first request of the child process to reach the pool,
+        workers are started once they are connected. The startup file is
+        only read as a diagnostic if they do not.
+        """
+        if self._transport.wait_connected is None:
+            self._wait_started_in_log()
+            return
+
+        st_time = time.time()
+        while time.time() - st_time < self.cfg.start_timeout:
+            if self._transport.wait_connected(timeout=0.5):
+                self.status.change(self.STATUS.STARTED)
+                return
+            if self._handler.poll() is not None:
+                raise RuntimeError(
+                    '{proc} process exited: {rc} (logfile = {log})'.format(
+                        proc=self, rc=self._handler.returncode,
+                        log=self.outfile))
+        started = os.path.exists(self.outfile) and match_regexps_in_file(
+            self.outfile, [re.compile('Starting child process worker on')])[0]
+        raise RuntimeError(
+            '{proc} did not connect to the pool in {timeout}s, child process '
+            '{state} (logfile = {log})'.format(
+                proc=self, timeout=self.cfg.start_timeout,
+                state='started' if started else 'did not start',
+                log=self.outfile))
+
+    def _wait_started_in_log(self):
+        """Wait for the child process to log that it started."""
         st_time = time.time()
         sleep_interval = 0.04
         while time.time() - st_time < self.cfg.start_timeout:
@@ -169,6 +368,29 @@ class ProcessPoolConfig(PoolConfig):
     :type port: ``int``
     :param worker_heartbeat: Worker heartbeat period.
     :type worker_heartbeat: ``int`` or ``float`` or ``NoneType``
+    :param worker_start_method: ``spawn`` to start every worker with a new
+      interpreter, or ``zygote`` to fork workers from a process that imports
+      testplan and ``preload_modules`` once. Zygote is only supported on
+      POSIX systems, workers are spawned on others.
+    :type worker_start_method: ``str``
+    :param preload_modules: Modules imported by the zygote for all workers,
+      e.g. the modules of the tests, importable from the current directory.
+    :type preload_modules: ``list`` of ``str``
+    :param max_tasks_per_worker: Number of tasks after which a worker is
+      restarted, once the tasks it was assigned are completed or reclaimed.
+    :type max_tasks_per_worker: ``int`` or ``NoneType``
+    :param max_worker_rss: Resident memory in bytes of a worker process,
+      sampled when it sends results, above which it is restarted once the
+      tasks it was assigned are completed or reclaimed.
+    :type max_worker_rss: ``int`` or ``NoneType``
+    :param shared_results: Workers pass messages of at least
+      ``shared_results_threshold`` bytes, such as large task results,
+      through files of the pool runpath and only send their path over the
+      socket.
+    :type shared_results: ``bool``
+    :param shared_results_threshold: Minimum encoded size in bytes of the
+      messages passed through files.
+    :type shared_results_threshold: ``int``
 
     Also inherits all :py:class:`~testplan.runners.pools.base.PoolConfig`
     options.
@@ -185,7 +407,18 @@ class ProcessPoolConfig(PoolConfig):
             ConfigOption('worker_type', default=ProcessWorker): object,
             ConfigOption('host', default='127.0.0.1'): str,
             ConfigOption('port', default=0): int,
-            ConfigOption('worker_heartbeat', default=5): Or(int, float, None)
+            ConfigOption('worker_heartbeat', default=5):
+                Or(int, float, None),
+            ConfigOption('worker_start_method', default='spawn'):
+                Or('spawn', 'zygote'),
+            ConfigOption('preload_modules', default=[]): [str],
+            ConfigOption('max_tasks_per_worker', default=None):
+                Or(None, And(int, lambda x: x > 0)),
+            ConfigOption('max_worker_rss', default=None):
+                Or(None, And(int, lambda x: x > 0)),
+            ConfigOption('shared_results', default=False): bool,
+            ConfigOption('shared_results_threshold', default=65536):
+                And(int, lambda x: x > 0)
         }
 
 
@@ -197,3 +430,187 @@ class ProcessPool(Pool):
 
     CONFIG = ProcessPoolConfig
     CONN_MANAGER = TCPConnectionManager
+
+    def __init__(self, **options):
+        super(ProcessPool, self).__init__(**options)
+        self.zygote = None
+
+    def _zygote_cmd(self):
+        """Command to start the zygote process."""
+        from testplan.common.utils.path import fix_home_prefix
+        child = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'child.py')
+        cmd = [sys.executable, fix_home_prefix(child),
+               '--testplan', os.path.join(os.path.dirname(testplan.__file__),
+                                          '..'),
+               '--wd', os.getcwd(),
+               '--type', 'zygote',
+               '--log-level', TESTPLAN_LOGGER.getEffectiveLevel()]
+        if os.environ.get(testplan.TESTPLAN_DEPENDENCIES_PATH):
+            cmd.extend(
+                ['--testplan-deps', fix_home_prefix(
+                    os.environ[testplan.TESTPLAN_DEPENDENCIES_PATH])])
+        for module in self.cfg.preload_modules:
+            cmd.extend(['--preload', module])
+        return cmd
+
+    @property
+    def _shared_results_dir(self):
+        """Directory of the messages passed through files by workers."""
+        return os.path.join(self._metadata['runpath'], SHARED_RESULTS_DIR)
+
+    def starting(self):
+        """Start the zygote if workers are forked, then the pool."""
+        if self.cfg.shared_results:
+            makedirs(self._shared_results_dir)
+            self._conn.shared_results_dir = self._shared_results_dir
+        if self.cfg.worker_start_method == 'zygote':
+            if hasattr(os, 'fork'):
+                self.zygote = Zygote(
+                    self._zygote_cmd(),
+                    os.path.join(self.runpath, 'zygote_startup'))
+                self.zygote.start()
+            else:
+                self.logger.warning(
+                    'Cannot fork workers of %s, spawning them.', self)
+        try:
+            super(ProcessPool, self).starting()
+        except Exception:
+            self._stop_zygote()
+            raise
+
+    def stopping(self):
+        """Stop the pool and workers, then the zygote."""
+        self._join_restarting_workers()
+        super(ProcessPool, self).stopping()
+        self._stop_zygote()
+        self._remove_shared_results()
+
+    def aborting(self):
+        """Abort the pool and workers, then the zygote."""
+        super(ProcessPool, self).aborting()
+        self._stop_zygote()
+        self._remove_shared_results()
+
+    def handle_request(self, request):
+        """
+        Handles a worker request, ignoring the ones sent by the previous
+        process of a worker that was restarted.
+
+        :param request: Worker request.
+        :type request: :py:class:`~testplan.runners.pools.communication.Message`
+        """
+        worker = self._workers[request.sender_metadata['index']]
+        pid = request.sender_metadata.get('pid')
+        if pid is not None and worker.handler is not None and \
+                pid != worker.handler.pid:
+            self.logger.debug('Ignoring {} from previous process {} of {}'
+                              .format(request.cmd, pid, worker))
+            return
+        super(ProcessPool, self).handle_request(request)
+
+    def _handle_taskpull_request(self, worker, request, response):
+        """
+        Handle a TaskPullRequest from a worker, a worker to be restarted is
+        not assigned new tasks and gives back the ones it has not started.
+        """
+        if worker.recycling is None or \
+                self.status.tag != self.status.STARTED:
+            super(ProcessPool, self)._handle_taskpull_request(
+                worker, request, response)
+            return
+
+        worker.requesting = 0
+        if worker.assigned:
+            worker.respond(response.make(
+                Message.TaskReclaim, data=len(worker.assigned)))
+        else:
+            worker.respond(response.make(Message.Ack))
+        self._recycle_if_drained(worker)
+
+    def _handle_taskresults(self, worker, request, response):
+        """
+        Handle a TaskResults message from a worker, deciding whether to
+        restart it from the number of tasks it completed and its memory.
+        """
+        super(ProcessPool, self)._handle_taskresults(
+            worker, request, response)
+        worker.tasks_done += len(request.data)
+        if worker.recycling is None:
+            worker.recycling = self._recycle_reason(worker)
+            if worker.recycling is not None:
+                self.logger.test_info('Draining {} to restart it, {}.'.format(
+                    worker, worker.recycling))
+        self._recycle_if_drained(worker)
+
+    def _handle_task_return(self, worker, request, response):
+        """Handle a TaskReturn message, a drained worker is restarted."""
+        super(ProcessPool, self)._handle_task_return(
+            worker, request, response)
+        self._recycle_if_drained(worker)
+
+    def _recycle_reason(self, worker):
+        """Reason to restart a worker, ``None`` if it should keep running."""
+        max_tasks = self.cfg.max_tasks_per_worker
+        if max_tasks and worker.tasks_done >= max_tasks:
+            return 'completed {} tasks'.format(worker.tasks_done)
+        if self.cfg.max_worker_rss and worker.handler:
+            try:
+                rss = psutil.Process(worker.handler.pid).memory_info().rss
+            except psutil.Error:
+                return None
+            if rss >= self.cfg.max_worker_rss:
+                return 'uses {} bytes of memory'.format(rss)
+        return None
+
+    def _recycle_if_drained(self, worker):
+        """
+        Restart a worker to recycle once it has no task assigned. It is
+        restarted in a separate thread, so that the pool keeps dispatching
+        tasks to the other workers until it is connected again.
+        """
+        if worker.recycling is None or worker.assigned or not self.ongoing \
+                or worker in self._workers_restarting:
+            return
+        self.logger.test_info('Restarting {}, {}.'.format(
+            worker, worker.recycling))
+        thread = threading.Thread(target=self._restart_worker, args=(worker,))
+        thread.daemon = True
+        self._workers_restarting[worker] = thread
+        thread.start()
+
+    def _restart_worker(self, worker):
+        """
+        Stop a worker and start it again, until its new child process is
+        connected. Executes in a separate thread.
+        """
+        try:
+            worker.stop()
+            worker.start()
+            worker.wait(worker.STATUS.STARTED)
+        except Exception as exc:
+            with self._pool_lock:
+                self.logger.critical(
+                    'Worker {} failed to restart: {}'.format(worker, exc))
+                self._deco_worker(
+                    worker, 'Aborting {}, could not be recycled.')
+        finally:
+            self._workers_restarting.pop(worker, None)
+        if not self.active:
+            # The pool was aborted while the worker was restarting.
+            worker.abort()
+
+    def _join_restarting_workers(self):
+        """Wait for the workers being restarted, before stopping them."""
+        for thread in list(self._workers_restarting.values()):
+            interruptible_join(thread)
+
+    def _remove_shared_results(self):
+        """Remove the files of messages that were not received."""
+        if self.cfg.shared_results:
+            shutil.rmtree(self._shared_results_dir, ignore_errors=True)
+
+    def _stop_zygote(self):
+        if self.zygote is not None:
+            self.zygote.stop()
+            self.zygote = None
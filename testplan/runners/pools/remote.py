@@ -2,16 +2,22 @@
 
 import os
 import sys
+import json
 import time
+import shutil
+import tarfile
+import tempfile
 import signal
 import socket
 import getpass
 import platform
+import threading
 import subprocess
+import collections
 import six
 import itertools
 
-from schema import Or
+from schema import Or, And
 
 import testplan
 from testplan.common.utils.logger import TESTPLAN_LOGGER
@@ -20,9 +26,12 @@ from testplan.common.utils.path import (module_abspath,
                                         pwd, makedirs, fix_home_prefix)
 from testplan.common.utils.strings import slugify
 from testplan.common.utils.remote import (
-    ssh_cmd, copy_cmd, link_cmd, remote_filepath_exists)
+    ssh_cmd, copy_cmd, link_cmd, remote_filepath_exists,
+    ssh_control_options, ssh_control_exit_cmd)
+from testplan.common.utils.callable import getargspec
 from testplan.common.utils import path as pathutils
 
+from . import workspace_sync
 from .base import Pool, PoolConfig
 from .process import ProcessWorker, ProcessWorkerConfig
 from .connection import TCPConnectionManager
@@ -70,6 +79,14 @@ class RemoteWorkerConfig(ProcessWorkerConfig):
         }
 
 
+def _accepts_ssh_options(func):
+    """Whether a command callable takes an ``ssh_options`` argument."""
+    try:
+        return 'ssh_options' in getargspec(func).args
+    except (TypeError, ValueError):
+        return False
+
+
 class _LocationPaths(object):
     """Store local and remote equivalent paths."""
 
@@ -98,8 +115,13 @@ class RemoteWorker(ProcessWorker):
         self._working_dirs = _LocationPaths()
         self._should_transfer_workspace = True
         self._remote_testplan_runpath = None
+        self._remote_cache_path = None
         self.setup_metadata = WorkerSetupMetadata()
         self.remote_push_dir = None
+        self._remote_push_dir = None
+        self._remote_cmds = []
+        self._provisioned = False
+        self._fetched = False
 
     def _execute_cmd(
             self, cmd, label=None, check=True, stdout=None, stderr=None):
@@ -142,6 +164,16 @@ class RemoteWorker(ProcessWorker):
 
         return handler.returncode
 
+    def _ssh_cmd(self, host, command):
+        """
+        Command of the ``ssh_cmd`` callable, with the options of the pool
+        sharing one connection per host if it supports them.
+        """
+        ssh_options = getattr(self.parent, 'ssh_options', None)
+        if ssh_options:
+            return self.cfg.ssh_cmd(host, command, ssh_options=ssh_options)
+        return self.cfg.ssh_cmd(host, command)
+
     def _execute_cmd_remote(self, cmd, label=None, check=True):
         """
         Execute a command on the remote host.
@@ -152,10 +184,33 @@ class RemoteWorker(ProcessWorker):
                       See self._execute_cmd for more detail.
         """
         self._execute_cmd(
-            self.cfg.ssh_cmd(self.cfg.index, ' '.join([str(a) for a in cmd])),
+            self._ssh_cmd(self.cfg.index, ' '.join([str(a) for a in cmd])),
             label=label,
             check=check)
 
+    def _queue_cmd_remote(self, cmd):
+        """
+        Queue a command to execute on the remote host with the next
+        :py:meth:`_flush_cmds_remote`.
+
+        :param cmd: Remote command to execute - list of parameters.
+        """
+        self._remote_cmds.append(' '.join([str(a) for a in cmd]))
+
+    def _flush_cmds_remote(self, label=None):
+        """
+        Execute the queued remote commands one after another in a single ssh
+        session, stopping at the first that fails.
+
+        :param label: Optional label for debugging.
+        """
+        if not self._remote_cmds:
+            return
+        cmds, self._remote_cmds = self._remote_cmds, []
+        self._execute_cmd(
+            self._ssh_cmd(self.cfg.index, ' && '.join(cmds)),
+            label=label)
+
     def _mkdir_remote(self, remote_dir, label=None):
         """
         Create a directory path on the remote host.
@@ -167,7 +222,7 @@ class RemoteWorker(ProcessWorker):
             label = 'remote mkdir'
 
         cmd = self.cfg.remote_mkdir + [remote_dir]
-        self._execute_cmd(self.cfg.ssh_cmd(
+        self._execute_cmd(self._ssh_cmd(
             self.cfg.index, ' '.join([str(a) for a in cmd])),
             label=label)
 
@@ -179,13 +234,28 @@ class RemoteWorker(ProcessWorker):
                                   slugify(self.cfg.parent.parent.name)])
         self._remote_testplan_runpath = '/'.join(
             [self._remote_testplan_path, 'runpath', str(self.cfg.index)])
+        self._workspace_paths.remote = '{}/{}'.format(
+            self._remote_testplan_path,
+            self._workspace_paths.local.split(os.sep)[-1])
+        self._remote_cache_path = self.cfg.workspace_cache or '/'.join(
+            testplan_path_dirs + ['blobs'])
 
-    def _create_remote_dirs(self):
-        """Create mandatory directories in remote host."""
-        cmd = self.cfg.remote_mkdir + [self._remote_testplan_path]
-        self._execute_cmd(
-            self.cfg.ssh_cmd(self.cfg.index, ' '.join([str(a) for a in cmd])),
-            label='create remote dirs')
+    def _create_remote_dirs(self, push_files=(), push_dirs=()):
+        """
+        Queue the creation of mandatory directories in remote host and of the
+        parent directories of the files and directories to push.
+        """
+        remote_dirs = [self._remote_testplan_path]
+        if self._syncs_workspace:
+            remote_dirs.append(self._remote_cache_path)
+        if self._remote_push_dir:
+            remote_dirs.append(self._remote_push_dir)
+        for _, dest in itertools.chain(push_files, push_dirs):
+            remote_dir = dest.rpartition('/')[0]
+            if remote_dir and remote_dir not in remote_dirs:
+                self.logger.debug('Create remote dir: %s', remote_dir)
+                remote_dirs.append(remote_dir)
+        self._queue_cmd_remote(self.cfg.remote_mkdir + remote_dirs)
 
     def _copy_child_script(self):
         """Copy the remote worker executable file."""
@@ -208,8 +278,13 @@ class RemoteWorker(ProcessWorker):
             target=remote_path,
             remote_target=True)
 
-    def _push_files(self):
-        """Push files and directories to remote host."""
+    def _push_files(self, push_files, push_dirs):
+        """
+        Push files and directories to remote host.
+
+        :param push_files: Files to push, from :py:meth:`_build_push_lists`.
+        :param push_dirs:  Directories to push.
+        """
         # Short-circuit if we've been given no files to push.
         if not self.cfg.push:
             if self.cfg.push_exclude or self.cfg.push_relative_dir:
@@ -217,10 +292,6 @@ class RemoteWorker(ProcessWorker):
                                     'ignoring push configuration options.')
             return
 
-        # First enumerate the files and directories to be pushed, including
-        # both their local source and remote destinations.
-        push_files, push_dirs = self._build_push_lists()
-
         # Add the remote paths to the setup metadata.
         self.setup_metadata.push_files = [path.remote for path in push_files]
         self.setup_metadata.push_dirs = [path.remote for path in push_dirs]
@@ -291,13 +362,11 @@ class RemoteWorker(ProcessWorker):
         if self.cfg.push_relative_dir:
             self.logger.debug('local push dir = %s', self.cfg.push_relative_dir)
 
-            # Set up the remote push dir.
+            # Set up the remote push dir, created with the other remote dirs.
             self._remote_push_dir = '/'.join(
                 (self._remote_testplan_path, 'push_files'))
-            self._mkdir_remote(self._remote_push_dir)
             self.setup_metadata.push_dir = self._remote_push_dir
-            self.logger.debug('Created remote push dir %s',
-                                       self._remote_push_dir)
+            self.logger.debug('Remote push dir %s', self._remote_push_dir)
 
             push_dsts = [self._to_relative_push_dest(path)
                          for path in push_sources]
@@ -325,53 +394,126 @@ class RemoteWorker(ProcessWorker):
     def _push_files_to_dst(self, push_files, push_dirs):
         """
         Push files and directories to the remote host. Both the source and
-        destination paths should be specified.
+        destination paths should be specified and their remote parent
+        directories created by :py:meth:`_create_remote_dirs`.
 
         :param push_files: Files to push.
         :param push_dirs:  Directories to push.
         """
         for source, dest in itertools.chain(push_files, push_dirs):
-            remote_dir = dest.rpartition('/')[0]
-            self.logger.debug('Create remote dir: %s', remote_dir)
-            self._mkdir_remote(remote_dir)
-
             self._transfer_data(
                 source=source,
                 target=dest,
                 remote_target=True,
                 exclude=self.cfg.push_exclude)
 
-    def _copy_workspace(self):
-        """Copy the local workspace to remote host."""
-        self._workspace_paths.remote = '{}/{}'.format(
-            self._remote_testplan_path,
-            self._workspace_paths.local.split(os.sep)[-1])
+    def _link_workspace(self):
+        """Queue the soft link to the workspace if it is not copied."""
         if self.cfg.remote_workspace:
             # User defined the remote workspace to be used.
             # Make a soft link instead of copying workspace.
-            self._execute_cmd(self.cfg.ssh_cmd(
-                self.cfg.index,
-                ' '.join(self.cfg.link_cmd(
-                    path=fix_home_prefix(self.cfg.remote_workspace),
-                    link=self._workspace_paths.remote))),
-                label='linking to remote workspace (1).')
-        elif self._should_transfer_workspace is True:
-            # Workspace should be copied to remote.
-            self._transfer_data(
-                source=self._workspace_paths.local,
-                target=self._remote_testplan_path,
-                remote_target=True,
-                exclude=self.cfg.workspace_exclude)
-            # Mark that workspace pushed is safe to delete. Not some NFS.
-            self.setup_metadata.workspace_pushed = True
-        else:
+            self._queue_cmd_remote(self.cfg.link_cmd(
+                path=fix_home_prefix(self.cfg.remote_workspace),
+                link=self._workspace_paths.remote))
+        elif self._should_transfer_workspace is not True:
             # Make a soft link instead of copying workspace.
-            self._execute_cmd(self.cfg.ssh_cmd(
-                self.cfg.index,
-                ' '.join(self.cfg.link_cmd(
-                    path=self._workspace_paths.local,
-                    link=self._workspace_paths.remote))),
-                label='linking to remote workspace (2).')
+            self._queue_cmd_remote(self.cfg.link_cmd(
+                path=self._workspace_paths.local,
+                link=self._workspace_paths.remote))
+
+    @property
+    def _syncs_workspace(self):
+        """Whether the workspace is transferred by content-addressed sync."""
+        return self.cfg.workspace_sync == 'manifest' and \
+            not self.cfg.remote_workspace and \
+            self._should_transfer_workspace is True
+
+    def _copy_workspace(self):
+        """Copy the local workspace to remote host, unless linked."""
+        if self.cfg.remote_workspace or \
+                self._should_transfer_workspace is not True:
+            return
+        if self._syncs_workspace:
+            self._sync_workspace()
+            return
+        self._transfer_data(
+            source=self._workspace_paths.local,
+            target=self._remote_testplan_path,
+            remote_target=True,
+            exclude=self.cfg.workspace_exclude)
+        # Mark that workspace pushed is safe to delete. Not some NFS.
+        self.setup_metadata.workspace_pushed = True
+
+    def _sync_workspace(self):
+        """
+        Transfer the workspace files whose content is missing from the blob
+        cache of the remote host, then check out the workspace from it.
+        """
+        manifest, sources = self.parent.workspace_manifest()
+        script = '{}/workspace_sync.py'.format(self._remote_testplan_path)
+        remote_manifest = '{}/workspace_manifest.json'.format(
+            self._remote_testplan_path)
+        sync_cmd = [self._python_binary, '-B', script]
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            local_manifest = os.path.join(tmp_dir, 'workspace_manifest.json')
+            with open(local_manifest, 'w') as fobj:
+                json.dump(manifest, fobj)
+            self._transfer_data(
+                source=os.path.join(os.path.dirname(
+                    os.path.abspath(__file__)), 'workspace_sync.py'),
+                target=script,
+                remote_target=True)
+            self._transfer_data(
+                source=local_manifest,
+                target=remote_manifest,
+                remote_target=True)
+
+            # Hosts sharing a blob cache upload the missing blobs only once.
+            with self.parent.workspace_cache_lock(self.cfg.index):
+                with tempfile.TemporaryFile() as output:
+                    self._execute_cmd(
+                        self._ssh_cmd(self.cfg.index, ' '.join(
+                            sync_cmd + ['missing', self._remote_cache_path,
+                                        remote_manifest])),
+                        label='find missing blobs', stdout=output)
+                    output.seek(0)
+                    missing = output.read().decode('utf-8').split()
+                self.logger.debug('%s of %s workspace blobs missing on %s',
+                                  len(missing), len(sources), self.cfg.index)
+                if missing:
+                    self._upload_blobs(
+                        [sources[digest] for digest in missing], missing,
+                        tmp_dir)
+
+            self._execute_cmd_remote(
+                sync_cmd + ['checkout', self._remote_cache_path,
+                            remote_manifest, self._workspace_paths.remote],
+                label='checkout workspace')
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Mark that workspace pushed is safe to delete. Not some NFS.
+        self.setup_metadata.workspace_pushed = True
+
+    def _upload_blobs(self, sources, digests, tmp_dir):
+        """
+        Transfer files to the blob cache of the remote host, named by their
+        digest, with a single copy command.
+        """
+        staging = os.path.join(
+            tmp_dir, self._remote_cache_path.rstrip('/').rpartition('/')[2])
+        os.makedirs(staging)
+        for source, digest in zip(sources, digests):
+            target = os.path.join(staging, digest)
+            try:
+                os.link(source, target)
+            except (AttributeError, OSError):
+                shutil.copyfile(source, target)
+        self._transfer_data(
+            source=staging,
+            target=self._remote_cache_path.rstrip('/').rpartition('/')[0],
+            remote_target=True)
 
     def _remote_copy_path(self, path):
         """
@@ -392,6 +534,9 @@ class RemoteWorker(ProcessWorker):
         if remote_target:
             target = self._remote_copy_path(target)
         self.logger.debug('Copying %(source)s to %(target)s', locals())
+        ssh_options = getattr(self.parent, 'copy_ssh_options', None)
+        if ssh_options:
+            copy_args['ssh_options'] = ssh_options
         cmd = self.cfg.copy_cmd(source, target, **copy_args)
         with open(os.devnull, 'w') as devnull:
             self._execute_cmd(cmd,
@@ -425,14 +570,26 @@ class RemoteWorker(ProcessWorker):
 
         if self.cfg.copy_workspace_check:
             cmd = self.cfg.copy_workspace_check(
-                self.cfg.ssh_cmd,
+                self._ssh_cmd,
                 self.cfg.index,
                 self._workspace_paths.local)
             self._should_transfer_workspace = self._execute_cmd(
                 cmd, label='copy workspace check', check=False) != 0
 
         self._define_remote_dirs()
-        self._create_remote_dirs()
+        # Enumerate the files and directories to be pushed, including both
+        # their local source and remote destinations.
+        if self.cfg.push:
+            push_files, push_dirs = self._build_push_lists()
+        else:
+            push_files, push_dirs = [], []
+
+        # Directories and links are made in a single ssh session, before the
+        # data transfers that need them.
+        self._create_remote_dirs(push_files, push_dirs)
+        self._link_workspace()
+        self._flush_cmds_remote(label='prepare remote dirs')
+
         self._copy_child_script()
         self._copy_dependencies_module()
         self._copy_workspace()
@@ -442,11 +599,110 @@ class RemoteWorker(ProcessWorker):
         self.logger.debug('Remote working path = %s',
                           self._working_dirs.remote)
 
-        self._push_files()
+        self._push_files(push_files, push_dirs)
         self.setup_metadata.setup_script = self.cfg.setup_script
         self.setup_metadata.env = self.cfg.env
         self.setup_metadata.workspace_paths = self._workspace_paths
 
+    def _stream_data(self, source, target, include=None, exclude=None,
+                     max_size=None):
+        """
+        Fetch a remote file or directory into a local directory as a
+        compressed tar stream over ssh.
+
+        :param source: Remote path.
+        :param target: Local directory, created if missing.
+        :param include: Patterns of the file names or paths relative to the
+          source of the files to fetch. Default: all.
+        :param exclude: Patterns of the file and directory names or paths
+          relative to the source not to fetch.
+        :param max_size: Number of bytes of files above which the following
+          files are not fetched. Default: no limit.
+        :return: Number of bytes of the files fetched.
+        """
+        exclude = exclude or []
+        parent, _, name = source.rstrip('/').rpartition('/')
+        cmd = ['tar', '-czf', '-', '-C', parent or '/']
+        cmd.extend('--exclude={}'.format(six.moves.shlex_quote(pattern))
+                   for pattern in exclude)
+        cmd.append(six.moves.shlex_quote(name))
+        cmd = self._ssh_cmd(self.cfg.index, ' '.join(cmd))
+        self.logger.debug('Streaming %s from %s to %s',
+                          source, self.cfg.index, target)
+        makedirs(target)
+
+        start_time = time.time()
+        size = 0
+        capped = False
+        handler = subprocess.Popen(
+            [str(a) for a in cmd], stdout=subprocess.PIPE)
+        try:
+            with tarfile.open(fileobj=handler.stdout, mode='r|gz') as stream:
+                for member in stream:
+                    if not self._should_extract(
+                            member, target, include, exclude):
+                        continue
+                    if member.isfile():
+                        if max_size is not None and \
+                                size + member.size > max_size:
+                            capped = True
+                            break
+                        size += member.size
+                    if hasattr(tarfile, 'data_filter'):
+                        stream.extract(member, target, filter='data')
+                    else:
+                        stream.extract(member, target)
+        except tarfile.ReadError as exc:
+            raise RuntimeError('Could not fetch {} from {}: {}'.format(
+                source, self.cfg.index, exc))
+        finally:
+            if capped:
+                handler.kill()
+            handler.stdout.close()
+            handler.wait()
+
+        if capped:
+            self.logger.warning(
+                'Fetched %s bytes of %s from %s, the rest is above the limit '
+                'of %s bytes.', size, source, self.cfg.index, max_size)
+        elif handler.returncode != 0:
+            raise RuntimeError(
+                'Command "{cmd}" returned non-zero exit code {rc}'
+                .format(cmd=cmd, rc=handler.returncode))
+        self.logger.debug('Streamed %s bytes of %s in %.2fs.',
+                          size, source, time.time() - start_time)
+        return size
+
+    @staticmethod
+    def _should_extract(member, target, include, exclude):
+        """
+        Whether a member of a fetched tar stream is extracted. Members out of
+        the fetched directory and special files are never extracted, nor are
+        symbolic links to paths out of it or members under such links.
+        """
+        path = member.name
+        if path.startswith('/') or '..' in path.split('/'):
+            return False
+        if not (member.isfile() or member.isdir() or member.issym()):
+            return False
+        # Members are extracted in order, links already extracted resolve.
+        root = os.path.realpath(target)
+        parent = os.path.join(root, *path.split('/')[:-1])
+        paths = [parent]
+        if member.issym():
+            paths.append(os.path.join(parent, member.linkname))
+        for item in paths:
+            item = os.path.realpath(item)
+            if item != root and not item.startswith(root + os.sep):
+                return False
+        name = path.rpartition('/')[2]
+        rel_path = path.partition('/')[2]
+        if exclude and workspace_sync.matches_any(name, rel_path, exclude):
+            return False
+        if include and not member.isdir():
+            return workspace_sync.matches_any(name, rel_path, include)
+        return True
+
     def _pull_files(self):
         """Push custom files to be available on remotes."""
         for entry in [itm.rstrip('/') for itm in self.cfg.pull]:
@@ -458,19 +714,44 @@ class RemoteWorker(ProcessWorker):
                 self.logger.error('Cound not create {} directory - {}'.format(
                     dirname, exc))
             else:
-                self._transfer_data(
-                    source=entry,
-                    remote_source=True,
-                    target=dirname,
-                    exclude=self.cfg.pull_exclude)
+                if self.cfg.fetch_method == 'stream':
+                    self._stream_data(
+                        source=entry,
+                        target=dirname,
+                        exclude=self.cfg.pull_exclude)
+                else:
+                    self._transfer_data(
+                        source=entry,
+                        remote_source=True,
+                        target=dirname,
+                        exclude=self.cfg.pull_exclude)
 
     def _fetch_results(self):
         """Fetch back to local host the results generated remotely."""
         self.logger.debug('Fetch results stage - {}'.format(self.cfg.index))
-        self._transfer_data(
-            source=self._remote_testplan_runpath,
-            remote_source=True,
-            target=self.parent.runpath)
+        if self.cfg.fetch_method == 'stream':
+            self._stream_data(
+                source=self._remote_testplan_runpath,
+                target=self.parent.runpath,
+                include=self.cfg.fetch_include,
+                exclude=self.cfg.fetch_exclude,
+                max_size=self.cfg.fetch_max_size)
+        else:
+            self._transfer_data(
+                source=self._remote_testplan_runpath,
+                remote_source=True,
+                target=self.parent.runpath)
+
+    def fetch_results(self):
+        """
+        Fetch back the results generated remotely and the files to pull,
+        unless already done since the worker was started.
+        """
+        if not self._fetched:
+            self._fetch_results()
+            if self.cfg.pull:
+                self._pull_files()
+            self._fetched = True
 
     def _add_testplan_import_path(self, cmd, flag=None):
         if self.cfg.testplan_path:
@@ -502,16 +783,18 @@ class RemoteWorker(ProcessWorker):
                 cmd.append(flag)
             cmd.append(os.environ[testplan.TESTPLAN_DEPENDENCIES_PATH])
 
-    def _proc_cmd(self):
-        """Command to start child process."""
+    @property
+    def _python_binary(self):
+        """Python interpreter to run on the remote host."""
         if platform.system() == 'Windows':
             if platform.python_version().startswith('3'):
-                python_binary = os.environ['PYTHON3_REMOTE_BINARY']
-            else:
-                python_binary = os.environ['PYTHON2_REMOTE_BINARY']
-        else:
-            python_binary = sys.executable
-        cmd = [python_binary, '-uB',
+                return os.environ['PYTHON3_REMOTE_BINARY']
+            return os.environ['PYTHON2_REMOTE_BINARY']
+        return sys.executable
+
+    def _proc_cmd(self):
+        """Command to start child process."""
+        cmd = [self._python_binary, '-uB',
                self._child_paths.remote,
                '--index', str(self.cfg.index),
                '--address', self.transport.address,
@@ -524,24 +807,35 @@ class RemoteWorker(ProcessWorker):
         self._add_testplan_import_path(cmd, flag='--testplan')
         if not self._should_transfer_workspace:
             self._add_testplan_deps_import_path(cmd, flag='--testplan-deps')
-        return self.cfg.ssh_cmd(self.cfg.index, ' '.join(cmd))
+        return self._ssh_cmd(self.cfg.index, ' '.join(cmd))
+
+    def provision(self):
+        """
+        Transfer local data to remote host, unless already done since the
+        worker was last stopped.
+        """
+        if not self._provisioned:
+            self._prepare_remote()
+            self._provisioned = True
 
     def starting(self):
         """Start a child remote worker."""
-        self._prepare_remote()
+        self.provision()
+        self._fetched = False
         super(RemoteWorker, self).starting()
 
     def stopping(self):
         """Stop child process worker."""
-        self._fetch_results()
-        if self.cfg.pull:
-            self._pull_files()
+        self._provisioned = False
+        self.fetch_results()
         super(RemoteWorker, self).stopping()
 
     def aborting(self):
         """Abort child process worker."""
+        self._provisioned = False
         try:
-            self._fetch_results()
+            if not self._fetched:
+                self._fetch_results()
         except Exception as exc:
             self.logger.error('Could not fetch results, {}'.format(exc))
         super(RemoteWorker, self).aborting()
@@ -602,11 +896,48 @@ class RemotePoolConfig(PoolConfig):
     :type testplan_path: ``str``
     :param worker_heartbeat: Worker heartbeat period.
     :type worker_heartbeat: ``int`` or ``float`` or ``NoneType``
+    :param workspace_sync: ``copy`` to transfer the whole workspace to each
+      remote host, or ``manifest`` to transfer only the files whose content
+      is missing from a blob cache on the remote host.
+    :type workspace_sync: ``str``
+    :param workspace_cache: Directory of the blob cache on remote hosts for
+      ``manifest`` workspace sync. Default: ``/var/tmp/<user>/testplan/blobs``
+    :type workspace_cache: ``str`` or ``NoneType``
+    :param workspace_cache_group: Maps a host to a key shared by the hosts
+      sharing their blob cache, e.g. over a network filesystem, so that the
+      blobs they miss are uploaded once. Default: no sharing.
+    :type workspace_cache_group: ``callable`` or ``NoneType``
+    :param provision_workers: Number of remote hosts provisioned concurrently
+      when the pool starts.
+    :type provision_workers: ``int``
+    :param ssh_multiplexing: Share one ssh connection per host between the
+      commands and transfers of a worker, if ``ssh_cmd`` and ``copy_cmd``
+      take an ``ssh_options`` argument like the default ones.
+    :type ssh_multiplexing: ``bool``
+    :param fetch_method: ``stream`` to fetch back the results and pulled
+      files as compressed tar streams over ssh, or ``copy`` to use the copy
+      command.
+    :type fetch_method: ``str``
+    :param fetch_include: Patterns of the names or relative paths of the
+      result files to fetch back when streamed. Default: all.
+    :type fetch_include: ``list`` of ``str`` or ``NoneType``
+    :param fetch_exclude: Patterns of the names or relative paths of the
+      result files and directories not to fetch back when streamed.
+    :type fetch_exclude: ``list`` of ``str`` or ``NoneType``
+    :param fetch_max_size: Bytes of result files fetched back per worker
+      when streamed, above which the remaining files are left out.
+    :type fetch_max_size: ``int`` or ``NoneType``
+    :param fetch_workers: Number of workers fetching back their results
+      concurrently when the pool stops.
+    :type fetch_workers: ``int``
 
     Also inherits all :py:class:`~testplan.runners.pools.base.PoolConfig`
     options.
     """
 
+    # Default workspace is the working directory when the schema is built.
+    cache_schema = False
+
     @classmethod
     def get_options(cls):
         """
@@ -643,7 +974,24 @@ class RemotePoolConfig(PoolConfig):
             ConfigOption('pull_exclude', default=[]): Or(list, None),
             ConfigOption('remote_mkdir', default=['/bin/mkdir', '-p']): list,
             ConfigOption('testplan_path', default=None): Or(str, None),
-            ConfigOption('worker_heartbeat', default=30): Or(int, float, None)
+            ConfigOption('worker_heartbeat', default=30):
+                Or(int, float, None),
+            ConfigOption('provision_workers', default=16):
+                And(int, lambda x: x > 0),
+            ConfigOption('ssh_multiplexing', default=True): bool,
+            ConfigOption('fetch_method', default='stream'):
+                Or('stream', 'copy'),
+            ConfigOption('fetch_include', default=None): Or(list, None),
+            ConfigOption('fetch_exclude', default=[]): Or(list, None),
+            ConfigOption('fetch_max_size', default=None):
+                Or(None, And(int, lambda x: x > 0)),
+            ConfigOption('fetch_workers', default=16):
+                And(int, lambda x: x > 0),
+            ConfigOption('workspace_sync', default='copy'):
+                Or('copy', 'manifest'),
+            ConfigOption('workspace_cache', default=None): Or(str, None),
+            ConfigOption('workspace_cache_group', default=None):
+                Or(lambda x: callable(x), None)
         }
 
 
@@ -660,6 +1008,12 @@ class RemotePool(Pool):
         super(RemotePool, self).__init__(**options)
         self._request_handlers[
             Message.MetadataPull] = self._worker_setup_metadata
+        self._sync_lock = threading.Lock()
+        self._manifest = None
+        self._cache_locks = {}
+        self._control_dir = None
+        self.ssh_options = []
+        self.copy_ssh_options = []
 
     @staticmethod
     def _worker_setup_metadata(worker, _, response):
@@ -676,3 +1030,125 @@ class RemotePool(Pool):
             worker.cfg.parent = self.cfg
             self._workers.add(worker, uid=host)
 
+    def workspace_manifest(self):
+        """
+        Manifest of the workspace for ``manifest`` workspace sync, built once
+        per start of the pool, and the local file of each of its digests.
+        """
+        with self._sync_lock:
+            if self._manifest is None:
+                root = fix_home_prefix(self.cfg.workspace)
+                start_time = time.time()
+                manifest = workspace_sync.build_manifest(
+                    root, self.cfg.workspace_exclude)
+                self._manifest = (
+                    manifest, workspace_sync.blob_sources(root, manifest))
+                self.logger.debug('Built manifest of %s workspace files '
+                                  'in %.2fs.', len(manifest),
+                                  time.time() - start_time)
+            return self._manifest
+
+    def workspace_cache_lock(self, host):
+        """Lock of the blob cache of a host, shared by its cache group."""
+        key = host
+        if self.cfg.workspace_cache_group is not None:
+            key = self.cfg.workspace_cache_group(host)
+        with self._sync_lock:
+            return self._cache_locks.setdefault(key, threading.Lock())
+
+    def _start_ssh_multiplexing(self):
+        """Set the ssh options sharing one connection per host."""
+        if not self.cfg.ssh_multiplexing or os.name == 'nt':
+            return
+        # Short path as the length of unix socket paths is limited.
+        self._control_dir = tempfile.mkdtemp(prefix='testplan-ssh-')
+        options = ssh_control_options(self._control_dir)
+        if _accepts_ssh_options(self.cfg.ssh_cmd):
+            self.ssh_options = options
+        if _accepts_ssh_options(self.cfg.copy_cmd):
+            self.copy_ssh_options = options
+
+    def _stop_ssh_multiplexing(self):
+        """Stop the master connections to the hosts."""
+        if self._control_dir is None:
+            return
+        options = self.ssh_options or self.copy_ssh_options
+        self.ssh_options = []
+        self.copy_ssh_options = []
+        # No socket left when no master connection was started.
+        if os.listdir(self._control_dir):
+            with open(os.devnull, 'w') as devnull:
+                for host in self.cfg.hosts:
+                    subprocess.call(ssh_control_exit_cmd(host, options),
+                                    stdout=devnull, stderr=devnull)
+        shutil.rmtree(self._control_dir, ignore_errors=True)
+        self._control_dir = None
+
+    def _for_workers(self, method, concurrency, workers=None):
+        """
+        Call a method of workers, all by default, from up to ``concurrency``
+        threads. Errors are logged, the workers retry when they are started
+        or stopped and report the error then.
+        """
+        pending = collections.deque(
+            self._workers if workers is None else workers)
+
+        def call():
+            while True:
+                try:
+                    worker = pending.popleft()
+                except IndexError:
+                    return
+                try:
+                    getattr(worker, method)()
+                except Exception as exc:
+                    self.logger.warning('%s of %s failed - %s',
+                                        method, worker, exc)
+
+        threads = [threading.Thread(target=call)
+                   for _ in range(min(concurrency, len(pending)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _provision_workers(self):
+        """Provision the remote hosts of the workers concurrently."""
+        self._for_workers('provision', self.cfg.provision_workers)
+
+    def _fetch_workers_results(self):
+        """Fetch back the results of the workers concurrently."""
+        self._for_workers(
+            'fetch_results', self.cfg.fetch_workers,
+            [worker for worker in self._workers
+             if worker.status.tag == worker.status.STARTED])
+
+    def starting(self):
+        """Provision the remote hosts, then start the pool and workers."""
+        start_time = time.time()
+        self._manifest = None
+        self._start_ssh_multiplexing()
+        self._provision_workers()
+        self.logger.debug('Provisioned %s remote hosts in %.2fs.',
+                          len(self._workers), time.time() - start_time)
+        super(RemotePool, self).starting()
+
+    def stopping(self):
+        """Fetch back the results of the workers, then stop them."""
+        start_time = time.time()
+        self._fetch_workers_results()
+        self.logger.debug('Fetched results of %s remote hosts in %.2fs.',
+                          len(self._workers), time.time() - start_time)
+        try:
+            super(RemotePool, self).stopping()
+        finally:
+            self._stop_ssh_multiplexing()
+
+    def aborting(self):
+        """Abort the workers and stop the connections to their hosts."""
+        try:
+            super(RemotePool, self).aborting()
+        finally:
+            self._stop_ssh_multiplexing()
+
@@ -57,17 +57,29 @@ class Task(object):
     :type kwargs: ``kwargs``
     :param uid: Task uid.
     :type uid: ``str``
-
+    :param priority: Tasks with higher priority are scheduled first by pools.
+    :type priority: ``int``
+    :param cost: Expected duration of the task in seconds, used by pools to
+      schedule the longest tasks first. Learned from previous runs if not set.
+    :type cost: ``int`` or ``float``
+
+    The ``part_durations`` attribute holds the testcase durations of the
+    test the task ran a part of in previous runs, set by the plan from its
+    duration history and passed on to the materialized target with its
+    ``set_part_durations`` method if any.
     """
 
     def __init__(self, target=None, module=None, path=None,
-                 args=None, kwargs=None, uid=None):
+                 args=None, kwargs=None, uid=None, priority=0, cost=None):
         self._target = target
         self._path = path
         self._args = args or tuple()
         self._kwargs = kwargs or dict()
         self._module = module
         self._uid = uid or str(uuid.uuid4())
+        self.priority = priority
+        self.cost = cost
+        self.part_durations = None
 
     def __str__(self):
         return '{}[{}]'.format(self.__class__.__name__, self._uid)
@@ -77,6 +89,11 @@ class Task(object):
         return ('_target', '_path', '_args',
                 '_kwargs', '_module', '_uid')
 
+    @property
+    def serialized_attrs(self):
+        """Attributes passed on when the task is serialized."""
+        return self.all_attrs + ('part_durations',)
+
     def uid(self):
         """Task string uid."""
         return self._uid
@@ -93,6 +110,30 @@ class Task(object):
             name = self._target
         return 'Task[{}]'.format(name)
 
+    @property
+    def signature(self):
+        """
+        Identifies the task across runs, from its target and materialization
+        arguments, to look up its duration in previous runs.
+        """
+        if isinstance(self._target, six.string_types):
+            name = self._target
+            if self._module:
+                name = '{}.{}'.format(self._module, name)
+        elif hasattr(self._target, 'run'):
+            name = getattr(self._target, 'name', None) or \
+                self._target.__class__.__name__
+            try:
+                part = self._target.cfg.part
+            except AttributeError:
+                part = None
+            return '{}[{}]'.format(name, part) if part else name
+        else:
+            name = getattr(self._target, '__name__', None) or \
+                self._target.__class__.__name__
+        return '{}{}{}'.format(
+            name, self._args, sorted(self._kwargs.items()))
+
     @property
     def args(self):
         """Task target args."""
@@ -124,6 +165,9 @@ class Task(object):
                 raise RuntimeError(('Task {} must have a '
                                     '.run() method.').format(name))
             else:
+                if self.part_durations is not None and \
+                        hasattr(target, 'set_part_durations'):
+                    target.set_part_durations(self.part_durations)
                 return target
         else:
             target = self._string_to_target()
@@ -156,7 +200,7 @@ class Task(object):
     def dumps(self, check_loadable=False):
         """Serialize a task."""
         data = {}
-        for attr in self.all_attrs:
+        for attr in self.serialized_attrs:
             data[attr] = getattr(self, attr)
         try:
             serialized = cPickle.dumps(data)
@@ -0,0 +1,150 @@
+"""
+Content-addressed sync of a workspace to remote hosts.
+
+The local side builds a manifest of the files of the workspace by content
+digest. The remote side runs this module as a script, with no dependency
+but the standard library, to report the digests missing from its blob
+cache and to check out a workspace from the cache.
+"""
+
+import os
+import sys
+import json
+import stat
+import shutil
+import fnmatch
+import hashlib
+import argparse
+
+MANIFEST_NAME = '.testplan_manifest.json'
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """SHA-1 hex digest of the content of a file."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fobj:
+        for chunk in iter(lambda: fobj.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def matches_any(name, rel_path, patterns):
+    """Whether a file name or its relative path matches any of patterns."""
+    return any(fnmatch.fnmatch(name, pattern) or
+               fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
+
+
+def build_manifest(root, exclude=None):
+    """
+    Manifest of the files under a directory, following symbolic links.
+
+    :param root: Directory to build the manifest of.
+    :type root: ``str``
+    :param exclude: Patterns of file and directory names or relative paths
+      to leave out.
+    :type exclude: ``list`` of ``str``
+    :return: Digest and permission bits of each file by relative POSIX path.
+    :rtype: ``dict`` of ``str``: ``list``
+    """
+    exclude = exclude or []
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+        rel_dir = os.path.relpath(dirpath, root)
+        rel_dir = '' if rel_dir == os.curdir else rel_dir + os.sep
+        dirnames[:] = [name for name in dirnames if not matches_any(
+            name, (rel_dir + name).replace(os.sep, '/'), exclude)]
+        for name in filenames:
+            rel_path = (rel_dir + name).replace(os.sep, '/')
+            path = os.path.join(dirpath, name)
+            # Skips broken links, sockets and the like.
+            if matches_any(name, rel_path, exclude) or \
+                    not os.path.isfile(path):
+                continue
+            manifest[rel_path] = [file_digest(path),
+                                  stat.S_IMODE(os.stat(path).st_mode)]
+    return manifest
+
+
+def blob_sources(root, manifest):
+    """Local path of a file of each digest of a manifest of ``root``."""
+    sources = {}
+    for rel_path, (digest, _) in manifest.items():
+        sources.setdefault(
+            digest, os.path.join(root, *rel_path.split('/')))
+    return sources
+
+
+def _read_manifest(path):
+    with open(path) as fobj:
+        return json.load(fobj)
+
+
+def missing_blobs(cache, manifest):
+    """Digests of a manifest without a blob in the cache directory."""
+    digests = set(digest for digest, _ in manifest.values())
+    return sorted(digest for digest in digests
+                  if not os.path.isfile(os.path.join(cache, digest)))
+
+
+def checkout(cache, manifest, target):
+    """
+    Write the files of a manifest from the blob cache under the target
+    directory. Files unchanged since the previous checkout are left as they
+    are, files not in the manifest are not removed.
+    """
+    if os.path.islink(target):
+        # Left by a previous run linking the workspace, do not write through.
+        os.unlink(target)
+    previous_path = os.path.join(target, MANIFEST_NAME)
+    try:
+        previous = _read_manifest(previous_path)
+    except (IOError, OSError, ValueError):
+        previous = {}
+
+    for rel_path, entry in manifest.items():
+        digest, mode = entry
+        path = os.path.join(target, *rel_path.split('/'))
+        if previous.get(rel_path) == entry and os.path.isfile(path):
+            continue
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        tmp_path = '{}.{}.sync'.format(path, os.getpid())
+        shutil.copyfile(os.path.join(cache, digest), tmp_path)
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+
+    with open(previous_path, 'w') as fobj:
+        json.dump(manifest, fobj)
+
+
+def parse_args(argv):
+    """Parse the command line of the remote side."""
+    parser = argparse.ArgumentParser(description='Workspace sync')
+    subparsers = parser.add_subparsers(dest='command')
+    missing = subparsers.add_parser(
+        'missing', help='Print the digests missing from the cache.')
+    missing.add_argument('cache')
+    missing.add_argument('manifest')
+    check = subparsers.add_parser(
+        'checkout', help='Write the files of a manifest from the cache.')
+    check.add_argument('cache')
+    check.add_argument('manifest')
+    check.add_argument('target')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Entry point of the remote side."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    manifest = _read_manifest(args.manifest)
+    if args.command == 'missing':
+        for digest in missing_blobs(args.cache, manifest):
+            sys.stdout.write(digest + '\n')
+    else:
+        checkout(args.cache, manifest, args.target)
+
+
+if __name__ == '__main__':
+    main()
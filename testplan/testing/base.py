@@ -16,6 +16,7 @@ from testplan.testing import filtering, ordering, tagging
 from testplan.common.entity import (
     Resource, Runnable, RunnableResult, RunnableConfig, RunnableIRunner)
 from testplan.common.utils.process import subprocess_popen
+from testplan.environment import SharedEnvironment
 from testplan.common.utils.timing import parse_duration, format_duration
 from testplan.common.utils.process import enforce_timeout, kill_process
 from testplan.common.utils.strings import slugify
@@ -87,6 +88,9 @@ class TestConfig(RunnableConfig):
             'name': str,
             ConfigOption('description', default=None): str,
             ConfigOption('environment', default=[]): [Resource],
+            ConfigOption('parallel_environment', default=False): bool,
+            ConfigOption('shared_environments', default=[]):
+                [SharedEnvironment],
             ConfigOption('before_start', default=None): start_stop_signature,
             ConfigOption('after_start', default=None): start_stop_signature,
             ConfigOption('before_stop', default=None): start_stop_signature,
@@ -142,6 +146,14 @@ class Test(Runnable):
         :py:class:`drivers <testplan.tesitng.multitest.driver.base.Driver>` to
         be started and made available on tests execution.
     :type environment: ``list``
+    :param parallel_environment: Start the drivers of the environment
+        concurrently, each one once the drivers it depends on are started,
+        and stop them in reverse order.
+    :type parallel_environment: ``bool``
+    :param shared_environments: Environments whose drivers are shared with
+        other tests, started before the drivers of the environment.
+    :type shared_environments: ``list`` of
+        :py:class:`~testplan.environment.SharedEnvironment`
     :param test_filter: Class with test filtering logic.
     :type test_filter: :py:class:`~testplan.testing.filtering.BaseFilter`
     :param test_sorter: Class with tests sorting logic.
@@ -165,13 +177,19 @@ class Test(Runnable):
     def __init__(self, **options):
         super(Test, self).__init__(**options)
 
+        self.resources.parallel = self.cfg.parallel_environment
         for resource in self.cfg.environment:
             resource.parent = self
             resource.cfg.parent = self.cfg
             self.resources.add(resource)
+        for shared in self.cfg.shared_environments:
+            self.resources.attach(shared)
 
         self._test_context = None
         self._init_test_report()
+        # Callable accepting a report fragment, set by executors that stream
+        # results of the tests as they complete.
+        self.report_fragment_handler = None
 
     def __str__(self):
         return '{}[{}]'.format(self.__class__.__name__, self.name)
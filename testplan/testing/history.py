@@ -0,0 +1,200 @@
+"""
+    Durations of tests in previous runs, recorded from the timers of test
+    reports and stored on disk, to balance the load of test executions.
+"""
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from testplan.common.utils.path import makedirs
+from testplan.common.utils.strings import slugify
+from testplan.report.testing import TestCaseReport
+
+UID_SEPARATOR = ':'
+
+
+def default_history_path(runpath, uid):
+    """
+    Path of the duration history of a test plan, next to its runpath as the
+    runpath is emptied at every run.
+
+    :param runpath: Runpath of the plan.
+    :type runpath: ``str``
+    :param uid: Uid of the plan.
+    :type uid: ``str``
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(runpath)),
+                        '.{}_history.db'.format(slugify(uid)))
+
+
+def history_uid(*uids):
+    """
+    Uid of a test entry in the history from the uids of its parents and its
+    own, e.g. ``history_uid('MTest', 'Suite', 'testcase')``.
+    """
+    return UID_SEPARATOR.join(str(uid) for uid in uids)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of values, ``None`` if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered))), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def median(values):
+    """Median of a list of values, ``None`` if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2.0
+
+
+class DurationHistory(object):
+    """
+    Durations in seconds of tests in previous runs by history uid, stored in
+    a sqlite database. Only the latest ``max_samples`` durations of each uid
+    are kept.
+
+    Durations are read in memory by :py:meth:`load` and new ones are only
+    written on :py:meth:`save`, so that queries during a run are stable.
+    The uid of the test each task ran a part of is also kept, to pass the
+    testcase durations of that test only to the task.
+
+    :param path: Path of the database file.
+    :type path: ``str``
+    :param max_samples: Number of durations kept for each uid.
+    :type max_samples: ``int``
+    """
+
+    def __init__(self, path, max_samples=20):
+        self.path = path
+        self.max_samples = max_samples
+        self._durations = {}
+        self._recorded = []
+        self._parts = {}  # task signature: test uid
+        self._recorded_parts = {}
+
+    def _connect(self):
+        makedirs(os.path.dirname(os.path.abspath(self.path)))
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('CREATE TABLE IF NOT EXISTS durations ('
+                     'uid TEXT NOT NULL, duration REAL NOT NULL, '
+                     'recorded REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS durations_uid '
+                     'ON durations (uid)')
+        conn.execute('CREATE TABLE IF NOT EXISTS parts ('
+                     'signature TEXT PRIMARY KEY, uid TEXT NOT NULL)')
+        return conn
+
+    def load(self):
+        """Read the durations stored, a missing database is created."""
+        durations = {}
+        with closing(self._connect()) as conn:
+            for uid, duration in conn.execute(
+                    'SELECT uid, duration FROM durations '
+                    'ORDER BY recorded, rowid'):
+                durations.setdefault(uid, []).append(duration)
+            self._parts = dict(conn.execute(
+                'SELECT signature, uid FROM parts'))
+        self._durations = durations
+
+    def save(self):
+        """Write the durations recorded since the last save."""
+        if not self._recorded and not self._recorded_parts:
+            return
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO parts (signature, uid) '
+                    'VALUES (?, ?)', self._recorded_parts.items())
+                conn.executemany(
+                    'INSERT INTO durations (uid, duration, recorded) '
+                    'VALUES (?, ?, ?)', self._recorded)
+                conn.executemany(
+                    'DELETE FROM durations WHERE uid = ? AND rowid NOT IN '
+                    '(SELECT rowid FROM durations WHERE uid = ? '
+                    'ORDER BY recorded DESC, rowid DESC LIMIT ?)',
+                    [(uid, uid, self.max_samples)
+                     for uid in set(row[0] for row in self._recorded)])
+        self._recorded = []
+        self._recorded_parts = {}
+
+    def record(self, uid, duration):
+        """
+        Record the duration of a test entry.
+
+        :param uid: History uid of the test entry.
+        :type uid: ``str``
+        :param duration: Duration in seconds.
+        :type duration: ``float``
+        """
+        self._recorded.append((uid, duration, time.time()))
+
+    def record_part(self, signature, uid):
+        """
+        Record the uid of the test a task ran a part of.
+
+        :param signature: Signature of the task.
+        :type signature: ``str``
+        :param uid: Uid of the test.
+        :type uid: ``str``
+        """
+        self._recorded_parts[signature] = uid
+
+    def part_of(self, signature):
+        """
+        Uid of the test a task ran a part of in previous runs, ``None`` if
+        unknown.
+        """
+        return self._parts.get(signature)
+
+    def record_report(self, report):
+        """
+        Record the durations of a test report and its entries from their
+        ``run`` timer. Only testcases are recorded for reports of a part of
+        a test, the duration of the test and its suites being partial.
+
+        :param report: Report of a test.
+        :type report: :py:class:`~testplan.report.testing.base.TestGroupReport`
+        """
+        self._record_entry(report, (), bool(getattr(report, 'part', None)))
+
+    def _record_entry(self, entry, parents, partial):
+        uids = parents + (entry.uid,)
+        is_testcase = isinstance(entry, TestCaseReport)
+        interval = entry.timer.get('run')
+        if interval and interval.elapsed is not None and \
+                (is_testcase or not partial):
+            self.record(history_uid(*uids), interval.elapsed)
+        if not is_testcase:
+            for child in entry:
+                self._record_entry(child, uids, partial)
+
+    def durations(self, uid):
+        """Durations stored for a history uid, oldest first."""
+        return list(self._durations.get(uid, ()))
+
+    def medians(self, test_uid=None):
+        """
+        Median duration of each history uid, only the ones of the entries
+        of a test if its uid is given.
+        """
+        prefix = None if test_uid is None else test_uid + UID_SEPARATOR
+        return {uid: median(durations)
+                for uid, durations in self._durations.items()
+                if prefix is None or uid.startswith(prefix)}
+
+    def median(self, uid):
+        """Median duration of a history uid, ``None`` if unknown."""
+        return median(self._durations.get(uid))
+
+    def p95(self, uid):
+        """95th percentile duration of a history uid, ``None`` if unknown."""
+        return percentile(self._durations.get(uid), 95)
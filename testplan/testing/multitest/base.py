@@ -1,7 +1,9 @@
 """Multitest main test execution framework."""
 
 import os
+import heapq
 import inspect
+import itertools
 import collections
 import functools
 import time
@@ -15,7 +17,7 @@ from threading import Thread, Lock
 from schema import Use, Or, And
 
 from testplan.common.config import ConfigOption
-from testplan.common.entity import Runnable, RunnableIRunner
+from testplan.common.entity import RunnableIRunner
 from testplan.common.utils.interface import (
     check_signature, MethodSignatureMismatch
 )
@@ -29,6 +31,7 @@ from testplan.report.testing import Status
 
 from testplan.testing import tagging, filtering
 from testplan.testing.filtering import Pattern
+from testplan.testing.history import history_uid, median
 
 from .entries.base import Summary
 from .result import Result
@@ -46,6 +49,28 @@ class Categories(object):
     SUITE = 'suite'
 
 
+def balanced_partition(weights, num_parts):
+    """
+    Assign items to parts so that the sums of their weights are near-equal,
+    heaviest items first to the lightest part. Deterministic for the same
+    weights, ties broken by item and part index.
+
+    :param weights: Weight of each item.
+    :type weights: ``list`` of ``float``
+    :param num_parts: Number of parts.
+    :type num_parts: ``int``
+    :return: Part index of each item.
+    :rtype: ``list`` of ``int``
+    """
+    assignment = [None] * len(weights)
+    loads = [(0, part) for part in range(num_parts)]
+    for idx in sorted(range(len(weights)), key=lambda i: (-weights[i], i)):
+        load, part = heapq.heappop(loads)
+        assignment[idx] = part
+        heapq.heappush(loads, (load + weights[idx], part))
+    return assignment
+
+
 def iterable_suites(obj):
     """Create an iterable suites object."""
     suites = [obj] if not isinstance(
@@ -99,6 +124,9 @@ class MultiTestConfig(TestConfig):
             ConfigOption('stop_on_error', default=True): bool,
             ConfigOption('part', default=None): Or(None, And((int,),
                 lambda tp: len(tp) == 2 and 0 <= tp[0] < tp[1] and tp[1] > 1)),
+            ConfigOption('part_strategy', default='round_robin'):
+                Or('round_robin', 'duration'),
+            ConfigOption('part_durations', default=None): Or(None, dict),
             ConfigOption('interactive_runner', default=MultitestIRunner):
                 object,
             ConfigOption('fix_spec_path', default=None): Or(None, And(str, os.path.exists))
@@ -140,6 +168,17 @@ class MultiTest(Test):
     :param part: Execute only a part of the total testcases. MultiTest needs to
         know which part of the total it is. Only works with Multitest.
     :type part: ``tuple`` of (``int``, ``int``)
+    :param part_strategy: How testcases are split into parts, ``round_robin``
+        by their index in each suite or ``duration`` for parts of near-equal
+        expected runtime, from ``part_durations``. Testcases with no known
+        duration weigh as the median of the known ones, or all the same if
+        none is known.
+    :type part_strategy: ``str``
+    :param part_durations: Median durations of testcases in previous runs
+        by history uid, used by the ``duration`` part strategy. Set by the
+        plan from its duration history when it starts, so that all the parts
+        of a MultiTest, wherever they run, split the testcases the same way.
+    :type part_durations: ``dict``
 
     Also inherits all
     :py:class:`~testplan.testing.base.Test` options.
@@ -194,6 +233,15 @@ class MultiTest(Test):
             fix_spec_path=self.cfg.fix_spec_path,
         )
 
+    def _new_report_fragment(self, testsuite_report):
+        """
+        Create a report with the same attributes of the test report, that
+        contains a single completed testsuite report.
+        """
+        fragment = self._new_test_report()
+        fragment.append(testsuite_report)
+        return fragment
+
     def _execute_step(self, step, *args, **kwargs):
         """
         Full override of the base class, as we can rely on report object
@@ -265,7 +313,8 @@ class MultiTest(Test):
                 if test_filter.filter(
                     test=self, suite=suite, case=case)]
 
-            if self.cfg.part and self.cfg.part[1] > 1:
+            if self.cfg.part and self.cfg.part[1] > 1 and \
+                    self.cfg.part_strategy == 'round_robin':
                 testcases_to_run = [
                     testcase for (idx, testcase) in enumerate(testcases_to_run)
                     if idx % self.cfg.part[1] == self.cfg.part[0]
@@ -274,8 +323,56 @@ class MultiTest(Test):
             if testcases_to_run:
                 ctx.append((suite, testcases_to_run))
 
+        if self.cfg.part and self.cfg.part[1] > 1 and \
+                self.cfg.part_strategy == 'duration':
+            ctx = self._duration_balanced_part(ctx)
+
         return ctx
 
+    def set_part_durations(self, durations):
+        """
+        Set the testcase durations the testcases are split by, for parts
+        using the ``duration`` part strategy.
+
+        :param durations: Median durations of testcases by history uid.
+        :type durations: ``dict``
+        """
+        if self.cfg.part and self.cfg.part_strategy == 'duration':
+            self.cfg.set_local('part_durations', durations)
+            self._test_context = None
+
+    def _duration_balanced_part(self, ctx):
+        """
+        Keep the testcases of the configured part, after splitting all
+        testcases into parts of near-equal expected duration.
+        """
+        part_durations = self.cfg.part_durations or {}
+        entries = [(suite, testcase)
+                   for suite, testcases in ctx for testcase in testcases]
+
+        durations = []
+        for suite, testcase in entries:
+            uids = [self.uid(), get_testsuite_name(suite)]
+            param_template = getattr(
+                testcase, '_parametrization_template', None)
+            if param_template:
+                uids.append(param_template)
+            uids.append(testcase.__name__)
+            durations.append(part_durations.get(history_uid(*uids)))
+
+        known = [duration for duration in durations if duration is not None]
+        default = median(known) if known else 1
+        weights = [default if duration is None else duration
+                   for duration in durations]
+        parts = balanced_partition(weights, self.cfg.part[1])
+
+        part_ctx = []
+        selected = (entry for entry, part in zip(entries, parts)
+                    if part == self.cfg.part[0])
+        for suite, group in itertools.groupby(selected, key=lambda e: e[0]):
+            part_ctx.append((suite, [testcase for _, testcase in group]))
+        return part_ctx
+
     def dry_run(self, status=None):
         """
         A testing process that creates a full structured report without
@@ -371,32 +468,34 @@ class MultiTest(Test):
                         self._stop_thread_pool()
                         raise
 
-            while self.active:
-                if self.status.tag == Runnable.STATUS.RUNNING:
-                    try:
-                        next_suite, testcases = ctx.pop(0)
-                    except IndexError:
-                        style = self.get_stdout_style(report.passed)
-                        if style.display_test:
-                            self.log_multitest_status(report)
-                        break
-                    else:
-                        testsuite_report = TestGroupReport(
-                            name=get_testsuite_name(next_suite),
-                            description=next_suite.__class__.__doc__,
-                            category=Categories.SUITE,
-                            uid=get_testsuite_name(next_suite),
-                            tags=next_suite.__tags__,
-                        )
-                        report.append(testsuite_report)
-                        with testsuite_report.logged_exceptions():
-                            self._run_suite(
-                                next_suite, testcases, testsuite_report)
-
-                        if self.get_stdout_style(
-                              testsuite_report.passed).display_suite:
-                            self.log_suite_status(testsuite_report)
-                time.sleep(self.cfg.active_loop_sleep)
+            while self._wait_running():
+                try:
+                    next_suite, testcases = ctx.pop(0)
+                except IndexError:
+                    style = self.get_stdout_style(report.passed)
+                    if style.display_test:
+                        self.log_multitest_status(report)
+                    break
+                else:
+                    testsuite_report = TestGroupReport(
+                        name=get_testsuite_name(next_suite),
+                        description=next_suite.__class__.__doc__,
+                        category=Categories.SUITE,
+                        uid=get_testsuite_name(next_suite),
+                        tags=next_suite.__tags__,
+                    )
+                    report.append(testsuite_report)
+                    with testsuite_report.logged_exceptions():
+                        self._run_suite(
+                            next_suite, testcases, testsuite_report)
+
+                    if self.get_stdout_style(
+                          testsuite_report.passed).display_suite:
+                        self.log_suite_status(testsuite_report)
+
+                    if self.report_fragment_handler and not patch_report:
+                        self.report_fragment_handler(
+                            self._new_report_fragment(testsuite_report))
 
             if ctx:  # Execution aborted and still some suites left there
                 report.logger.error('Not all of the suites are done.')
@@ -471,37 +570,34 @@ class MultiTest(Test):
                 has_execution_group = True
                 self._thread_pool_available = True
 
-            while self.active:
-                if self.status.tag == Runnable.STATUS.RUNNING:
-                    try:
-                        testcase = testcases.pop(0)
-                    except IndexError:
-                        break
+            while self._wait_running():
+                try:
+                    testcase = testcases.pop(0)
+                except IndexError:
+                    break
+                else:
+                    exec_group = getattr(testcase, 'execution_group', '')
+                    if exec_group:
+                        if exec_group != current_exec_group:
+                            self._interruptible_testcase_queue_join()
+                            current_exec_group = exec_group
+                        if not self._thread_pool_available:  # Error found
+                            break
+                        task = (testcase, pre_testcase, post_testcase,
+                                create_testcase_report(testcase))
+                        self._testcase_queue.put(task)
                     else:
-                        exec_group = getattr(testcase, 'execution_group', '')
-                        if exec_group:
-                            if exec_group != current_exec_group:
-                                self._interruptible_testcase_queue_join()
-                                current_exec_group = exec_group
-                            if not self._thread_pool_available:  # Error found
+                        testcase_report = create_testcase_report(testcase)
+                        self._run_testcase(
+                            testcase=testcase,
+                            pre_testcase=pre_testcase,
+                            post_testcase=post_testcase,
+                            testcase_report=testcase_report
+                        )
+                        if testcase_report.status == Status.ERROR:
+                            if self.cfg.stop_on_error:
+                                self._thread_pool_available = False
                                 break
-                            task = (testcase, pre_testcase, post_testcase,
-                                    create_testcase_report(testcase))
-                            self._testcase_queue.put(task)
-                        else:
-                            testcase_report = create_testcase_report(testcase)
-                            self._run_testcase(
-                                testcase=testcase,
-                                pre_testcase=pre_testcase,
-                                post_testcase=post_testcase,
-                                testcase_report=testcase_report
-                            )
-                            if testcase_report.status == Status.ERROR:
-                                if self.cfg.stop_on_error:
-                                    self._thread_pool_available = False
-                                    break
-
-                time.sleep(self.cfg.active_loop_sleep)
 
             # Do nothing if testcase queue and thread pool not created
             self._interruptible_testcase_queue_join()
@@ -752,10 +848,12 @@ class MultiTest(Test):
             self.result.report.status_override = Status.ERROR
 
         if step == self.resources.stop:
+            # Start and stop durations of each driver.
+            self.result.report.timer.update(self.resources.timer)
             drivers = set(self.resources.start_exceptions.keys())
             drivers.update(self.resources.stop_exceptions.keys())
             for driver in drivers:
-                if driver.cfg.report_errors_from_logs:
+                if getattr(driver.cfg, 'report_errors_from_logs', False):
                     error_log = os.linesep.join(driver.fetch_error_log())
                     if error_log:
                         self.result.report.logger.error(error_log)
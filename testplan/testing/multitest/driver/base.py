@@ -7,6 +7,7 @@ from schema import Or
 
 from testplan.common.config import ConfigOption
 from testplan.common.entity import Resource, ResourceConfig, FailedAction
+from testplan.common.utils.context import context_drivers
 from testplan.common.utils.match import match_regexps_in_file
 from testplan.common.utils.path import instantiate
 from testplan.common.utils.timing import wait
@@ -64,7 +65,8 @@ class DriverConfig(ResourceConfig):
                 Or(None, list),
             ConfigOption('async_start', default=False): bool,
             ConfigOption('report_errors_from_logs', default=False): bool,
-            ConfigOption('error_logs_max_lines', default=10): int
+            ConfigOption('error_logs_max_lines', default=10): int,
+            ConfigOption('depends_on', default=None): Or(None, [str])
         }
 
 
@@ -104,6 +106,11 @@ class Driver(Resource):
     :param error_logs_max_lines: Number of lines to be reported if using
         `report_errors_from_logs` option.
     :type error_logs_max_lines: ``int``
+    :param depends_on: Names of the drivers to be started before this one
+        when the environment is started in parallel, on top of the drivers
+        referenced by :py:func:`~testplan.common.utils.context.context`
+        values of the driver options.
+    :type depends_on: ``list`` of ``str``
 
 
     Also inherits all
@@ -126,6 +133,16 @@ class Driver(Resource):
         """Driver uid."""
         return self.cfg.name
 
+    def dependencies(self):
+        """
+        Drivers named by ``depends_on`` or referenced by context values of
+        the driver options.
+        """
+        drivers = set(self.cfg.depends_on or [])
+        drivers.update(context_drivers(list(self.cfg._cfg_input.values())))
+        drivers.discard(self.uid())
+        return sorted(drivers)
+
     def start(self):
         """Start the driver."""
         self.status.change(self.STATUS.STARTING)
@@ -0,0 +1,309 @@
+"""Pool of drivers started ahead of the tests that use them."""
+
+import os
+import time
+import inspect
+import threading
+from collections import deque
+
+from schema import And
+
+from testplan.common.config import ConfigOption
+from testplan.common.entity import Resource, ResourceConfig
+from testplan.common.utils.exceptions import format_trace
+from testplan.common.utils.thread import interruptible_join
+
+
+class DriverPoolConfig(ResourceConfig):
+    """
+    Configuration object for
+    :py:class:`~testplan.testing.multitest.driver.pool.DriverPool` resource
+    entity.
+    """
+
+    @classmethod
+    def get_options(cls):
+        """
+        Schema for options validation and assignment of default values.
+        """
+        return {
+            'name': str,
+            'driver': callable,
+            ConfigOption('driver_options', default={}): dict,
+            ConfigOption('size', default=1): And(int, lambda x: x > 0),
+            ConfigOption('async_start', default=False): bool
+        }
+
+
+class DriverPool(Resource):
+    """
+    Pool of spare instances of a driver, started in the background and handed
+    over already started to the tests that use them through
+    :py:class:`~testplan.testing.multitest.driver.pool.PooledDriver`
+    drivers. Every spare handed over is replaced by a new one and released
+    spares are stopped in the background, so tests whose environment
+    restarts the same driver do not wait for it to start or stop.
+
+    Spares are started outside of the environment of the tests, so the
+    driver options cannot reference other drivers with context values. Each
+    spare has a runpath of its own under the runpath of the pool and must
+    not use fixed ports, as several spares run at the same time.
+
+    The pool starts its spares when started as a resource of the plan, or
+    else on the first spare requested.
+
+    :param name: Pool name.
+    :type name: ``str``
+    :param driver: Driver class or callable that creates a new driver from
+        the driver options.
+    :type driver: ``callable``
+    :param driver_options: Options of the driver instances.
+    :type driver_options: ``dict``
+    :param size: Number of spares started ahead. Default: 1
+    :type size: ``int``
+
+    Also inherits all
+    :py:class:`~testplan.common.entity.base.Resource` options.
+    """
+
+    CONFIG = DriverPoolConfig
+
+    def __init__(self, **options):
+        super(DriverPool, self).__init__(**options)
+        # Guards the spares, notified when a spare is ready.
+        self._cond = threading.Condition()
+        self._ready = deque()  # (driver, error message) of started spares
+        self._threads = []
+        self._spares = 0
+        self._filled = False
+        self._closed = False
+
+    def uid(self):
+        """Pool name."""
+        return self.cfg.name
+
+    def _spawn(self, func, *args):
+        """Run a function in a background thread. Must hold the condition."""
+        thread = threading.Thread(target=func, args=args)
+        thread.daemon = True
+        thread.start()
+        self._threads = [item for item in self._threads if item.is_alive()]
+        self._threads.append(thread)
+
+    def _start_spare(self, idx):
+        """
+        Create and start a spare with a runpath of its own, and make it
+        available with its start error if any.
+        """
+        driver, error = None, None
+        try:
+            options = dict(self.cfg.driver_options)
+            options['runpath'] = os.path.join(
+                self.runpath, 'spare_{}'.format(idx))
+            driver = self.cfg.driver(**options)
+            driver.cfg.parent = self.cfg
+            driver.start()
+            driver.wait(driver.STATUS.STARTED)
+        except Exception as exc:
+            error = 'While starting spare of driver pool [{}]{}{}'.format(
+                self.cfg.name, os.linesep, format_trace(inspect.trace(), exc))
+            self.logger.error(error)
+            if driver is not None:
+                self._stop_spare(driver)
+        with self._cond:
+            self._ready.append((driver, error))
+            self._cond.notify_all()
+
+    def _stop_spare(self, driver):
+        """Stop a spare, logging any error."""
+        try:
+            driver.stop()
+            driver.wait(driver.STATUS.STOPPED)
+        except Exception as exc:
+            self.logger.error(
+                'While stopping spare of driver pool [{}]{}{}'.format(
+                    self.cfg.name, os.linesep,
+                    format_trace(inspect.trace(), exc)))
+
+    def _replenish(self):
+        """Start a new spare in the background. Must hold the condition."""
+        if not self._closed:
+            self._spares += 1
+            self._spawn(self._start_spare, self._spares)
+
+    def _fill(self):
+        """Start the spares, once. Must hold the condition."""
+        if self._filled:
+            return
+        if self.runpath is None:
+            self.make_runpath_dirs()
+        self._filled = True
+        for _ in range(self.cfg.size):
+            self._replenish()
+
+    def acquire(self, timeout=None):
+        """
+        Take a started spare, waiting for one to be ready, and start a new
+        one to replace it.
+
+        :param timeout: Maximum time to wait for a spare. Default: the
+            ``status_wait_timeout`` option.
+        :type timeout: ``int`` or ``float``
+        :return: Started driver.
+        :rtype: :py:class:`~testplan.testing.multitest.driver.base.Driver`
+        :raises RuntimeError: if the spare failed to start or none was ready
+            in time.
+        """
+        timeout = timeout or self.cfg.status_wait_timeout
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(
+                    'Driver pool [{}] is stopped.'.format(self.cfg.name))
+            self._fill()
+            deadline = time.time() + timeout
+            while not self._ready and time.time() < deadline:
+                self._cond.wait(deadline - time.time())
+            if not self._ready:
+                raise RuntimeError(
+                    'No spare of driver pool [{}] started within {}s.'.format(
+                        self.cfg.name, timeout))
+            driver, error = self._ready.popleft()
+            self._replenish()
+        if error:
+            raise RuntimeError(error)
+        return driver
+
+    def release(self, driver):
+        """
+        Stop a driver taken from the pool in the background.
+
+        :param driver: Driver returned by
+            :py:meth:`~testplan.testing.multitest.driver.pool.DriverPool.acquire`.
+        :type driver: :py:class:`~testplan.testing.multitest.driver.base.Driver`
+        """
+        with self._cond:
+            self._spawn(self._stop_spare, driver)
+
+    def starting(self):
+        """Start the spares in the background."""
+        with self._cond:
+            self._fill()
+
+    def stopping(self):
+        """
+        Stop the spares not handed over, once the spares being started or
+        stopped are done.
+        """
+        with self._cond:
+            self._closed = True
+            threads = list(self._threads)
+        for thread in threads:
+            interruptible_join(thread)
+        with self._cond:
+            spares = list(self._ready)
+            self._ready.clear()
+        for driver, error in spares:
+            if error is None:
+                self._stop_spare(driver)
+
+    def abort_dependencies(self):
+        """Abort the spares not handed over."""
+        with self._cond:
+            self._closed = True
+            spares = [driver for driver, error in self._ready
+                      if error is None]
+        for driver in spares:
+            yield driver
+
+    def aborting(self):
+        """Abort logic."""
+        pass
+
+
+class PooledDriverConfig(ResourceConfig):
+    """
+    Configuration object for
+    :py:class:`~testplan.testing.multitest.driver.pool.PooledDriver`
+    resource entity.
+    """
+
+    @classmethod
+    def get_options(cls):
+        """
+        Schema for options validation and assignment of default values.
+        """
+        return {
+            'name': str,
+            'pool': DriverPool,
+            ConfigOption('async_start', default=False): bool
+        }
+
+
+class PooledDriver(Resource):
+    """
+    Driver of a test environment that takes a started driver from a
+    :py:class:`~testplan.testing.multitest.driver.pool.DriverPool` when the
+    environment starts and releases it to the pool when the environment
+    stops. Attributes of the driver taken are available through it, i.e
+    ``env.app.port``, while it is started.
+
+    :param name: Driver name. Also uid.
+    :type name: ``str``
+    :param pool: Pool of the driver.
+    :type pool: :py:class:`~testplan.testing.multitest.driver.pool.DriverPool`
+
+    Also inherits all
+    :py:class:`~testplan.common.entity.base.Resource` options.
+    """
+
+    CONFIG = PooledDriverConfig
+
+    def __init__(self, **options):
+        super(PooledDriver, self).__init__(**options)
+        self._driver = None
+
+    def __getattr__(self, item):
+        try:
+            return self.__getattribute__(item)
+        except AttributeError:
+            if self.__dict__.get('_driver') is not None:
+                return getattr(self._driver, item)
+            raise
+
+    @property
+    def name(self):
+        """Driver name."""
+        return self.cfg.name
+
+    def uid(self):
+        """Driver uid."""
+        return self.cfg.name
+
+    @property
+    def driver(self):
+        """Driver taken from the pool, ``None`` when not started."""
+        return self._driver
+
+    @property
+    def runpath(self):
+        """Runpath of the driver taken from the pool."""
+        return self._driver.runpath if self._driver else None
+
+    def starting(self):
+        """Take a started driver from the pool."""
+        self._driver = self.cfg.pool.acquire()
+
+    def stopping(self):
+        """Release the driver to the pool."""
+        driver, self._driver = self._driver, None
+        if driver is not None:
+            self.cfg.pool.release(driver)
+
+    def abort_dependencies(self):
+        """Abort the driver taken from the pool."""
+        if self._driver is not None:
+            yield self._driver
+
+    def aborting(self):
+        """Abort logic."""
+        pass
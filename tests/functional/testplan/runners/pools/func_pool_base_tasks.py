@@ -1,6 +1,7 @@
 """TODO."""
 
 import os
+import time
 import psutil
 
 from testplan import Testplan
@@ -34,6 +35,24 @@ def get_mtest_imported(name):
     return MultiTest(name='MTest{}'.format(name), suites=[MySuite()])
 
 
+@testsuite
+class SleepingSuite(object):
+
+    def __init__(self, duration):
+        self._duration = duration
+
+    @testcase
+    def test_sleep(self, env, result):
+        time.sleep(self._duration)
+        result.true(True)
+
+
+def get_sleeping_mtest(name, duration):
+    """Test that takes some time to run."""
+    return MultiTest(name='MTest{}'.format(name),
+                     suites=[SleepingSuite(duration)])
+
+
 @testsuite
 class SuiteKillingWorker(object):
 
@@ -60,6 +79,20 @@ def multitest_kill_one_worker(name, parent_pid, size):
                      suites=[SuiteKillingWorker(parent_pid, size)])
 
 
+@testsuite
+class SuiteKillingWorkerAlways(object):
+
+    @testcase
+    def test_kill(self, env, result):
+        os.kill(os.getpid(), 9)
+
+
+def multitest_streamed_then_killed(name):
+    """Test that completes one suite and kills the worker on the next."""
+    return MultiTest(name='MTest{}'.format(name),
+                     suites=[MySuite(), SuiteKillingWorkerAlways()])
+
+
 def multitest_kills_worker():
     """To kill all child workers."""
     os.kill(os.getpid(), 9)
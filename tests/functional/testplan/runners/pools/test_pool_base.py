@@ -8,6 +8,7 @@ from testplan import Testplan, Task
 from testplan.testing.multitest import MultiTest, testsuite, testcase
 from testplan.testing.multitest.base import MultiTestConfig
 from testplan.runners.pools.base import Pool, Worker
+from testplan.testing.history import DurationHistory, history_uid
 from testplan.common.utils.logger import TESTPLAN_LOGGER
 
 
@@ -87,3 +88,58 @@ def test_pool_custom_worker():
     class ThreadWorker(Worker):
         pass
     schedule_tests_to_pool(Pool, worker_type=ThreadWorker, size=1)
+
+
+def test_pool_cost_history(tmpdir):
+    """Durations of tasks are used as their expected cost in the next run."""
+    history_path = str(tmpdir.join('history.db'))
+
+    def run_plan():
+        plan = Testplan(name='Plan', parse_cmdline=False,
+                        cost_history=history_path)
+        pool = Pool(name='MyPool', size=2)
+        plan.add_resource(pool)
+        from .func_pool_base_tasks import get_mtest_imported
+        tasks = [Task(target=get_mtest_imported, kwargs=dict(name=1)),
+                 Task(target=get_mtest_imported, kwargs=dict(name=2),
+                      cost=100)]
+        for task in tasks:
+            plan.schedule(task, resource='MyPool')
+        with log_propagation_disabled(TESTPLAN_LOGGER):
+            assert plan.run().run is True
+        return tasks
+
+    tasks = run_plan()
+    assert tasks[0].cost is None
+
+    history = DurationHistory(history_path)
+    history.load()
+    for task in tasks:
+        assert len(history.durations(task.signature)) == 1
+    assert len(history.durations('MTest1')) == 1
+    assert len(history.durations(
+        history_uid('MTest2', 'MySuite', 'test_comparison'))) == 1
+
+    tasks = run_plan()
+    assert tasks[0].cost == history.median(tasks[0].signature)
+    assert tasks[1].cost == 100
+    history.load()
+    assert len(history.durations(tasks[0].signature)) == 2
+
+
+def test_pool_cost_history_default_path(tmpdir):
+    """
+    Durations are only recorded if enabled, by default in a database of the
+    plan next to its runpath.
+    """
+    runpath = str(tmpdir.join('Plan'))
+    history_path = str(tmpdir.join('.plan_history.db'))
+    for cost_history in (False, True):
+        plan = Testplan(name='Plan', parse_cmdline=False, runpath=runpath,
+                        cost_history=cost_history)
+        pool = Pool(name='MyPool', size=1)
+        plan.add_resource(pool)
+        plan.schedule(Task(target=get_mtest), resource='MyPool')
+        with log_propagation_disabled(TESTPLAN_LOGGER):
+            assert plan.run().run is True
+        assert os.path.exists(history_path) is cost_history
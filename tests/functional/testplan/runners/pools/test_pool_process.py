@@ -1,6 +1,9 @@
 """Process worker pool unit tests."""
 
 import os
+import threading
+
+import pytest
 
 from testplan.common.utils.testing import log_propagation_disabled
 
@@ -22,6 +25,238 @@ def test_pool_basic():
                            heartbeats_miss_limit=2)
 
 
+def test_pool_prefetch():
+    """Workers keep tasks prefetched in their local pools."""
+    schedule_tests_to_pool('ProcPlan', ProcessPool,
+                           size=2,
+                           prefetch=3,
+                           worker_heartbeat=2,
+                           heartbeats_miss_limit=2)
+
+
+def test_pool_zygote():
+    """Workers forked from a zygote that preloads the test module."""
+    schedule_tests_to_pool('ProcPlan', ProcessPool,
+                           size=2,
+                           worker_start_method='zygote',
+                           preload_modules=[
+                               'tests.functional.testplan.runners.pools.'
+                               'func_pool_base_tasks'],
+                           worker_heartbeat=2,
+                           heartbeats_miss_limit=2)
+
+
+def test_pool_stream_results():
+    """Workers stream the report of each suite as it completes."""
+    schedule_tests_to_pool('ProcPlan', ProcessPool,
+                           size=2,
+                           stream_results=True,
+                           worker_heartbeat=2,
+                           heartbeats_miss_limit=2)
+
+
+def test_pool_shared_results():
+    """Workers pass their messages through files of the pool runpath."""
+    schedule_tests_to_pool('ProcPlan', ProcessPool,
+                           size=2,
+                           shared_results=True,
+                           shared_results_threshold=1,
+                           worker_heartbeat=2,
+                           heartbeats_miss_limit=2)
+
+
+class ReturnRecordingProcessPool(ProcessPool):
+    """Process pool recording the tasks returned by workers."""
+
+    def __init__(self, **options):
+        super(ReturnRecordingProcessPool, self).__init__(**options)
+        self.returned = []
+
+    def _handle_task_return(self, worker, request, response):
+        self.returned.extend(request.data)
+        super(ReturnRecordingProcessPool, self)._handle_task_return(
+            worker, request, response)
+
+
+def test_pool_work_stealing():
+    """Tasks queued in the local pool of a busy worker are reclaimed."""
+    pool_name = ProcessPool.__name__
+    plan = Testplan(
+        name='ProcPlan',
+        parse_cmdline=False,
+    )
+    pool = ReturnRecordingProcessPool(name=pool_name, size=2,
+                                      prefetch=3,
+                                      worker_heartbeat=2,
+                                      heartbeats_miss_limit=2,
+                                      max_active_loop_sleep=1)
+    plan.add_resource(pool)
+
+    dirname = os.path.dirname(os.path.abspath(__file__))
+    uids = [plan.schedule(target='get_sleeping_mtest',
+                          module='func_pool_base_tasks',
+                          path=dirname, args=(idx, 1),
+                          resource=pool_name)
+            for idx in range(4)]
+    uids.append(plan.schedule(target='get_sleeping_mtest',
+                              module='func_pool_base_tasks',
+                              path=dirname, args=(4, 0),
+                              resource=pool_name))
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        res = plan.run()
+
+    assert res.success is True
+    assert pool.returned
+    for idx, uid in enumerate(uids):
+        assert plan.result.test_results[uid].report.name == \
+            'MTest{}'.format(idx)
+    # Being reclaimed does not count as an attempt.
+    for uid in uids:
+        assert pool.task_assign_cnt[uid] == 1
+
+
+class RestartRecordingProcessPool(ProcessPool):
+    """Process pool recording the pids of the workers it restarts."""
+
+    def __init__(self, **options):
+        super(RestartRecordingProcessPool, self).__init__(**options)
+        self.restarted = []
+
+    def _restart_worker(self, worker):
+        self.restarted.append(worker.handler.pid)
+        super(RestartRecordingProcessPool, self)._restart_worker(worker)
+
+
+class SlowRestartProcessPool(ProcessPool):
+    """
+    Process pool whose first worker restart lasts until results of another
+    worker are received.
+    """
+
+    def __init__(self, **options):
+        super(SlowRestartProcessPool, self).__init__(**options)
+        self.results_received = threading.Event()
+        self.dispatched_during_restart = None
+
+    def _handle_taskresults(self, worker, request, response):
+        super(SlowRestartProcessPool, self)._handle_taskresults(
+            worker, request, response)
+        self.results_received.set()
+
+    def _restart_worker(self, worker):
+        if self.dispatched_during_restart is None:
+            self.results_received.clear()
+            self.dispatched_during_restart = \
+                self.results_received.wait(timeout=60)
+        super(SlowRestartProcessPool, self)._restart_worker(worker)
+
+
+@pytest.mark.parametrize(
+    'pool_cfg',
+    (
+        dict(max_tasks_per_worker=2),
+        # Every worker process uses more memory than this.
+        dict(max_worker_rss=1024),
+    )
+)
+def test_pool_recycle_workers(pool_cfg):
+    """Workers are restarted between tasks past a task or memory limit."""
+    pool_name = ProcessPool.__name__
+    plan = Testplan(
+        name='ProcPlan',
+        parse_cmdline=False,
+    )
+    pool = RestartRecordingProcessPool(name=pool_name, size=1,
+                                       worker_heartbeat=2,
+                                       heartbeats_miss_limit=2,
+                                       max_active_loop_sleep=1,
+                                       **pool_cfg)
+    plan.add_resource(pool)
+
+    dirname = os.path.dirname(os.path.abspath(__file__))
+    uids = [plan.schedule(target='get_mtest',
+                          module='func_pool_base_tasks',
+                          path=dirname, kwargs=dict(name=idx),
+                          resource=pool_name)
+            for idx in range(5)]
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        res = plan.run()
+
+    assert res.success is True
+    for idx, uid in enumerate(uids):
+        assert plan.result.test_results[uid].report.name == \
+            'MTest{}'.format(idx)
+    # No restart once there is no task left.
+    expected = 2 if 'max_tasks_per_worker' in pool_cfg else 4
+    assert len(pool.restarted) == len(set(pool.restarted)) == expected
+    for uid in uids:
+        assert pool.task_assign_cnt[uid] == 1
+
+
+def test_pool_dispatch_while_restarting_worker():
+    """Tasks are dispatched to the other workers while one restarts."""
+    pool_name = ProcessPool.__name__
+    plan = Testplan(
+        name='ProcPlan',
+        parse_cmdline=False,
+    )
+    pool = SlowRestartProcessPool(name=pool_name, size=2,
+                                  worker_heartbeat=2,
+                                  heartbeats_miss_limit=2,
+                                  max_active_loop_sleep=1,
+                                  max_tasks_per_worker=1)
+    plan.add_resource(pool)
+
+    dirname = os.path.dirname(os.path.abspath(__file__))
+    uids = [plan.schedule(target='get_mtest',
+                          module='func_pool_base_tasks',
+                          path=dirname, kwargs=dict(name=idx),
+                          resource=pool_name)
+            for idx in range(4)]
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        res = plan.run()
+
+    assert res.success is True
+    assert pool.dispatched_during_restart is True
+    for uid in uids:
+        assert pool.task_assign_cnt[uid] == 1
+
+
+def test_stream_results_of_killed_worker():
+    """Suites streamed before a worker was killed are kept in the report."""
+    pool_name = ProcessPool.__name__
+    plan = Testplan(
+        name='ProcPlan',
+        parse_cmdline=False,
+    )
+    pool = ProcessPool(name=pool_name, size=2,
+                       stream_results=True,
+                       task_retries_limit=1,
+                       worker_heartbeat=1,
+                       heartbeats_miss_limit=2,
+                       max_active_loop_sleep=1)
+    plan.add_resource(pool)
+
+    dirname = os.path.dirname(os.path.abspath(__file__))
+    kill_uid = plan.schedule(target='multitest_streamed_then_killed',
+                             module='func_pool_base_tasks',
+                             path=dirname, args=('killed',),
+                             resource=pool_name)
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        res = plan.run()
+
+    assert res.success is False
+    report = plan.result.test_results[kill_uid].report
+    assert report.name == 'MTestkilled'
+    assert report.status == Status.ERROR
+    assert [entry.name for entry in report] == ['MySuite']
+    assert report.entries[0].passed
+
+
 def test_kill_one_worker():
     """Kill one worker but pass after reassigning task."""
     pool_name = ProcessPool.__name__
@@ -0,0 +1,147 @@
+"""Executor task bookkeeping operations per task, with an informative timing."""
+
+import contextlib
+import random
+import time
+
+import mock
+
+from testplan import Task
+from testplan.common.utils.logger import TESTPLAN_LOGGER
+from testplan.common.utils.path import default_runpath
+from testplan.common.utils.testing import log_propagation_disabled
+from testplan.runners.base import OrderedSet
+from testplan.runners.pools.base import Pool, TaskQueue
+from testplan.runners.pools.communication import Message
+from testplan.runners.pools.tasks import TaskResult
+
+from tests.unit.testplan.runners.pools.tasks.data.sample_tasks import Runnable
+
+NUM_TASKS = 10000
+
+
+class StubWorker(object):
+    """Stands for a worker, only keeping the pool bookkeeping attributes."""
+
+    def __init__(self):
+        self.assigned = set()
+        self.requesting = 0
+        self.reclaim = 0
+        self.responses = []
+
+    def respond(self, msg):
+        self.responses.append(msg)
+
+
+@contextlib.contextmanager
+def counted_operations(cls, *names):
+    """
+    Count the calls of the given methods of a class while failing on its
+    linear time iteration.
+    """
+    patchers = [mock.patch.object(
+        cls, '__iter__', side_effect=AssertionError(
+            'Linear scan of a {}'.format(cls.__name__)))]
+    patchers.extend(mock.patch.object(
+        cls, name, autospec=True, side_effect=getattr(cls, name))
+                    for name in names)
+    mocks = [patcher.start() for patcher in patchers]
+    try:
+        yield dict(zip(names, mocks[1:]))
+    finally:
+        for patcher in patchers:
+            patcher.stop()
+
+
+def pool_bookkeeping_time(num_tasks, batch=16):
+    """
+    Time spent by a pool adding tasks, handing them out to a worker and
+    handling their results out of order.
+    """
+    pool = Pool(name='ScalingPool', size=1, runpath=default_runpath)
+    tasks = [Task(target=Runnable(idx), uid=str(idx))
+             for idx in range(num_tasks)]
+    results = [TaskResult(task=task, result=None, status=True)
+               for task in tasks]
+    random.Random(0).shuffle(results)
+
+    worker = StubWorker()
+    request = Message()
+    response = Message()
+    pool.status.change(pool.status.STARTING)
+    pool.status.change(pool.status.STARTED)
+
+    with log_propagation_disabled(TESTPLAN_LOGGER), \
+            counted_operations(TaskQueue, 'append', 'popleft', 'pop') \
+            as queue_calls, \
+            counted_operations(OrderedSet, 'append', 'remove') \
+            as ongoing_calls:
+        start_time = time.time()
+        for task in tasks:
+            pool.add(task, task.uid())
+        while pool.unassigned:
+            pool._handle_taskpull_request(
+                worker, request.make(Message.TaskPullRequest, data=batch),
+                response)
+        for idx in range(0, num_tasks, batch):
+            pool._handle_taskresults(
+                worker, request.make(
+                    Message.TaskResults, data=results[idx:idx + batch]),
+                response)
+        duration = time.time() - start_time
+
+    assert not pool.ongoing
+    assert not worker.assigned
+    assert len(pool.results) == num_tasks
+    # Each task is queued, dequeued and removed from the ongoing ones once.
+    assert queue_calls['append'].call_count == num_tasks
+    assert queue_calls['popleft'].call_count == num_tasks
+    assert queue_calls['pop'].call_count == 0
+    assert ongoing_calls['append'].call_count == num_tasks
+    assert ongoing_calls['remove'].call_count == num_tasks
+    return duration
+
+
+def ongoing_bookkeeping_time(num_tasks):
+    """
+    Time spent on the ongoing uids of an executor, removed in order as the
+    local runner does and out of order as pool results arrive.
+    """
+    uids = [str(idx) for idx in range(num_tasks)]
+    shuffled = list(uids)
+    random.Random(0).shuffle(shuffled)
+
+    with counted_operations(OrderedSet, 'first', 'discard', 'remove') \
+            as calls:
+        start_time = time.time()
+        ongoing = OrderedSet(uids)
+        while ongoing:
+            ongoing.discard(ongoing.first())
+        ongoing = OrderedSet(uids)
+        for uid in shuffled:
+            ongoing.remove(uid)
+        duration = time.time() - start_time
+
+    assert calls['first'].call_count == num_tasks
+    assert calls['discard'].call_count == num_tasks
+    assert calls['remove'].call_count == num_tasks
+    return duration
+
+
+def report(duration, num_tasks):
+    """Print the bookkeeping time, only informative."""
+    print('{} tasks: {:.3f}s, {:.2f}us/task'.format(
+        num_tasks, duration, duration / num_tasks * 1e6))
+
+
+def test_pool_bookkeeping_scaling():
+    """
+    Pool task queues take each task in and out once without scanning them,
+    they have O(log n) enqueue and dequeue and O(1) removal.
+    """
+    report(pool_bookkeeping_time(NUM_TASKS), NUM_TASKS)
+
+
+def test_ongoing_bookkeeping_scaling():
+    """Executor ongoing items have O(1) dequeue and removal."""
+    report(ongoing_bookkeeping_time(NUM_TASKS), NUM_TASKS)
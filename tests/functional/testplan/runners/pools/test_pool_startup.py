@@ -0,0 +1,42 @@
+"""Benchmark of process pool startup time against worker start method."""
+
+import os
+import time
+
+import pytest
+
+from testplan.common.utils.timing import wait
+from testplan.runners.pools import ProcessPool
+
+SIZE = 4
+
+
+def startup_time(start_method, size):
+    """
+    Time from starting a process pool until all of its workers connected
+    and requested their config, i.e. have imported everything they need.
+    """
+    pool = ProcessPool(name='StartupPool', size=size,
+                       worker_start_method=start_method)
+    start_time = time.time()
+    with pool:
+        wait(lambda: all(worker.last_heartbeat is not None
+                         for worker in pool._workers),
+             timeout=120, interval=0.01, raise_on_timeout=True)
+        duration = time.time() - start_time
+        if start_method == 'zygote':
+            assert pool.zygote is not None
+    return duration
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='Requires fork.')
+def test_process_pool_startup():
+    """
+    Workers forked from a zygote or spawned all start, reporting how long
+    each start method takes. Timings are printed rather than compared, as
+    they depend on the load of the host.
+    """
+    spawn = startup_time('spawn', SIZE)
+    zygote = startup_time('zygote', SIZE)
+    print('ProcessPool size {}: spawn {:.2f}s, zygote {:.2f}s'.format(
+        SIZE, spawn, zygote))
@@ -0,0 +1,90 @@
+"""Benchmark of pool task dispatching throughput against pool size."""
+
+import threading
+import time
+
+import mock
+import pytest
+
+from testplan import Task
+from testplan.common.utils.path import default_runpath
+from testplan.runners.pools import ThreadPool, ProcessPool, DirectPool
+
+SAMPLE_TASKS = 'tests.unit.testplan.runners.pools.tasks.data.sample_tasks'
+
+
+def measure_throughput(pool, num_tasks):
+    """
+    Schedule trivial tasks to a pool and measure how many of them are
+    completed per second once the pool is started.
+
+    The loop sleeps of the pool threads are recorded along with the number
+    of tasks not handed out yet when they started.
+    """
+    tasks = [Task(target='Runnable', module=SAMPLE_TASKS, args=(idx,))
+             for idx in range(num_tasks)]
+    for task in tasks:
+        pool.add(task, task.uid())
+
+    main_thread = threading.current_thread()
+    real_sleep = time.sleep
+    loop_sleeps = []
+
+    def recording_sleep(seconds):
+        if threading.current_thread() is not main_thread and \
+                seconds == pool.cfg.active_loop_sleep:
+            loop_sleeps.append(len(pool.unassigned))
+        real_sleep(seconds)
+
+    with mock.patch('time.sleep', side_effect=recording_sleep):
+        with pool:
+            start_time = time.time()
+            while pool.pending_work():
+                assert pool.is_alive
+                real_sleep(0.001)
+            duration = time.time() - start_time
+
+    for idx, task in enumerate(tasks):
+        assert pool.results[task.uid()].result == idx * 2
+    return num_tasks / duration, loop_sleeps
+
+
+@pytest.mark.parametrize('size', (1, 4, 16, 64))
+def test_thread_pool_throughput(size):
+    """
+    Trivial tasks are not limited by a fixed loop sleep of the pool, workers
+    only back off once every task is handed out. Without work stealing no
+    task is handed back to the pool.
+    """
+    pool = ThreadPool(name='ThroughputPool', size=size,
+                      runpath=default_runpath, work_stealing=False)
+    rate, loop_sleeps = measure_throughput(pool, num_tasks=1000)
+    print('ThreadPool size {}: {:.0f} tasks/sec'.format(size, rate))
+    assert not any(loop_sleeps)
+
+
+@pytest.mark.parametrize('size', (1, 4, 16))
+def test_direct_pool_throughput(size):
+    """
+    Tasks are handed to the threads of a direct pool without worker
+    messages, idle threads wait to be notified instead of sleeping.
+    """
+    for name, pool_type in (('ThreadPool', ThreadPool),
+                            ('DirectPool', DirectPool)):
+        pool = pool_type(name='ThroughputPool', size=size,
+                         runpath=default_runpath)
+        rate, loop_sleeps = measure_throughput(pool, num_tasks=2000)
+        print('{} size {}: {:.0f} tasks/sec, {:.1f}us/task'.format(
+            name, size, rate, 1e6 / rate))
+        if pool_type is DirectPool:
+            assert not loop_sleeps
+
+
+@pytest.mark.parametrize('size', (1, 4))
+def test_process_pool_throughput(size):
+    """Dispatching to child processes is not bound by pool loop sleeps."""
+    pool = ProcessPool(name='ThroughputProcPool', size=size,
+                       work_stealing=False)
+    rate, loop_sleeps = measure_throughput(pool, num_tasks=200)
+    print('ProcessPool size {}: {:.0f} tasks/sec'.format(size, rate))
+    assert not loop_sleeps
@@ -0,0 +1,97 @@
+"""Tests of the drivers started ahead by a driver pool."""
+
+import os
+import time
+import threading
+
+from testplan.testing.multitest import MultiTest, testsuite, testcase
+
+from testplan import Testplan
+from testplan.common.entity.base import ResourceStatus
+from testplan.common.utils.testing import log_propagation_disabled
+from testplan.testing.multitest.driver.base import Driver
+from testplan.testing.multitest.driver.pool import DriverPool, PooledDriver
+
+from testplan.common.utils.logger import TESTPLAN_LOGGER
+
+NUM_TESTS = 4
+START_DELAY = 0.5
+
+
+class SlowDriver(Driver):
+    """Driver taking some time to start, recording its instances."""
+
+    lock = threading.Lock()
+    instances = []
+
+    def starting(self):
+        super(SlowDriver, self).starting()
+        with self.lock:
+            self.instances.append(self)
+
+    def started_check(self, timeout=None):
+        time.sleep(START_DELAY)
+
+
+class FailingDriver(Driver):
+    """Driver that fails to start."""
+
+    def starting(self):
+        raise RuntimeError('Cannot start')
+
+
+@testsuite
+class PooledSuite(object):
+
+    @testcase
+    def pooled_driver(self, env, result):
+        result.equal(env.app.status.tag, ResourceStatus.STARTED)
+        result.equal(env.app.driver.status.tag, ResourceStatus.STARTED)
+        result.equal(env.app.cfg.name, 'app')
+        result.true(os.path.isdir(env.app.runpath))
+        result.equal(env.app.extracts, {})
+
+
+def run_plan(pool, num_tests):
+    plan = Testplan(name='DriverPoolPlan', parse_cmdline=False)
+    plan.add_resource(pool)
+    for idx in range(num_tests):
+        plan.add(MultiTest(name='Mtest{}'.format(idx), suites=[PooledSuite()],
+                           environment=[PooledDriver(name='app', pool=pool)]))
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        start_time = time.time()
+        assert plan.run().run is True
+        return plan, time.time() - start_time
+
+
+def test_driver_pool():
+    """
+    Tests take drivers started ahead, each with a runpath of its own, and
+    all of them are stopped once the plan ends.
+    """
+    SlowDriver.instances = []
+    pool = DriverPool(name='AppPool', driver=SlowDriver,
+                      driver_options={'name': 'app'}, size=NUM_TESTS)
+    plan, duration = run_plan(pool, NUM_TESTS)
+
+    assert plan.report.passed is True
+    # Spares started concurrently, ahead of the tests.
+    assert duration < NUM_TESTS * START_DELAY
+    # Spares of the tests and their replacements.
+    assert len(SlowDriver.instances) == 2 * NUM_TESTS
+    runpaths = set(driver.runpath for driver in SlowDriver.instances)
+    assert len(runpaths) == 2 * NUM_TESTS
+    for driver in SlowDriver.instances:
+        assert os.path.dirname(driver.runpath) == pool.runpath
+        assert driver.status.tag == ResourceStatus.STOPPED
+
+
+def test_driver_pool_start_failure():
+    """Tests taking a spare that failed to start report an error."""
+    pool = DriverPool(name='FailingPool', driver=FailingDriver,
+                      driver_options={'name': 'app'})
+    plan, _ = run_plan(pool, 2)
+
+    assert plan.report.passed is False
+    for report in plan.report.entries:
+        assert report.status == 'error'
@@ -2,6 +2,8 @@
 
 import os
 import re
+import time
+import datetime
 import tempfile
 
 from testplan.testing.multitest import MultiTest, testsuite, testcase
@@ -231,3 +233,69 @@ def test_multitest_driver_failure():
     assert re.match(r'.*Information from log file:.+logfile.*', text2[0])
     for idx, line in enumerate(text2[1:]):
         assert re.match(r'.*This is line 99{}.*'.format(idx), line)
+
+
+class SlowDriver(Driver):
+    """Driver taking some time to start, recording when it started."""
+
+    events = []
+
+    def starting(self):
+        super(SlowDriver, self).starting()
+        time.sleep(0.5)
+        self.events.append(('started', self.name))
+
+    def stopping(self):
+        super(SlowDriver, self).stopping()
+        self.events.append(('stopped', self.name))
+
+    def started_check(self, timeout=None):
+        pass
+
+
+def test_multitest_parallel_environment():
+    """
+    Drivers start concurrently once the drivers they depend on, explicitly
+    or through context values, are started and stop in reverse order.
+    """
+    SlowDriver.events = []
+    server = SlowDriver(name='server')
+    database = SlowDriver(name='database')
+    client = SlowDriver(name='client', depends_on=['database'],
+                        install_files=[context('server', '{{name}}')])
+    mtest = MultiTest(name='Mtest', suites=[EmptySuite()],
+                      environment=[client, server, database],
+                      parallel_environment=True)
+    assert [[driver.name for driver in wave]
+            for wave in mtest.resources.dependency_waves()] == [
+        ['server', 'database'], ['client']]
+
+    mtest.run()
+    assert mtest.result.run is True
+    events = SlowDriver.events
+    assert sorted(events[:2]) == [
+        ('started', 'database'), ('started', 'server')]
+    assert events[2:4] == [('started', 'client'), ('stopped', 'client')]
+
+    timer = mtest.report.timer
+    for name in ('server', 'database', 'client'):
+        assert timer['start:{}'.format(name)].elapsed >= 0.5
+        assert 'stop:{}'.format(name) in timer
+    # The two waves took about 1 second, against 1.5 for sequential start.
+    assert timer['start:client'].end - timer['start:server'].start < \
+        datetime.timedelta(seconds=1.4)
+
+
+def test_environment_circular_dependencies():
+    """Drivers depending on each other are not started."""
+    first = SlowDriver(name='first', depends_on=['second'])
+    second = SlowDriver(name='second', depends_on=['first'])
+    mtest = MultiTest(name='Mtest', suites=[EmptySuite()],
+                      environment=[first, second],
+                      parallel_environment=True)
+    env = mtest.resources
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        env.start()
+    assert list(env.start_exceptions.values()) == [
+        "Circular dependencies between resources ['first', 'second']."]
+    assert first.status.tag is None and second.status.tag is None
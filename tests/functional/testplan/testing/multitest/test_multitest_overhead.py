@@ -0,0 +1,83 @@
+"""Benchmark of the framework overhead of running a testcase."""
+
+import os
+import time
+import traceback
+
+import mock
+
+from testplan.testing.multitest import MultiTest, testsuite, testcase
+from testplan.testing.multitest import base as multitest_base
+
+from testplan import Testplan
+from testplan.common.utils.testing import log_propagation_disabled
+from testplan.common.utils.logger import TESTPLAN_LOGGER
+
+NUM_TESTCASES = 1000
+NUM_SUITES = 50
+
+
+@testsuite
+class ManyCases(object):
+
+    @testcase(parameters=range(NUM_TESTCASES))
+    def trivial(self, env, result, idx):
+        pass
+
+
+@testsuite
+class FewCases(object):
+
+    def __init__(self, idx):
+        self.idx = idx
+
+    def suite_name(self):
+        return str(self.idx)
+
+    @testcase
+    def trivial(self, env, result):
+        pass
+
+
+def run_time(suites):
+    """
+    Time to run a plan with a single MultiTest of the given suites, and the
+    number of loop sleeps of the MultiTest while running them.
+    """
+    plan = Testplan(name='OverheadPlan', parse_cmdline=False)
+    plan.add(MultiTest(name='Overhead', suites=suites))
+
+    multitest_module = os.path.splitext(multitest_base.__file__)[0]
+    real_sleep = time.sleep
+    multitest_sleeps = []
+
+    def recording_sleep(seconds):
+        if any(os.path.splitext(frame[0])[0] == multitest_module
+               for frame in traceback.extract_stack()):
+            multitest_sleeps.append(seconds)
+        real_sleep(seconds)
+
+    with log_propagation_disabled(TESTPLAN_LOGGER), \
+            mock.patch('time.sleep', side_effect=recording_sleep):
+        start_time = time.time()
+        assert plan.run().run is True
+        duration = time.time() - start_time
+    assert plan.report.passed is True
+    return duration, multitest_sleeps
+
+
+def test_testcase_overhead():
+    """
+    Running testcases and suites does not pay a loop sleep, which used to be
+    paid after every testcase and suite.
+    """
+    duration, multitest_sleeps = run_time([ManyCases()])
+    print('{} testcases: {:.3f}s, {:.1f}us/testcase'.format(
+        NUM_TESTCASES, duration, duration / NUM_TESTCASES * 1e6))
+    assert multitest_sleeps == []
+
+    duration, multitest_sleeps = run_time(
+        [FewCases(idx) for idx in range(NUM_SUITES)])
+    print('{} suites: {:.3f}s, {:.1f}us/suite'.format(
+        NUM_SUITES, duration, duration / NUM_SUITES * 1e6))
+    assert multitest_sleeps == []
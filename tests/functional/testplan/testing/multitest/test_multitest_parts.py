@@ -1,3 +1,4 @@
+import os
 
 from testplan.testing.multitest import MultiTest, testsuite, testcase
 
@@ -7,6 +8,7 @@ from testplan.runners.pools.tasks import Task
 from testplan.report.testing import Status
 from testplan.common.utils.testing import log_propagation_disabled
 from testplan.common.utils.logger import TESTPLAN_LOGGER
+from testplan.testing.history import DurationHistory, history_uid
 
 
 @testsuite
@@ -40,6 +42,13 @@ def get_mtest(part_tuple=None):
     return test
 
 
+def get_duration_mtest(part_tuple):
+    return MultiTest(name='MTest',
+                     suites=[Suite1(), Suite2()],
+                     part=part_tuple,
+                     part_strategy='duration')
+
+
 def test_multi_parts_not_merged():
     """Execute MultiTest parts but do not merge report."""
     plan = Testplan(name='plan', parse_cmdline=False,
@@ -180,3 +189,53 @@ def test_multi_parts_missing_parts():
     assert plan.report.entries[0].entries[1].status == Status.FAILED  # Suite2
     assert 'not all MultiTest parts had been scheduled' in \
            plan.report.entries[0].logs[0]['message']
+
+
+def test_multi_parts_duration_balanced(tmpdir):
+    """Parts are balanced by testcase durations of previous runs."""
+    # Parts are materialized by the pool workers.
+    tasks = [Task(target='get_duration_mtest', module='test_multitest_parts',
+                  path=os.path.dirname(__file__),
+                  kwargs=dict(part_tuple=(idx, 3)))
+             for idx in range(3)]
+
+    history_path = str(tmpdir.join('history.db'))
+    history = DurationHistory(history_path)
+    history.record(
+        history_uid('MTest', 'Suite1', 'test_true', 'test_true__val_0'), 10)
+    for val in range(1, 10):
+        history.record(history_uid('MTest', 'Suite1', 'test_true',
+                                   'test_true__val_{}'.format(val)), 1)
+    history.record(history_uid('Other', 'Suite1', 'test_true'), 5)
+    for task in tasks:
+        history.record_part(task.signature, 'MTest')
+    history.save()
+
+    plan = Testplan(name='plan', parse_cmdline=False,
+                    merge_scheduled_parts=False,
+                    cost_history=history_path)
+    pool = ThreadPool(name='MyPool', size=2)
+    plan.add_resource(pool)
+    for task in tasks:
+        plan.schedule(task, resource='MyPool')
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        assert plan.run().run is True
+
+    # All parts split by the durations loaded once when the plan started.
+    for task in tasks:
+        assert task.part_durations == tasks[0].part_durations
+    assert tasks[0].part_durations[history_uid(
+        'MTest', 'Suite1', 'test_true', 'test_true__val_0')] == 10
+    # Only the durations of the test the tasks ran a part of.
+    assert len(tasks[0].part_durations) == 10
+
+    testcases = [
+        [case.name for suite in entry for param in suite for case in param]
+        for entry in plan.report.entries]
+    # The slow testcase is alone, unknown ones weigh as the median of 1s.
+    assert testcases[0] == ['test_true__val_0']
+    assert len(testcases[1]) == len(testcases[2]) == 6
+    assert sorted(sum(testcases, [])) == sorted(
+        ['test_true__val_{}'.format(val) for val in range(10)] +
+        ['test_false__val_{}'.format(val) for val in ('False', 'True', 'None')])
@@ -0,0 +1,144 @@
+"""Tests of the environments shared between MultiTests."""
+
+import os
+import threading
+
+from testplan.testing.multitest import MultiTest, testsuite, testcase
+
+from testplan import Testplan
+from testplan.common.entity.base import ResourceStatus
+from testplan.common.utils.context import context
+from testplan.common.utils.testing import log_propagation_disabled
+from testplan.environment import SharedEnvironment
+from testplan.runners.pools import ThreadPool
+from testplan.runners.pools.tasks import Task
+from testplan.testing.multitest.driver.base import Driver
+
+from testplan.common.utils.logger import TESTPLAN_LOGGER
+
+NUM_TESTS = 4
+
+
+class CountingDriver(Driver):
+    """Driver counting the times it started and stopped."""
+
+    def __init__(self, **options):
+        super(CountingDriver, self).__init__(**options)
+        self.events = []
+        self._lock = threading.Lock()
+
+    def starting(self):
+        super(CountingDriver, self).starting()
+        with self._lock:
+            self.events.append('started')
+
+    def stopping(self):
+        super(CountingDriver, self).stopping()
+        with self._lock:
+            self.events.append('stopped')
+
+    def started_check(self, timeout=None):
+        pass
+
+
+class FailingDriver(CountingDriver):
+    """Driver that fails to start."""
+
+    def starting(self):
+        super(FailingDriver, self).starting()
+        raise RuntimeError('Cannot start')
+
+
+@testsuite
+class SharedSuite(object):
+
+    @testcase
+    def shared_driver(self, env, result):
+        result.true('database' in env)
+        result.equal(env.database.status.tag, ResourceStatus.STARTED)
+        result.equal(env.database.events, ['started'])
+        result.true(env.client.context.database is env.database)
+
+
+def make_multitest(idx, shared):
+    client = CountingDriver(
+        name='client', install_files=[context('database', '{{name}}')])
+    return MultiTest(name='Mtest{}'.format(idx), suites=[SharedSuite()],
+                     environment=[client], shared_environments=[shared])
+
+
+def shared_database():
+    database = CountingDriver(name='database')
+    return database, SharedEnvironment(name='Shared', environment=[database])
+
+
+def test_shared_environment_local_runner():
+    """Drivers of the shared environment start once for all the tests."""
+    database, shared = shared_database()
+    plan = Testplan(name='SharedPlan', parse_cmdline=False)
+    plan.add_resource(shared)
+    for idx in range(NUM_TESTS):
+        plan.add(make_multitest(idx, shared))
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        assert plan.run().run is True
+    assert plan.report.passed is True
+    assert database.events == ['started', 'stopped']
+
+
+def test_shared_environment_thread_pool():
+    """Tests executed concurrently by a pool share the drivers."""
+    database, shared = shared_database()
+    plan = Testplan(name='SharedPoolPlan', parse_cmdline=False)
+    plan.add_resource(shared)
+    pool = ThreadPool(name='MyPool', size=NUM_TESTS)
+    plan.add_resource(pool)
+    for idx in range(NUM_TESTS):
+        plan.schedule(Task(target=make_multitest(idx, shared)),
+                      resource='MyPool')
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        assert plan.run().run is True
+    assert plan.report.passed is True
+    assert len(plan.report.entries) == NUM_TESTS
+    assert database.events == ['started', 'stopped']
+
+
+def test_shared_environment_thread_pool_tasks():
+    """
+    Tests created when their task is executed by a pool share the drivers.
+    """
+    database, shared = shared_database()
+    plan = Testplan(name='SharedTasksPlan', parse_cmdline=False)
+    plan.add_resource(shared)
+    pool = ThreadPool(name='MyPool', size=2)
+    plan.add_resource(pool)
+    dirname = os.path.dirname(os.path.abspath(__file__))
+    for idx in range(NUM_TESTS):
+        plan.schedule(target='make_multitest',
+                      module='test_shared_environment', path=dirname,
+                      args=(idx, shared), resource='MyPool')
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        assert plan.run().run is True
+    assert plan.report.passed is True
+    assert len(plan.report.entries) == NUM_TESTS
+    assert database.events == ['started', 'stopped']
+
+
+def test_shared_environment_start_failure():
+    """Tests sharing drivers that failed to start report an error."""
+    database = FailingDriver(name='database')
+    shared = SharedEnvironment(name='Shared', environment=[database])
+    plan = Testplan(name='SharedFailurePlan', parse_cmdline=False)
+    plan.add_resource(shared)
+    for idx in range(2):
+        plan.add(make_multitest(idx, shared))
+
+    with log_propagation_disabled(TESTPLAN_LOGGER):
+        plan.run()
+    assert plan.report.passed is False
+    for report in plan.report.entries:
+        assert report.status == 'error'
+    # Started by the first test only, no retries by the later tests.
+    assert database.events.count('started') == 1
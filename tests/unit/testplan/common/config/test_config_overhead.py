@@ -0,0 +1,82 @@
+"""Benchmark of the cost of building entities and looking up options."""
+
+import time
+
+import mock
+
+from testplan.testing.multitest import MultiTest
+from testplan.testing.multitest.base import MultiTestConfig
+
+NUM_ENTITIES = 200
+NUM_LOOKUPS = 100000
+
+
+class CachedMultiTestConfig(MultiTestConfig):
+    """Builds its schema once."""
+
+
+class CachedMultiTest(MultiTest):
+    CONFIG = CachedMultiTestConfig
+
+
+class UncachedMultiTestConfig(MultiTestConfig):
+    """Builds its schema for every instance."""
+    cache_schema = False
+
+
+class UncachedMultiTest(MultiTest):
+    CONFIG = UncachedMultiTestConfig
+
+
+def construction_time(entity_class):
+    """Average time to build an entity."""
+    start_time = time.time()
+    for idx in range(NUM_ENTITIES):
+        entity_class(name='Mtest{}'.format(idx), suites=[])
+    return (time.time() - start_time) / NUM_ENTITIES
+
+
+def test_entity_construction():
+    """Entities of a class share a schema built once."""
+    with mock.patch.object(
+            CachedMultiTestConfig, 'build_schema',
+            wraps=CachedMultiTestConfig.build_schema) as build_schema:
+        cached = construction_time(CachedMultiTest)
+    assert build_schema.call_count == 1
+
+    with mock.patch.object(
+            UncachedMultiTestConfig, 'build_schema',
+            wraps=UncachedMultiTestConfig.build_schema) as build_schema:
+        uncached = construction_time(UncachedMultiTest)
+    assert build_schema.call_count == NUM_ENTITIES
+
+    print('Construction: {:.1f}us cached schema, {:.1f}us uncached'.format(
+        cached * 1e6, uncached * 1e6))
+
+
+def test_option_lookup():
+    """
+    Options are resolved through the parent chain once, later lookups are
+    plain attribute accesses.
+    """
+    parent = MultiTest(name='Parent', suites=[])
+    mtest = MultiTest(name='Mtest', suites=[])
+    mtest.cfg.parent = parent.cfg
+    cfg = mtest.cfg
+
+    assert 'active_loop_sleep' not in vars(cfg)
+    value = cfg.active_loop_sleep
+    assert vars(cfg)['active_loop_sleep'] == value
+
+    start_time = time.time()
+    for _ in range(NUM_LOOKUPS):
+        cfg.__getattr__('active_loop_sleep')
+    resolving = (time.time() - start_time) / NUM_LOOKUPS
+
+    start_time = time.time()
+    for _ in range(NUM_LOOKUPS):
+        cfg.active_loop_sleep
+    resolved = (time.time() - start_time) / NUM_LOOKUPS
+
+    print('Lookup: {:.3f}us resolved, {:.3f}us through parents'.format(
+        resolved * 1e6, resolving * 1e6))
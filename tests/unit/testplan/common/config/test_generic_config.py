@@ -1,6 +1,7 @@
 """TODO."""
 
 import re
+import pickle
 from schema import Schema, And, Or, Use, SchemaError
 
 from testplan.common.config import Config, ConfigOption
@@ -235,3 +236,68 @@ def test_getattr_propagation():
     leaf_4.parent = branch_3
     # foo -> branch default, bar -> branch local, baz -> leaf local
     assert (leaf_4.foo, leaf_4.bar, leaf_4.baz) == (50, 40, 'beta')
+
+
+class Mutable(Config):
+
+    @classmethod
+    def get_options(cls):
+        return {
+            ConfigOption('items', default=[]): list
+        }
+
+
+def test_schema_cache():
+    """Schemas are built once per class, mutable defaults are not shared."""
+    assert First.schema() is First.schema()
+    assert Second.schema() is not First.schema()
+
+    first, second = Mutable(), Mutable()
+    first.items.append(1)
+    assert second.items == []
+    assert Mutable().items == []
+
+
+def test_resolved_values_invalidation():
+    """
+    Resolved values are dropped when an ancestor gets a new parent or local
+    value.
+    """
+    root = Root()
+    branch = Branch()
+    leaf = Leaf()
+    leaf.parent = branch
+    assert (leaf.foo, leaf.bar) == (50, 30)
+
+    branch.parent = root
+    assert (leaf.foo, leaf.bar) == (50, 3)
+
+    root.set_local('bar', 7)
+    assert (branch.bar, leaf.bar) == (7, 7)
+
+    branch.set_local('foo', 15)
+    assert (branch.foo, leaf.foo) == (15, 15)
+
+    # Assigned values are local values, kept on invalidation.
+    leaf.baz = 'gamma'
+    branch.bar = 40
+    assert (leaf.baz, leaf.bar) == ('gamma', 40)
+    root.set_local('bar', 8)
+    assert (leaf.baz, leaf.bar) == ('gamma', 40)
+
+
+def test_config_pickle():
+    """Configs with resolved values and children can be pickled."""
+    root = Root(foo=1)
+    branch = Branch()
+    branch.parent = root
+    assert (branch.foo, branch.bar) == (50, 3)
+
+    branch.foo = 40
+    clone = pickle.loads(pickle.dumps(branch))
+    assert (clone.foo, clone.bar) == (40, 3)
+    assert clone.parent.foo == 1
+
+    # Unpickled configs are still invalidated by their parent.
+    clone.parent.set_local('bar', 2)
+    assert clone.bar == 2
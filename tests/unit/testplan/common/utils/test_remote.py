@@ -0,0 +1,54 @@
+import getpass
+
+from testplan.common.utils import remote
+
+OPTIONS = remote.ssh_control_options('/tmp/control', persist=60)
+
+
+def test_ssh_control_options():
+    assert OPTIONS == ['-o', 'ControlMaster=auto',
+                       '-o', 'ControlPath=/tmp/control/%r@%h:%p',
+                       '-o', 'ControlPersist=60']
+
+
+def test_ssh_cmd(monkeypatch):
+    monkeypatch.setenv('SSH_BINARY', '/usr/bin/ssh')
+    user_host = '{}@host'.format(getpass.getuser())
+    assert remote.ssh_cmd('host', 'ls') == ['/usr/bin/ssh', user_host, 'ls']
+    assert remote.ssh_cmd('host', 'ls', ssh_options=OPTIONS) == \
+        ['/usr/bin/ssh'] + OPTIONS + [user_host, 'ls']
+    assert remote.ssh_control_exit_cmd('host', OPTIONS) == \
+        ['/usr/bin/ssh'] + OPTIONS + ['-O', 'exit', user_host]
+
+
+def test_copy_cmd(monkeypatch):
+    monkeypatch.setenv('SSH_BINARY', '/usr/bin/ssh')
+    monkeypatch.setenv('SCP_BINARY', '/usr/bin/scp')
+    monkeypatch.delenv('RSYNC_BINARY', raising=False)
+    assert remote.copy_cmd('src', 'host:dst', ssh_options=OPTIONS) == \
+        ['/usr/bin/scp', '-r'] + OPTIONS + ['src', 'host:dst']
+
+    monkeypatch.setenv('RSYNC_BINARY', '/usr/bin/rsync')
+    assert remote.copy_cmd('src', 'host:dst', exclude=['*.pyc'],
+                           ssh_options=OPTIONS) == [
+        '/usr/bin/rsync', '-r', '--links',
+        '-e', "/usr/bin/ssh -o ControlMaster=auto "
+              "-o ControlPath=/tmp/control/%r@%h:%p "
+              "-o ControlPersist=60",
+        '--exclude', '*.pyc', 'src', 'host:dst']
+
+
+def test_binary_lookup_cached(monkeypatch):
+    """The PATH is searched once for a binary not set in the environment."""
+    lookups = []
+
+    def check_output(cmd, **kwargs):
+        lookups.append(cmd)
+        return b'/opt/bin/ssh\n'
+
+    monkeypatch.delenv('SSH_BINARY', raising=False)
+    monkeypatch.setattr(remote, '_BINARIES', {})
+    monkeypatch.setattr(remote.subprocess, 'check_output', check_output)
+    for _ in range(3):
+        assert remote.ssh_cmd('host', 'ls')[0] == '/opt/bin/ssh'
+    assert lookups == ['which ssh']
@@ -0,0 +1,98 @@
+"""Unit tests for pool communication codecs."""
+
+import pytest
+
+from testplan.runners.pools import communication
+from testplan.runners.pools.communication import (
+    Message, PickleCodec, CompactCodec)
+
+
+def make_message(size):
+    return Message(index='0').make(Message.TaskResults, data='x' * size)
+
+
+@pytest.mark.parametrize('codec_name', communication.supported_codecs())
+def test_codec_roundtrip(codec_name):
+    """Messages are decoded as sent, by the codec and by auto-detection."""
+    codec = communication.CODECS[codec_name]()
+    for size in (0, 10, 100000):
+        message = make_message(size)
+        encoded = codec.encode(message)
+        for decoded in (codec.decode(encoded),
+                        communication.decode(encoded)):
+            assert decoded.cmd == message.cmd
+            assert decoded.data == message.data
+            assert decoded.sender_metadata == message.sender_metadata
+
+
+def test_compact_codec_compresses_large_payloads():
+    """Large payloads are compressed, small ones are only framed."""
+    pickle_codec, compact_codec = PickleCodec(), CompactCodec()
+
+    small = make_message(10)
+    assert len(compact_codec.encode(small)) == \
+        len(pickle_codec.encode(small)) + CompactCodec.HEADER.size
+
+    large = make_message(100000)
+    assert len(compact_codec.encode(large)) < \
+        len(pickle_codec.encode(large)) / 10
+
+
+def test_compact_codec_rejects_corrupted_data():
+    """Truncated frames are detected."""
+    encoded = CompactCodec(threshold=10 ** 9).encode(make_message(100))
+    with pytest.raises(Exception):
+        CompactCodec().decode(encoded[:-1])
+
+
+def test_shared_file_codec(tmpdir):
+    """Large messages are passed through files removed once decoded."""
+    codec = communication.SharedFileCodec(
+        PickleCodec(), str(tmpdir), threshold=1000)
+
+    small = codec.encode(make_message(10))
+    assert communication.decode(small).data == 'x' * 10
+    assert tmpdir.listdir() == []
+
+    handle = codec.encode(make_message(100000))
+    assert handle.startswith(communication.SharedFileCodec.MAGIC)
+    assert len(handle) < 1000
+    assert len(tmpdir.listdir()) == 1
+    assert communication.decode(
+        handle, shared_dir=str(tmpdir)).data == 'x' * 100000
+    assert tmpdir.listdir() == []
+
+
+def test_shared_file_codec_rejects_handles(tmpdir):
+    """Files are only read and removed from the directory of the pool."""
+    shared_dir = tmpdir.mkdir('shared')
+    codec = communication.SharedFileCodec(
+        PickleCodec(), str(shared_dir), threshold=1000)
+    handle = codec.encode(make_message(100000))
+
+    # Not accepted unless the pool passes messages through files.
+    with pytest.raises(ValueError):
+        communication.decode(handle)
+    with pytest.raises(ValueError):
+        communication.decode(handle, shared_dir=str(tmpdir))
+    assert len(shared_dir.listdir()) == 1
+
+    outside = tmpdir.join('outside.msg')
+    outside.write('data')
+    for path in (str(outside),
+                 str(shared_dir.join('..', 'outside.msg'))):
+        forged = communication.SharedFileCodec.MAGIC + path.encode('utf-8')
+        with pytest.raises(ValueError):
+            communication.decode(forged, shared_dir=str(shared_dir))
+    assert outside.check(file=True)
+
+
+def test_negotiate_codec():
+    """Requested codec is used only if supported by the worker."""
+    assert isinstance(communication.negotiate_codec(
+        'compact', ['compact', 'pickle']), CompactCodec)
+    assert type(communication.negotiate_codec(
+        'compact', ['pickle'])) is PickleCodec
+    assert type(communication.negotiate_codec('compact', None)) is PickleCodec
+    assert type(communication.negotiate_codec(
+        'pickle', communication.supported_codecs())) is PickleCodec
@@ -0,0 +1,179 @@
+"""Unit tests for the pool TCP connection manager."""
+
+import pickle
+import threading
+
+import zmq
+
+from testplan.runners.pools import ProcessPool
+from testplan.runners.pools.communication import Message
+from testplan.runners.pools.connection import TCPConnectionManager
+
+
+def test_interleaved_requests_routed_by_identity():
+    """
+    Requests from several workers can be received before any of them is
+    answered, responses are routed back to the right worker.
+    """
+    pool = ProcessPool(name='ConnPool', size=2)
+    manager = TCPConnectionManager()
+    manager.parent = pool
+    manager.start()
+
+    context = zmq.Context()
+    clients = []
+    try:
+        workers = list(pool._workers)
+        for worker in workers:
+            manager.register(worker)
+
+        for worker in workers:
+            sock = context.socket(zmq.DEALER)
+            sock.connect('tcp://{}'.format(worker.transport.address))
+            clients.append(sock)
+            sock.send_multipart([b'', pickle.dumps(Message(
+                index=worker.uid()).make(Message.Heartbeat, data=worker.uid()))])
+
+        received = []
+        while len(received) < len(workers):
+            assert manager.poll(timeout=5)
+            msg = manager.accept()
+            while msg is not None:
+                received.append(msg)
+                msg = manager.accept()
+        assert sorted(msg.data for msg in received) == sorted(
+            worker.uid() for worker in workers)
+
+        # Respond in reverse order of the requests.
+        for worker in reversed(workers):
+            worker.respond(Message().make(Message.Ack, data=worker.uid()))
+
+        for worker, sock in zip(workers, clients):
+            assert sock.poll(timeout=5000)
+            response = pickle.loads(sock.recv_multipart()[-1])
+            assert response.cmd == Message.Ack
+            assert response.data == worker.uid()
+    finally:
+        for sock in clients:
+            sock.close()
+        context.destroy()
+        manager.abort()
+
+
+def test_wakeup_interrupts_poll():
+    """A blocking poll returns as soon as the manager is woken up."""
+    pool = ProcessPool(name='ConnPool', size=1)
+    manager = TCPConnectionManager()
+    manager.parent = pool
+    manager.start()
+    try:
+        manager.wakeup()
+        assert manager.poll(timeout=10) is False
+        assert manager.accept() is None
+    finally:
+        manager.abort()
+
+
+def test_wait_connected():
+    """
+    Waiting for a worker to connect receives its first request, messages
+    received meanwhile are still accepted afterwards.
+    """
+    pool = ProcessPool(name='ConnPool', size=2)
+    manager = TCPConnectionManager()
+    manager.parent = pool
+    manager.start()
+
+    context = zmq.Context()
+    clients = []
+    try:
+        workers = list(pool._workers)
+        for worker in workers:
+            manager.register(worker)
+        assert workers[0].transport.wait_connected(timeout=0.2) is False
+
+        for worker in reversed(workers):
+            sock = context.socket(zmq.DEALER)
+            sock.connect('tcp://{}'.format(worker.transport.address))
+            clients.append(sock)
+            sock.send_multipart([b'', pickle.dumps(Message(
+                index=worker.uid()).make(Message.ConfigRequest))])
+
+        assert workers[0].transport.wait_connected(timeout=5) is True
+        assert workers[1].transport.connected.is_set()
+        assert manager.poll(timeout=0) is True
+        received = [manager.accept(), manager.accept()]
+        assert [msg.sender_metadata['index'] for msg in received] == \
+            [worker.uid() for worker in reversed(workers)]
+        assert manager.accept() is None
+    finally:
+        for sock in clients:
+            sock.close()
+        context.destroy()
+        manager.abort()
+
+
+def test_wait_connected_other_thread():
+    """
+    Threads not owning the socket wait for the owner to receive the first
+    request of a worker, without using the socket.
+    """
+    pool = ProcessPool(name='ConnPool', size=1)
+    manager = TCPConnectionManager()
+    manager.parent = pool
+    manager.start()
+
+    context = zmq.Context()
+    sock = context.socket(zmq.DEALER)
+    try:
+        worker = list(pool._workers)[0]
+        manager.register(worker)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(
+            worker.transport.wait_connected(timeout=10)))
+        waiter.start()
+
+        sock.connect('tcp://{}'.format(worker.transport.address))
+        sock.send_multipart([b'', pickle.dumps(Message(
+            index=worker.uid()).make(Message.ConfigRequest))])
+        assert manager.poll(timeout=5) is True
+        assert manager.accept().cmd == Message.ConfigRequest
+        waiter.join(timeout=10)
+        assert results == [True]
+    finally:
+        sock.close()
+        context.destroy()
+        manager.abort()
+
+
+def test_socket_used_by_owner_only():
+    """Threads not owning the socket cannot receive or send messages."""
+    pool = ProcessPool(name='ConnPool', size=1)
+    manager = TCPConnectionManager()
+    manager.parent = pool
+    manager.start()
+    try:
+        worker = list(pool._workers)[0]
+        manager.register(worker)
+        worker.transport.identity = b'worker'
+        errors = []
+
+        def use_socket():
+            for func in (lambda: manager.poll(timeout=0),
+                         manager.accept,
+                         lambda: worker.transport.respond(
+                             Message(index='0').make(Message.Ack))):
+                try:
+                    func()
+                except RuntimeError as exc:
+                    errors.append(exc)
+
+        thread = threading.Thread(target=use_socket)
+        thread.start()
+        thread.join()
+        assert len(errors) == 3
+
+        manager.own()
+        assert manager.poll(timeout=0) is False
+    finally:
+        manager.abort()
@@ -0,0 +1,101 @@
+"""Unit tests for the pool handing tasks to its threads directly."""
+
+import threading
+
+from testplan.common.utils.path import default_runpath
+from testplan.common.utils.timing import wait
+from testplan.runners.pools import DirectPool
+from testplan import Task
+
+from tests.unit.testplan.runners.pools.tasks.data.sample_tasks import \
+    Runnable, RunnableThatRaises
+
+
+def test_direct_pool_basic():
+    """Tasks are executed by the threads of the pool."""
+    tasks = [Task(target=Runnable(idx)) for idx in range(20)]
+    failing = Task(target=RunnableThatRaises(0))
+    pool = DirectPool(name='MyPool', size=4, runpath=default_runpath)
+    for task in tasks + [failing]:
+        pool.add(task, uid=task.uid())
+
+    with pool:
+        wait(lambda: not pool.pending_work(), timeout=10, interval=0.01)
+
+    for idx, task in enumerate(tasks):
+        assert pool.results[task.uid()].status is True
+        assert pool.results[task.uid()].result == idx * 2
+    assert pool.results[failing.uid()].status is False
+    assert '123' in pool.results[failing.uid()].reason
+
+
+def test_direct_pool_task_ordering():
+    """Tasks are executed by priority then longest expected cost first."""
+    executed = []
+
+    class Recorded(Runnable):
+        def run(self):
+            executed.append(self._number)
+            return super(Recorded, self).run()
+
+    tasks = [Task(target=Recorded(0), cost=1),
+             Task(target=Recorded(1)),
+             Task(target=Recorded(2), cost=10),
+             Task(target=Recorded(3), cost=5, priority=1),
+             Task(target=Recorded(4), cost=1)]
+    pool = DirectPool(name='MyPool', size=1, runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+
+    with pool:
+        wait(lambda: not pool.pending_work(), timeout=10, interval=0.01)
+    assert executed == [3, 1, 2, 0, 4]
+
+
+def test_direct_pool_reschedule():
+    """Tasks are rescheduled up to the retries limit."""
+    task = Task(target=Runnable(1))
+    pool = DirectPool(name='MyPool', size=2, task_retries_limit=3,
+                      runpath=default_runpath)
+    pool.set_reschedule_check(lambda pool, task_result: True)
+    pool.add(task, uid=task.uid())
+
+    with pool:
+        wait(lambda: not pool.pending_work(), timeout=10, interval=0.01)
+    assert pool.task_assign_cnt[task.uid()] == 3
+    assert pool.results[task.uid()].result == 2
+
+
+def test_direct_pool_tasks_added_once_started():
+    """Idle threads are woken up by the tasks added to a started pool."""
+    pool = DirectPool(name='MyPool', size=2, max_active_loop_sleep=60,
+                      runpath=default_runpath)
+    with pool:
+        task = Task(target=Runnable(3))
+        pool.add(task, uid=task.uid())
+        wait(lambda: not pool.pending_work(), timeout=5, interval=0.01)
+        assert pool.results[task.uid()].result == 6
+
+
+def test_direct_pool_abort():
+    """Pending tasks are discarded when the pool is aborted."""
+    release = threading.Event()
+
+    class Blocking(Runnable):
+        def run(self):
+            release.wait(10)
+            return super(Blocking, self).run()
+
+    tasks = [Task(target=Blocking(idx)) for idx in range(3)]
+    pool = DirectPool(name='MyPool', size=1, runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+    pool.start()
+    pool._wait_started()
+    wait(lambda: len(pool.task_assign_cnt) == 1, timeout=5, interval=0.01)
+
+    pool.abort()
+    release.set()
+    assert not pool.pending_work()
+    for task in tasks:
+        assert pool.results[task.uid()].status is False
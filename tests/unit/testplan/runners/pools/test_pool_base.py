@@ -1,9 +1,17 @@
 """TODO."""
 
 import os
+import sys
+import time
+import subprocess
+
+import mock
 
 from testplan.common.utils.path import default_runpath
-from testplan.runners.pools.base import Pool
+from testplan.report.testing import Status
+from testplan.runners.pools.base import Pool, TaskQueue
+from testplan.runners.pools.communication import Message
+from testplan.testing.multitest import MultiTest, testsuite, testcase
 from testplan import Task
 
 from tests.unit.testplan.runners.pools.tasks.data.sample_tasks import Runnable
@@ -34,3 +42,304 @@ def test_pool_basic():
            pool.results[task1.uid()].result == 10
     assert pool.get(task2.uid()).result ==\
            pool.results[task2.uid()].result == 30
+
+
+class RecordingPool(Pool):
+    """Pool recording the requests received from workers."""
+
+    def __init__(self, **options):
+        super(RecordingPool, self).__init__(**options)
+        self.requested = []
+        self.fragments = []
+
+    def _handle_taskpull_request(self, worker, request, response):
+        self.requested.append(request.data)
+        super(RecordingPool, self)._handle_taskpull_request(
+            worker, request, response)
+
+    def _handle_report_fragment(self, worker, request, response):
+        self.fragments.extend(
+            (uid, [entry.uid for entry in fragment])
+            for uid, fragment in request.data)
+        super(RecordingPool, self)._handle_report_fragment(
+            worker, request, response)
+
+
+def test_pool_prefetch():
+    """Workers keep prefetched tasks queued on top of the running one."""
+    tasks = [Task(target=Runnable(idx)) for idx in range(10)]
+    pool = RecordingPool(name='MyPool', size=1, prefetch=3,
+                         runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+
+    with pool:
+        while pool.ongoing:
+            pass
+
+    assert pool.requested[0] == 4
+    assert max(pool.requested) == 4
+    for idx, task in enumerate(tasks):
+        assert pool.get(task.uid()).result == idx * 2
+
+
+def test_pool_lost_worker_returns_prefetched_tasks():
+    """Tasks prefetched by a lost worker are given back to the pool."""
+    tasks = [Task(target=Runnable(idx)) for idx in range(3)]
+    pool = Pool(name='MyPool', size=1, prefetch=2, runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+
+    worker = pool._workers['0']
+    worker.assigned.update(pool.unassigned)
+    pool.unassigned.clear()
+
+    pool._deco_worker(worker, 'Aborting {}, test.')
+    assert not worker.assigned
+    assert sorted(pool.unassigned) == sorted(task.uid() for task in tasks)
+
+
+def test_pool_task_ordering():
+    """Tasks are assigned by priority then longest expected cost first."""
+    tasks = [Task(target=Runnable(0), cost=1),
+             Task(target=Runnable(1)),
+             Task(target=Runnable(2), cost=10),
+             Task(target=Runnable(3), cost=5, priority=1),
+             Task(target=Runnable(4), cost=1)]
+    pool = Pool(name='MyPool', size=1, runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+    assert [pool._input[uid] for uid in pool.unassigned] == [
+        tasks[3], tasks[1], tasks[2], tasks[0], tasks[4]]
+
+    fifo_pool = Pool(name='MyPool', size=1, task_ordering='fifo',
+                     runpath=default_runpath)
+    for task in tasks:
+        fifo_pool.add(task, uid=task.uid())
+    assert [fifo_pool._input[uid] for uid in fifo_pool.unassigned] == [
+        tasks[3], tasks[0], tasks[1], tasks[2], tasks[4]]
+
+
+def test_pool_task_ordering_costs_set_before_start():
+    """Costs set after tasks are added are used once the pool starts."""
+    tasks = [Task(target=Runnable(idx)) for idx in range(3)]
+    pool = Pool(name='MyPool', size=1, runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+    for idx, task in enumerate(tasks):
+        task.cost = idx
+
+    pool._prepopulate_runnables()
+    assert [pool._input[uid] for uid in pool.unassigned] == tasks[::-1]
+
+
+def test_task_queue_pop():
+    """The last task uid to be dequeued can be removed."""
+    queue = TaskQueue(key=lambda uid: -len(uid), uids=['bb', 'a', 'ccc', 'd'])
+    assert queue.pop() == 'd'
+    assert list(queue) == ['ccc', 'bb', 'a']
+    assert queue.popleft() == 'ccc'
+
+
+def pull(pool, worker, count):
+    """Handle a task pull request of a worker, return the response."""
+    pool._handle_taskpull_request(
+        worker, Message().make(Message.TaskPullRequest, data=count),
+        Message())
+    return worker.transport.responses.pop()
+
+
+def test_pool_work_stealing():
+    """Tasks queued by a busy worker are reclaimed for an idle one."""
+    tasks = [Task(target=Runnable(idx)) for idx in range(4)]
+    pool = Pool(name='MyPool', size=2, runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+    pool.status.change(pool.status.STARTING)
+    pool.status.change(pool.status.STARTED)
+    busy, idle = pool._workers['0'], pool._workers['1']
+
+    assert pull(pool, busy, 4).data == tasks
+    assert pull(pool, idle, 1).cmd == Message.Ack
+    assert busy.reclaim == 1
+
+    response = pull(pool, busy, 1)
+    assert (response.cmd, response.data) == (Message.TaskReclaim, 1)
+    assert busy.reclaim == 0
+    pool._handle_task_return(
+        busy, Message().make(Message.TaskReturn, data=[tasks[3].uid()]),
+        Message())
+    assert busy.transport.responses.pop().cmd == Message.Ack
+    assert busy.assigned == set(task.uid() for task in tasks[:3])
+    assert pool.task_assign_cnt[tasks[3].uid()] == 0
+
+    # Reclaimed tasks are not assigned back to the busy worker.
+    assert pull(pool, busy, 1).cmd == Message.Ack
+    assert pull(pool, idle, 1).data == [tasks[3]]
+    assert idle.assigned == {tasks[3].uid()}
+
+
+def test_pool_withdraw():
+    """Tasks not assigned yet are withdrawn, last ones to assign first."""
+    tasks = [Task(target=Runnable(idx)) for idx in range(3)]
+    pool = Pool(name='MyPool', size=1, runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+
+    assert pool.withdraw(2) == [tasks[2], tasks[1]]
+    assert list(pool.unassigned) == [tasks[0].uid()]
+    assert list(pool.ongoing) == [tasks[0].uid()]
+    assert pool.withdraw(2) == [tasks[0]]
+    assert not pool.added_items
+
+
+class Sleeper(object):
+    """Returns its number after some time."""
+
+    def __init__(self, number, duration):
+        self._number = number
+        self._duration = duration
+
+    def run(self):
+        time.sleep(self._duration)
+        return self._number
+
+
+class ReturnRecordingPool(Pool):
+    """Pool recording the tasks returned by workers."""
+
+    def __init__(self, **options):
+        super(ReturnRecordingPool, self).__init__(**options)
+        self.returned = []
+
+    def _handle_task_return(self, worker, request, response):
+        self.returned.extend(request.data)
+        super(ReturnRecordingPool, self)._handle_task_return(
+            worker, request, response)
+
+
+def test_pool_work_stealing_prefetched_tasks():
+    """
+    The worker that prefetched most tasks gives back the ones it did not
+    start to the worker that is idle.
+    """
+    tasks = [Task(target=Sleeper(idx, 0.3)) for idx in range(4)]
+    tasks.append(Task(target=Sleeper(4, 0)))
+    pool = ReturnRecordingPool(name='MyPool', size=2, prefetch=3,
+                               runpath=default_runpath)
+    for task in tasks:
+        pool.add(task, uid=task.uid())
+
+    with pool:
+        while pool.ongoing:
+            time.sleep(0.01)
+
+    # Tasks may be reclaimed again afterwards as the other worker is idle.
+    assert pool.returned[:2] == [tasks[3].uid(), tasks[2].uid()]
+    for idx, task in enumerate(tasks):
+        assert pool.get(task.uid()).result == idx
+
+
+@testsuite
+class Alpha(object):
+
+    @testcase
+    def case(self, env, result):
+        result.true(True)
+
+
+@testsuite
+class Beta(object):
+
+    @testcase
+    def case(self, env, result):
+        result.true(True)
+
+
+def test_pool_stream_results():
+    """Suite reports are streamed and merged back into the task result."""
+    task = Task(target=MultiTest(name='MTest', suites=[Alpha(), Beta()]))
+    pool = RecordingPool(name='MyPool', size=1, stream_results=True,
+                         runpath=default_runpath)
+    pool.add(task, uid=task.uid())
+
+    with pool:
+        while pool.ongoing:
+            pass
+
+    assert pool.fragments == [
+        (task.uid(), ['Alpha']), (task.uid(), ['Beta'])]
+    assert not pool.partial_reports
+
+    report = pool.get(task.uid()).result.report
+    assert [entry.uid for entry in report] == ['Alpha', 'Beta']
+    assert report.get_by_uid('Beta').name == 'Beta'
+    assert report.passed
+
+
+def test_pool_discarded_task_keeps_partial_report():
+    """Suites streamed before a task is discarded are kept in its result."""
+    mtest = MultiTest(name='MTest', suites=[Alpha(), Beta()])
+    task = Task(target=mtest)
+    pool = Pool(name='MyPool', size=1, stream_results=True,
+                runpath=default_runpath)
+    pool.add(task, uid=task.uid())
+
+    fragment = mtest.dry_run().report
+    fragment.entries = fragment.entries[:1]
+    fragment.build_index()
+    pool.partial_reports[task.uid()] = fragment
+    pool._discard_task(task.uid(), 'test')
+
+    task_result = pool.get(task.uid())
+    assert task_result.status is False
+    assert [entry.uid for entry in task_result.result.report] == ['Alpha']
+    assert not pool.partial_reports
+
+
+class ProcessWorkerStub(object):
+    """Worker with tasks assigned and a child process without children."""
+
+    def __init__(self):
+        self.assigned = {'uid'}
+        self.handler = subprocess.Popen(
+            [sys.executable, '-c', 'import time; time.sleep(30)'])
+
+
+def test_pool_worker_scan_rate_limited():
+    """Worker processes are scanned at most once per scan interval."""
+    pool = Pool(name='MyPool', size=1, runpath=default_runpath,
+                worker_inactivity_threshold=0, worker_scan_interval=60)
+    worker = ProcessWorkerStub()
+    try:
+        with mock.patch('testplan.runners.pools.base.time') as clock:
+            clock.time.return_value = 1000
+            assert pool._worker_defunct(worker) is True
+            clock.time.return_value = 1059
+            assert pool._worker_defunct(worker) is False
+            assert pool.monitor_metrics.scans == 1
+
+            clock.time.return_value = 1060
+            assert pool._worker_defunct(worker) is True
+            assert pool.monitor_metrics.scans == 2
+
+            # Nothing to scan for workers with no tasks assigned.
+            clock.time.return_value = 2000
+            worker.assigned.clear()
+            assert pool._worker_defunct(worker) is False
+            assert pool.monitor_metrics.scans == 2
+    finally:
+        worker.handler.kill()
+        worker.handler.wait()
+
+
+def test_pool_messages_count_as_heartbeats():
+    """Any message of a worker counts as a heartbeat of the worker."""
+    pool = Pool(name='MyPool', size=1, runpath=default_runpath)
+    with pool:
+        worker = pool._workers['0']
+        while pool.monitor_metrics.messages < 2:
+            time.sleep(0.01)
+        assert worker.transport.last_received is not None
+        assert worker.last_heartbeat is not None
+    assert pool.monitor_metrics.heartbeats == 0
@@ -6,6 +6,7 @@ import threading
 
 from testplan.runners.pools import process
 from testplan.runners.pools import tasks
+from testplan.runners.pools.communication import CompactCodec
 from testplan.common.utils import logger
 
 from tests.unit.testplan.runners.pools.tasks.data.sample_tasks import Runnable
@@ -45,6 +46,10 @@ class TestProcPool(object):
         assert proc_pool.get(example_task.uid()).result == 21
         assert proc_pool.results[example_task.uid()].result == 21
 
+        # Compact codec was negotiated with the workers.
+        for worker in proc_pool._workers:
+            assert isinstance(worker.transport.codec, CompactCodec)
+
     def test_start_stop(self, proc_pool):
         """Test basic start/stop of ProcessPool."""
         current_proc = psutil.Process()
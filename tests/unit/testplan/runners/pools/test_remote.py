@@ -0,0 +1,226 @@
+"""Unit tests for the remote pool provisioning of remote hosts."""
+
+import os
+import time
+import shutil
+import threading
+
+import pytest
+
+from testplan import Testplan
+from testplan.runners.pools import RemotePool, workspace_sync
+
+HOSTS = ('host0', 'host1', 'host2', 'host3')
+
+
+class RecordingCommands(object):
+    """Records the ssh and copy commands instead of running them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ssh = []
+        self.copy = []
+        self.threads = set()
+        self.ssh_options = []
+
+    def ssh_cmd(self, host, command, ssh_options=None):
+        with self.lock:
+            self.ssh.append((host, command))
+            self.threads.add(threading.current_thread().name)
+            self.ssh_options.append(ssh_options)
+        return ['true']
+
+    def copy_cmd(self, source, target, ssh_options=None, **kwargs):
+        with self.lock:
+            self.copy.append((source, target))
+            self.ssh_options.append(ssh_options)
+        # Keeps each host busy long enough for the other threads to start.
+        time.sleep(0.05)
+        return ['true']
+
+
+def test_provision_workers():
+    """
+    Remote hosts are provisioned from a bounded number of threads and each
+    host gets its directories and links made in a single ssh session.
+    """
+    commands = RecordingCommands()
+    plan = Testplan(name='RemotePlan', parse_cmdline=False)
+    pool = RemotePool(name='RemotePool',
+                      hosts={host: 1 for host in HOSTS},
+                      ssh_cmd=commands.ssh_cmd,
+                      copy_cmd=commands.copy_cmd,
+                      copy_workspace_check=None,
+                      remote_workspace='/remote/workspace',
+                      push=[os.path.abspath(__file__)],
+                      push_relative_dir=os.path.dirname(
+                          os.path.abspath(__file__)),
+                      provision_workers=2)
+    plan.add_resource(pool)
+    pool._provision_workers()
+
+    assert sorted(host for host, _ in commands.ssh) == sorted(HOSTS)
+    assert len(commands.threads) == 2
+    assert threading.current_thread().name not in commands.threads
+    for _, command in commands.ssh:
+        mkdir, link = command.split(' && ')
+        assert mkdir.startswith('/bin/mkdir -p ')
+        assert mkdir.endswith('/push_files')
+        assert link.startswith('ln -sf /remote/workspace ')
+
+    # Child script and pushed file of every host.
+    assert len(commands.copy) == 2 * len(HOSTS)
+
+    # Workers provisioned are not provisioned again when started.
+    for worker in pool._workers:
+        worker._prepare_remote = None
+        worker.provision()
+
+
+def test_ssh_multiplexing():
+    """
+    Commands share one connection per host with ssh_cmd and copy_cmd taking
+    ssh options.
+    """
+    commands = RecordingCommands()
+    plan = Testplan(name='RemotePlan', parse_cmdline=False)
+    pool = RemotePool(name='RemotePool', hosts={'host0': 1},
+                      ssh_cmd=commands.ssh_cmd,
+                      copy_cmd=commands.copy_cmd,
+                      copy_workspace_check=None,
+                      remote_workspace='/remote/workspace')
+    plan.add_resource(pool)
+    pool._start_ssh_multiplexing()
+    control_dir = pool._control_dir
+    assert os.path.isdir(control_dir)
+    pool._provision_workers()
+    pool._stop_ssh_multiplexing()
+
+    assert len(commands.ssh_options) == 2
+    for options in commands.ssh_options:
+        assert 'ControlMaster=auto' in options
+        assert 'ControlPath={}'.format(
+            os.path.join(control_dir, '%r@%h:%p')) in options
+    assert not os.path.exists(control_dir)
+    assert pool.ssh_options == []
+
+
+class LocalCommands(object):
+    """Runs the ssh and copy commands on the local host."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uploads = []
+
+    def ssh_cmd(self, host, command):
+        return ['/bin/sh', '-c', command]
+
+    def copy_cmd(self, source, target, **kwargs):
+        source = source.split(':')[-1]
+        target = target.split(':')[-1]
+        if os.path.basename(source) == 'blobs':
+            with self.lock:
+                self.uploads.append(sorted(os.listdir(source)))
+        return ['cp', '-r', source, target]
+
+
+def test_workspace_sync(tmpdir, monkeypatch):
+    """
+    Only the workspace content missing from the blob cache is uploaded, once
+    for the hosts sharing a cache.
+    """
+    workspace = tmpdir.mkdir('workspace')
+    workspace.join('a.txt').write('a')
+    workspace.join('same_as_a.txt').write('a')
+    workspace.mkdir('sub').join('b.txt').write('b')
+    workspace.join('excluded.pyc').write('c')
+    monkeypatch.chdir(str(workspace))
+
+    commands = LocalCommands()
+    plan = Testplan(name='WorkspaceSyncPlan{}'.format(os.getpid()),
+                    parse_cmdline=False)
+    pool = RemotePool(name='RemotePool',
+                      hosts={'host0': 1, 'host1': 1},
+                      ssh_cmd=commands.ssh_cmd,
+                      copy_cmd=commands.copy_cmd,
+                      copy_workspace_check=None,
+                      workspace=str(workspace),
+                      workspace_exclude=['*.pyc'],
+                      workspace_sync='manifest',
+                      workspace_cache=str(tmpdir.join('cache', 'blobs')),
+                      workspace_cache_group=lambda host: 'shared')
+    plan.add_resource(pool)
+    worker = pool._workers['host0']
+    try:
+        pool._provision_workers()
+        digests = [workspace_sync.file_digest(str(workspace.join(name)))
+                   for name in ('a.txt', 'sub/b.txt')]
+        assert commands.uploads == [sorted(digests)]
+
+        remote = worker._workspace_paths.remote
+        with open(os.path.join(remote, 'sub', 'b.txt')) as fobj:
+            assert fobj.read() == 'b'
+        assert os.path.isfile(os.path.join(remote, 'same_as_a.txt'))
+        assert not os.path.exists(os.path.join(remote, 'excluded.pyc'))
+
+        # A new start uploads the changed content only.
+        workspace.join('a.txt').write('changed')
+        worker._provisioned = False
+        pool._manifest = None
+        worker.provision()
+        assert commands.uploads[1:] == [
+            [workspace_sync.file_digest(str(workspace.join('a.txt')))]]
+        with open(os.path.join(remote, 'a.txt')) as fobj:
+            assert fobj.read() == 'changed'
+    finally:
+        shutil.rmtree(worker._remote_testplan_path, ignore_errors=True)
+
+
+def test_stream_results(tmpdir):
+    """
+    Remote files are fetched as a tar stream, filtered and up to a size.
+    """
+    remote = tmpdir.mkdir('remote').mkdir('runpath')
+    remote.join('report.json').write('r' * 10)
+    remote.join('ignored.tmp').write('t' * 10)
+    remote.mkdir('driver').join('stdout.log').write('l' * 100)
+    remote.join('driver').join('core').write('c' * 1000)
+
+    pool = RemotePool(name='RemotePool', hosts={'host0': 1},
+                      ssh_cmd=LocalCommands().ssh_cmd)
+    worker = pool._workers['host0']
+
+    target = str(tmpdir.join('local'))
+    size = worker._stream_data(source=str(remote), target=target,
+                               exclude=['*.tmp'])
+    assert size == 1110
+    assert os.path.isfile(os.path.join(target, 'runpath', 'report.json'))
+    assert not os.path.exists(os.path.join(target, 'runpath', 'ignored.tmp'))
+
+    target = str(tmpdir.join('included'))
+    size = worker._stream_data(source=str(remote), target=target,
+                               include=['*.json', 'driver/*.log'])
+    assert size == 110
+    assert sorted(os.listdir(os.path.join(target, 'runpath', 'driver'))) \
+        == ['stdout.log']
+
+    target = str(tmpdir.join('capped'))
+    size = worker._stream_data(source=str(remote), target=target,
+                               max_size=500)
+    assert size <= 500
+    assert not os.path.exists(
+        os.path.join(target, 'runpath', 'driver', 'core'))
+
+    # Links are kept only if they resolve under the target directory.
+    os.symlink('report.json', str(remote.join('latest.json')))
+    os.symlink(os.path.join('..', '..', 'outside'), str(remote.join('escape')))
+    os.symlink(str(tmpdir), str(remote.join('absolute')))
+    target = str(tmpdir.join('links'))
+    worker._stream_data(source=str(remote), target=target)
+    assert os.path.islink(os.path.join(target, 'runpath', 'latest.json'))
+    assert not os.path.lexists(os.path.join(target, 'runpath', 'escape'))
+    assert not os.path.lexists(os.path.join(target, 'runpath', 'absolute'))
+
+    with pytest.raises(RuntimeError):
+        worker._stream_data(source=str(tmpdir.join('missing')),
+                            target=str(tmpdir.join('missing_target')))
@@ -4,7 +4,7 @@ import os
 
 from testplan.common.utils.path import default_runpath
 from testplan.testing.multitest import MultiTest
-from testplan.testing.multitest.base import MultiTestConfig
+from testplan.testing.multitest.base import MultiTestConfig, balanced_partition
 
 
 def test_multitest_runpath():
@@ -47,3 +47,11 @@ def test_multitest_runpath():
     mtest.run()
     assert mtest.runpath == local_runpath
     assert mtest._runpath == local_runpath
+
+
+def test_balanced_partition():
+    """Heaviest items first to the lightest part, ties by index."""
+    assert balanced_partition([], 2) == []
+    assert balanced_partition([1] * 5, 2) == [0, 1, 0, 1, 0]
+    assert balanced_partition(
+        [1, 5, 2, 2, 1], 2) == [1, 0, 1, 1, 0]
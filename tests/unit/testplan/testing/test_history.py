@@ -0,0 +1,124 @@
+import datetime
+
+import pytest
+
+from testplan.common.utils.timing import Interval
+from testplan.report.testing import TestGroupReport, TestCaseReport
+from testplan.testing import history
+
+
+def timed(report, seconds):
+    start = datetime.datetime(2019, 1, 1)
+    report.timer['run'] = Interval(
+        start, start + datetime.timedelta(seconds=seconds))
+    return report
+
+
+def make_report(part=None):
+    testcases = [timed(TestCaseReport(name='case_a', uid='case_a'), 1),
+                 timed(TestCaseReport(name='case_b', uid='case_b'), 2),
+                 TestCaseReport(name='not_run', uid='not_run')]
+    suite = timed(TestGroupReport(name='Suite', uid='Suite',
+                                  category='testsuite', entries=testcases), 3)
+    return timed(TestGroupReport(name='MTest', uid='MTest',
+                                 category='multitest', entries=[suite],
+                                 part=part), 4)
+
+
+@pytest.mark.parametrize(
+    'values, expected_median, expected_p95',
+    (
+        ([], None, None),
+        ([3], 3, 3),
+        ([4, 1, 3], 3, 4),
+        ([1, 2, 3, 4], 2.5, 4),
+        (list(range(1, 101)), 50.5, 95),
+    )
+)
+def test_median_percentile(values, expected_median, expected_p95):
+    assert history.median(values) == expected_median
+    assert history.percentile(values, 95) == expected_p95
+
+
+def test_record_save_load(tmpdir):
+    path = str(tmpdir.join('sub', 'history.db'))
+    store = history.DurationHistory(path)
+    store.load()
+    assert store.median('MTest') is None
+
+    store.record('MTest', 2)
+    store.record('MTest', 4)
+    # Recorded durations are only visible after a save and load.
+    assert store.durations('MTest') == []
+    store.save()
+    store.load()
+    assert store.durations('MTest') == [2, 4]
+
+    other = history.DurationHistory(path)
+    other.load()
+    assert other.median('MTest') == 3
+    assert other.p95('MTest') == 4
+
+
+def test_max_samples(tmpdir):
+    path = str(tmpdir.join('history.db'))
+    store = history.DurationHistory(path, max_samples=3)
+    for duration in range(5):
+        store.record('MTest', duration)
+        store.save()
+    store.load()
+    assert store.durations('MTest') == [2, 3, 4]
+
+
+def test_record_report(tmpdir):
+    store = history.DurationHistory(str(tmpdir.join('history.db')))
+    store.record_report(make_report())
+    store.save()
+    store.load()
+
+    assert store.durations('MTest') == [4]
+    assert store.durations(history.history_uid('MTest', 'Suite')) == [3]
+    assert store.durations(
+        history.history_uid('MTest', 'Suite', 'case_b')) == [2]
+    assert store.durations(
+        history.history_uid('MTest', 'Suite', 'not_run')) == []
+
+
+def test_record_report_part(tmpdir):
+    """Only testcases are recorded for parts, other durations are partial."""
+    store = history.DurationHistory(str(tmpdir.join('history.db')))
+    store.record_report(make_report(part=(0, 2)))
+    store.save()
+    store.load()
+
+    assert store.durations('MTest') == []
+    assert store.durations(history.history_uid('MTest', 'Suite')) == []
+    assert store.durations(
+        history.history_uid('MTest', 'Suite', 'case_a')) == [1]
+
+
+def test_record_part(tmpdir):
+    """Tasks are mapped to the test they ran a part of, across runs."""
+    store = history.DurationHistory(str(tmpdir.join('history.db')))
+    store.record_part('module.target()', 'MTest')
+    assert store.part_of('module.target()') is None
+    store.save()
+    store.load()
+
+    assert store.part_of('module.target()') == 'MTest'
+    assert store.part_of('module.other()') is None
+
+
+def test_medians_of_test(tmpdir):
+    """Medians can be restricted to the entries of a test."""
+    store = history.DurationHistory(str(tmpdir.join('history.db')))
+    store.record_report(make_report())
+    store.record(history.history_uid('MTest2', 'Suite', 'case_a'), 5)
+    store.save()
+    store.load()
+
+    assert store.medians('MTest') == {
+        history.history_uid('MTest', 'Suite'): 3,
+        history.history_uid('MTest', 'Suite', 'case_a'): 1,
+        history.history_uid('MTest', 'Suite', 'case_b'): 2}
+    assert len(store.medians()) == 5